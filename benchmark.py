@@ -0,0 +1,232 @@
+"""
+Scale benchmarks for the app's data paths and the enrichment stages, written as JSON so runs can be compared.
+
+App: for each size, a seeded synthetic CSV (see synthetic_reviews.py) is loaded into a ReviewStore and the
+work behind the endpoints is timed: load, region/topic filters, aggregates, JSON serialization and a /posts page.
+Enrichment: data.py's stages run against a local stub server (llm_stub.py) with the given latency and
+error rate, and throughput is reported in rows/sec.
+
+    python benchmark.py --sizes 10000 100000 1000000
+    python benchmark.py --skip-app --enrich-rows 1000 --latency 0.1 --error-rate 0.05
+    python benchmark.py --compare old_results.json
+"""
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import synthetic_reviews
+from llm_stub import StubServer
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "my-react-app")
+
+
+def timed(fn, repeat=5):
+    """Runs fn 'repeat' times and returns the median/min/max wall time in milliseconds."""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return {
+        "median_ms": round(statistics.median(samples), 3),
+        "min_ms": round(min(samples), 3),
+        "max_ms": round(max(samples), 3),
+        "repeat": repeat,
+    }
+
+
+def dataset_path(rows, seed, data_dir):
+    """Generates the synthetic CSV for (rows, seed) once and reuses it on later runs."""
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f"synthetic_{rows}_{seed}.csv")
+    if not os.path.exists(path):
+        started = time.perf_counter()
+        synthetic_reviews.write(rows, path, seed=seed)
+        print(f"Generated {rows} rows in {time.perf_counter() - started:.1f}s -> '{path}'")
+    return path
+
+
+def bench_app(rows, seed, data_dir, repeat):
+    sys.path.insert(0, APP_DIR)
+    import aggregates
+    from dataset import REGIONS, ReviewStore
+
+    path = dataset_path(rows, seed, data_dir)
+    result = {"rows": rows, "csv_mb": round(os.path.getsize(path) / 2 ** 20, 1)}
+
+    started = time.perf_counter()
+    store = ReviewStore(path)
+    result["load_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    snap = store.snapshot()
+    cube = snap.cube
+
+    result["filter"] = {
+        "region": timed(lambda: store.query_in(snap, region="South"), repeat),
+        "region_topic_sentiment": timed(
+            lambda: store.query_in(snap, region="South", topic="billing", sentiments=["negative"]), repeat),
+        "date_range": timed(lambda: store.query_in(snap, start="2025-01-01", end="2025-06-30"), repeat),
+    }
+    result["aggregate"] = {
+        "topic_counts": timed(lambda: aggregates.topic_counts(aggregates.slice_cube(cube, "South")), repeat),
+        "sentiment_share": timed(
+            lambda: aggregates.sentiment_share(aggregates.slice_cube(cube, "South", "billing")), repeat),
+        "topic_trends": timed(lambda: aggregates.topic_trends(cube, bucket="month"), repeat),
+        "region_breakdown": timed(lambda: aggregates.region_breakdown(cube, REGIONS), repeat),
+    }
+    south = store.query_in(snap, region="South")
+    result["serialize"] = {
+        "region_rows": len(south),
+        "region_json": timed(lambda: south.to_json(orient="records"), repeat),
+        "posts_page": timed(lambda: store.page_json(sort="likes", region="South", topic="billing"), repeat),
+    }
+    return result
+
+
+def bench_enrichment(rows, seed, latency, jitter, error_rate, workers):
+    """Times data.py's enrichment stages against a local stub. data.py reads its settings on import."""
+    texts_df = synthetic_reviews.generate(rows, seed=seed)
+    texts = texts_df["text"].tolist()
+    # Raw dates in a shape the local parser can't read, so the date stage really reaches the API.
+    raw_dates = [f"posted {d}" for d in texts_df["date"]]
+
+    with StubServer(latency=latency, jitter=jitter, error_rate=error_rate, seed=seed) as stub, \
+            tempfile.TemporaryDirectory() as tmp:
+        os.environ.update({
+            "NVIDIA_BASE_URL": stub.base_url,
+            "NVIDIA_API_KEY": "stub",
+            # A fresh cache, so every request really goes to the stub.
+            "LLM_CACHE_PATH": os.path.join(tmp, "llm_cache.sqlite"),
+            "ENRICH_WORKERS": str(workers),
+        })
+        import data
+        from extractors import TierStats, parse_location_local, resolve
+
+        location_stats = TierStats("Locations")
+        stages = {
+            "batched_extraction": lambda: data.extract_fields(texts, raw_dates),
+            "sentiment_per_row": lambda: data.engine.map(data.classify_sentiment, texts, desc="Sentiment"),
+            "locations_tiered": lambda: data.engine.map(
+                lambda t: resolve(t, parse_location_local, data.get_location_from_text, location_stats),
+                texts, desc="Locations"),
+        }
+
+        result = {"rows": rows, "latency_s": latency, "jitter_s": jitter, "error_rate": error_rate,
+                  "workers": workers, "stages": {}}
+        for name, run in stages.items():
+            # Reset the cache between stages so one stage's answers never serve another.
+            data.cache.invalidate()
+            before = stub.stats.snapshot()
+            started = time.perf_counter()
+            run()
+            elapsed = time.perf_counter() - started
+            after = stub.stats.snapshot()
+            result["stages"][name] = {
+                "seconds": round(elapsed, 3),
+                "rows_per_sec": round(rows / elapsed, 1) if elapsed else None,
+                "requests": after["requests"] - before["requests"],
+                "errors": after["errors"] - before["errors"],
+            }
+            print(f"{name}: {result['stages'][name]}")
+        return result
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def flatten(results, prefix=""):
+    """{'a': {'median_ms': 1}} -> {'a.median_ms': 1}, for comparing two result files."""
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, name + "."))
+        elif isinstance(value, (int, float)):
+            flat[name] = value
+    return flat
+
+
+def compare(current, baseline, tolerance=0.2):
+    """Prints every timing that got more than 'tolerance' slower (or throughput that got that much lower)."""
+    now, before = flatten(current), flatten(baseline)
+    regressions = 0
+    for name, value in sorted(now.items()):
+        old = before.get(name)
+        if not old or not (name.endswith("median_ms") or name.endswith("load_ms") or name.endswith("rows_per_sec")):
+            continue
+        change = (value - old) / old
+        if name.endswith("rows_per_sec"):
+            change = -change
+        if change > tolerance:
+            regressions += 1
+            print(f"⚠️ {name}: {old} -> {value} ({change:+.0%})")
+    if not regressions:
+        print(f"✅ No regressions beyond {tolerance:.0%}.")
+    return regressions
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark the app's data paths and the enrichment stages.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--data-dir", default="bench_data")
+    parser.add_argument("--output", default=None, help="Defaults to benchmark_results.json in --data-dir.")
+    parser.add_argument("--skip-app", action="store_true")
+    parser.add_argument("--skip-enrichment", action="store_true")
+    parser.add_argument("--enrich-rows", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.05, help="Stub latency per request, in seconds.")
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--compare", default=None, help="A previous results file to check for regressions.")
+    args = parser.parse_args()
+
+    results = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "seed": args.seed,
+        },
+        "app": {},
+    }
+
+    if not args.skip_app:
+        for rows in args.sizes:
+            print(f"Benchmarking the app at {rows} rows...")
+            results["app"][str(rows)] = bench_app(rows, args.seed, args.data_dir, args.repeat)
+            print(json.dumps(results["app"][str(rows)]))
+
+    if not args.skip_enrichment:
+        print(f"Benchmarking enrichment over {args.enrich_rows} rows...")
+        results["enrichment"] = bench_enrichment(args.enrich_rows, args.seed, args.latency, args.jitter,
+                                                 args.error_rate, args.workers)
+
+    output = args.output or os.path.join(args.data_dir, "benchmark_results.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"✅ Results written to '{output}'")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(results, json.load(f))
@@ -1,18 +1,28 @@
 from openai import OpenAI
+import atexit
 import os
+import json
 import re
 os.environ["OMP_NUM_THREADS"] = "1"
-from sklearn.cluster import KMeans
 import pandas as pd
 from dotenv import load_dotenv
-import requests
-from tqdm import tqdm
+import metrics
+from enrichment import EnrichmentEngine
+from llm_cache import LLMCache
+from embedding_store import EmbeddingStore
+from topic_model import TopicModel
+from sentiment_cascade import MODEL_PATH as SENTIMENT_MODEL_PATH, SentimentCascade
+from extractors import US_STATES, TierStats, parse_date_local, parse_location_local, resolve
 
 load_dotenv()
 
-def name_topic(texts_in_cluster: list[str]) -> str:
-    client = OpenAI(base_url="https://integrate.api.nvidia.com/v1", api_key=os.getenv("NVIDIA_API_KEY"))
+BASE_URL = os.getenv("NVIDIA_BASE_URL", "https://integrate.api.nvidia.com/v1")
+
+SENTIMENTS = ["Positive", "Negative", "Neutral"]
+
+DATE_PATTERN = re.compile(r"^\d{1,2}/\d{1,2}/\d{4}$")
 
+def name_topic(texts_in_cluster: list[str]) -> str:
     joined_texts = "\n".join(texts_in_cluster[:5])
 
     prompt = f"""
@@ -30,7 +40,8 @@ def name_topic(texts_in_cluster: list[str]) -> str:
     {joined_texts}
     """
 
-    response = client.chat.completions.create(
+    response = engine.complete_text(
+        site="topics",
         model="meta/llama-3.1-8b-instruct",
         messages=[
             {"role": "system", "content": "You are a topic labeling assistant for T-Mobile user feedback. Reply with one short word only — the most specific topic name possible."},
@@ -40,7 +51,7 @@ def name_topic(texts_in_cluster: list[str]) -> str:
         max_tokens=15,
     )
 
-    raw_name = response.choices[0].message.content.lower().split('\n')[0].strip()
+    raw_name = (response or "").lower().split('\n')[0].strip()
     cleaned = re.sub(r'[^a-z0-9_ ]', '', raw_name).replace(" ", "_").strip('_')
 
     if not cleaned or len(cleaned) < 2:
@@ -49,66 +60,95 @@ def name_topic(texts_in_cluster: list[str]) -> str:
     return cleaned
 
 
-def classify_sentiment(text: str) -> str:
-    client = OpenAI(base_url="https://integrate.api.nvidia.com/v1", api_key=os.getenv("NVIDIA_API_KEY"))
-
-    response = client.chat.completions.create(
-        model="qwen/qwen3-next-80b-a3b-instruct",
-        messages=[
-            {
-                "role": "system",
-                "content": (
-                    "You are a sentiment analysis assistant. "
-                    "Your job is to classify text as Positive, Negative, or Neutral. "
-                    "Reply with only one of these words — nothing else."
-                ),
-            },
-            {"role": "user", "content": text},
-        ],
-        temperature=0.0,
-        max_tokens=5,
-    )
+def classify_sentiment(text: str) -> str | None:
+    try:
+        response = engine.complete_text(
+            site="sentiment",
+            model="qwen/qwen3-next-80b-a3b-instruct",
+            messages=[
+                {
+                    "role": "system",
+                    "content": (
+                        "You are a sentiment analysis assistant. "
+                        "Your job is to classify text as Positive, Negative, or Neutral. "
+                        "Reply with only one of these words — nothing else."
+                    ),
+                },
+                {"role": "user", "content": text},
+            ],
+            temperature=0.0,
+            max_tokens=5,
+        )
+    except Exception as e:
+        # Left empty rather than guessed, so the row is not counted as Neutral.
+        print(f"[API Error: {e}]")
+        return None
 
-    sentiment = response.choices[0].message.content.strip().capitalize()
-    if sentiment not in ["Positive", "Negative", "Neutral"]:
+    if response is None:
+        # An empty completion is a failed call too; it must not be counted as Neutral either.
+        return None
+    sentiment = response.strip().capitalize()
+    if sentiment not in SENTIMENTS:
         sentiment = "Neutral"
 
     return sentiment
 
+def classify_sentiments(texts: list[str], threshold: float = 0.6) -> list[str]:
+    """
+    Labels texts with the local sentiment model and only sends low-confidence rows to classify_sentiment.
+    Falls back to the LLM for every row if no local model has been trained
+    (`python sentiment_cascade.py train`).
+    """
+    if not os.path.exists(SENTIMENT_MODEL_PATH):
+        return engine.map(classify_sentiment, texts, desc="Classifying Sentiments")
+
+    cascade = SentimentCascade.load(
+        classify_sentiment,
+        threshold=threshold,
+        map_fn=lambda fn, items: engine.map(fn, items, desc="Escalating Sentiments"),
+    )
+    labels = cascade.classify(texts)
+    print(f"Sentiment: {cascade.stats['local']} rows labeled locally, {cascade.stats['escalated']} escalated to the LLM.")
+    return labels
+
+COLUMN_MAPPING_REDDIT = {
+    'text': 'text',      
+    'upvotes': 'score',   
+    'url': 'url',        
+    'date': 'date'
+}
+
+
+COLUMN_MAPPING_TMOBILE = {
+    'location': 'location',
+    'review': 'text',    
+    'thanks': 'score',
+    'date': 'date'
+}
+
+def load_sources(file_reddit='reddit_text.csv', file_tmobile='tmobile_reviews.csv') -> pd.DataFrame:
+    """Reads both scraped sources and returns them in the combined text/score/url/date/location schema."""
+    df_reddit = pd.read_csv(file_reddit)
+    df_tmobile = pd.read_csv(file_tmobile)
+
+    print(f"Loaded '{file_reddit}'. Columns: {df_reddit.columns.to_list()}")
+    print(f"Loaded '{file_tmobile}'. Columns: {df_tmobile.columns.to_list()}")
+
+    df_reddit_std = df_reddit.rename(columns=COLUMN_MAPPING_REDDIT)
+    df_reddit_std = df_reddit_std[COLUMN_MAPPING_REDDIT.values()]
+    
+    df_tmobile_std = df_tmobile.rename(columns=COLUMN_MAPPING_TMOBILE)
+    df_tmobile_std = df_tmobile_std[COLUMN_MAPPING_TMOBILE.values()]
+
+    return pd.concat([df_reddit_std, df_tmobile_std], ignore_index=True, sort=False)
+
 def combining_file():
     file_reddit = 'reddit_text.csv'
     file_tmobile = 'tmobile_reviews.csv'
     output_file = 'combined_data.csv'
 
-    COLUMN_MAPPING_REDDIT = {
-        'text': 'text',      
-        'upvotes': 'score',   
-        'url': 'url',        
-        'date': 'date'
-    }
-
-
-    COLUMN_MAPPING_TMOBILE = {
-        'location': 'location',
-        'review': 'text',    
-        'thanks': 'score',
-        'date': 'date'
-    }
-
     try:
-        df_reddit = pd.read_csv(file_reddit)
-        df_tmobile = pd.read_csv(file_tmobile)
-
-        print(f"Loaded '{file_reddit}'. Columns: {df_reddit.columns.to_list()}")
-        print(f"Loaded '{file_tmobile}'. Columns: {df_tmobile.columns.to_list()}")
-
-        df_reddit_std = df_reddit.rename(columns=COLUMN_MAPPING_REDDIT)
-        df_reddit_std = df_reddit_std[COLUMN_MAPPING_REDDIT.values()]
-        
-        df_tmobile_std = df_tmobile.rename(columns=COLUMN_MAPPING_TMOBILE)
-        df_tmobile_std = df_tmobile_std[COLUMN_MAPPING_TMOBILE.values()]
-
-        combined_df = pd.concat([df_reddit_std, df_tmobile_std], ignore_index=True, sort=False)
+        combined_df = load_sources(file_reddit, file_tmobile)
 
         combined_df.to_csv(output_file, index=False)
 
@@ -137,10 +177,21 @@ api_key = os.getenv("NVIDIA_API_KEY")
 if not api_key:
     raise EnvironmentError("ERROR: NVIDIA_API_KEY environment variable not set.")
 
+# One pooled client for every call; retries are handled by the engine so the SDK's own are disabled.
 client = OpenAI(
-    base_url="https://integrate.api.nvidia.com/v1",
-    api_key=api_key
+    base_url=BASE_URL,
+    api_key=api_key,
+    max_retries=0
 )
+# Completions are cached on disk by (model, messages, params), so reruns over unchanged rows are free.
+# Editing a prompt changes the key; find the old prompt with `python llm_cache.py --list`
+# and drop its entries with `python llm_cache.py --prompt-hash <hash>`.
+cache = LLMCache(os.getenv("LLM_CACHE_PATH", "llm_cache.sqlite"))
+# Writes out the use times of this run's cache hits.
+atexit.register(cache.close)
+metrics.collected("cache_lookups_total", "Cache lookups by cache and result.", ("cache", "result"),
+                  lambda: {("llm", "hit"): cache.hits, ("llm", "miss"): cache.misses}, type="counter")
+engine = EnrichmentEngine.from_env(client, cache=cache)
 
 def get_location_from_text(text_content: str) -> str | None:
     """
@@ -155,7 +206,8 @@ def get_location_from_text(text_content: str) -> str | None:
     )
 
     try:
-        response = client.chat.completions.create(
+        response = engine.complete_text(
+            site="locations",
             model="qwen/qwen3-next-80b-a3b-instruct",
             messages=[
                 {"role": "system", "content": system_prompt},
@@ -165,7 +217,7 @@ def get_location_from_text(text_content: str) -> str | None:
             max_tokens=50    
         )
         
-        result = response.choices[0].message.content.strip()
+        result = response.strip()
 
         if result.lower() == 'n/a' or result.lower() == 'none' or result == "":
             return None
@@ -202,21 +254,86 @@ def process_csv_locations(input_file: str, output_file: str):
 
     print(f"Found {len(rows_to_process)} rows with missing locations. Starting API calls...")
 
-    for index, row in tqdm(rows_to_process.iterrows(), total=len(rows_to_process)):
-        text = row['text']
-        
-        if not isinstance(text, str) or not text.strip():
-            continue
-            
-        extracted_location = get_location_from_text(text)
-        
+    texts = rows_to_process['text']
+    texts = texts[texts.apply(lambda t: isinstance(t, str) and bool(t.strip()))]
+
+    # Mentions like "Houston" or "Salina, OK" are resolved locally; only the rest go to the API
+    location_stats = TierStats("Locations")
+    locations = engine.map(
+        lambda text: resolve(text, parse_location_local, get_location_from_text, location_stats),
+        texts.tolist(),
+        desc="Extracting locations",
+    )
+    print(location_stats.report())
+
+    for index, extracted_location in zip(texts.index, locations):
         if extracted_location:
             df.at[index, 'location'] = extracted_location
 
+    print(f"LLM cache: {cache.stats()}")
     print(f"\nProcessing complete. Saving to '{output_file}'...")
     df.to_csv(output_file, index=False)
     print("✅ Done.")
 
+EMBED_MODEL = "nvidia/llama-3.2-nemoretriever-300m-embed-v2"
+
+def embed_batch(texts: list[str]) -> list[list[float]]:
+    # Through the engine, so a 429 or 5xx is retried (honouring Retry-After) like any completion.
+    response = engine.embed(
+        model=EMBED_MODEL,
+        input=texts,
+        encoding_format="float",
+        extra_body={"input_type": "passage"},
+    )
+    return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+def fit_topics(store: EmbeddingStore, texts: list[str], model_dir: str = "topic_model",
+               n_clusters: int = 10, drift_threshold: float = 1.3, save: bool = True) -> TopicModel:
+    """
+    Loads (or fits) the persisted topic model and brings it up to date with the embedding store.
+    Vectors added to the store since the last run are folded in with a mini-batch update,
+    or trigger a full recluster when they drift too far. Clusters without a name are named from
+    the texts in 'texts' nearest to their centroid; pass every text being assigned in this run,
+    so that a cluster is never named (or skipped) on the evidence of one small chunk.
+    With save=False the caller saves the model once it is done with it.
+    """
+    vectors = store.load(texts)
+
+    if TopicModel.exists(model_dir):
+        model = TopicModel.load(model_dir)
+    else:
+        print(f"No topic model in '{model_dir}'. Fitting {n_clusters} clusters...")
+        model = TopicModel.fit(store.vectors, n_clusters=n_clusters)
+
+    new_vectors = store.vectors[model.watermark:]
+    if len(new_vectors):
+        new_ids, distances = model.assign(new_vectors)
+        drift = model.drift(distances)
+        if drift > drift_threshold:
+            print(f"Topic drift {drift:.2f} > {drift_threshold}. Reclustering...")
+            model.recluster(store.vectors)
+        else:
+            print(f"Folding {len(new_vectors)} new vectors into the topic model (drift {drift:.2f}).")
+            model.partial_fit(new_vectors, new_ids)
+        model.watermark = len(store)
+
+    # Clusters with no members among 'texts' stay unnamed until a later run assigns rows to them.
+    ids, distances = model.assign(vectors)
+    model.name_topics(ids, texts, name_topic, distances=distances)
+    if save:
+        model.save(model_dir)
+    return model
+
+
+def assign_topics(model: TopicModel, store: EmbeddingStore, texts: list[str]):
+    """
+    Assigns every text to a stable topic id with a model from fit_topics. Nothing is refitted or
+    saved, so every chunk of a run sees the same topics.
+    Returns (topic ids, topic names) in the order of texts.
+    """
+    ids, _ = model.assign(store.load(texts))
+    return ids, [model.labels.get(int(t), "misc") for t in ids]
+
 def get_dates_from_text(date: str) -> str | None:
     system_prompt = (
         "You are an expert entity extraction system. "
@@ -225,7 +342,8 @@ def get_dates_from_text(date: str) -> str | None:
     )
 
     try:
-        response = client.chat.completions.create(
+        response = engine.complete_text(
+            site="dates",
             model="qwen/qwen3-next-80b-a3b-instruct",
             messages=[
                 {"role": "system", "content": system_prompt},
@@ -235,7 +353,7 @@ def get_dates_from_text(date: str) -> str | None:
             max_tokens=50
         )
 
-        result = response.choices[0].message.content.strip()
+        result = response.strip()
 
         if result.lower() in ['n/a', 'none', '']:
             return None
@@ -247,13 +365,143 @@ def get_dates_from_text(date: str) -> str | None:
         return None
 
 
-if __name__ == "__main__":
-    tqdm.pandas()
+BATCH_SYSTEM_PROMPT = (
+    "You are an expert entity extraction system for T-Mobile customer reviews. "
+    "You will receive a JSON array of reviews, each with an 'id', a 'fields' list and the 'text' and/or raw 'date'. "
+    "For every review return an object with 'id' (same as the input) and only the fields in its 'fields' list: "
+    "'sentiment' (exactly one of Positive, Negative, Neutral), "
+    "'state' (the two-letter US state abbreviation the post is likely from, or N/A), "
+    "'date' (the date from the raw 'date' field in the format month/day/year like 11/9/2025, or N/A). "
+    "Reply with only a JSON array of these objects — nothing else."
+)
+
+
+def _validate_fields(item: dict) -> dict:
+    """
+    Checks one batched result against the same allow-lists as the per-row extractors.
+    Returns only the fields that pass; a missing or invalid field is left out so it can be re-requested.
+    """
+    fields = {}
+
+    sentiment = str(item.get("sentiment", "")).strip().capitalize()
+    if sentiment in SENTIMENTS:
+        fields["sentiment"] = sentiment
+
+    state = str(item.get("state") or "N/A").strip().upper()
+    if state in ("N/A", "NONE", ""):
+        fields["state"] = None
+    elif state in US_STATES:
+        fields["state"] = state
+
+    date = str(item.get("date") or "N/A").strip()
+    if date.lower() in ("n/a", "none", ""):
+        fields["date"] = None
+    elif DATE_PATTERN.match(date):
+        fields["date"] = date
+
+    return fields
+
+
+def _extract_batch(batch: list[tuple[str, str, list[str]]]) -> list[dict]:
+    """
+    Extracts the wanted fields for a batch of (text, raw_date, fields) rows in one request.
+    The text is only sent when sentiment or state is wanted, the raw date only when the date is.
+    Rows missing from the reply come back as empty dicts; fields that fail validation or were not
+    asked for are left out.
+    """
+    reviews = []
+    for i, (text, raw_date, fields) in enumerate(batch):
+        review = {"id": i, "fields": fields}
+        if "sentiment" in fields or "state" in fields:
+            review["text"] = text
+        if "date" in fields:
+            review["date"] = raw_date
+        reviews.append(review)
+
+    try:
+        response = engine.complete_text(
+            site="batch_extraction",
+            model="qwen/qwen3-next-80b-a3b-instruct",
+            messages=[
+                {"role": "system", "content": BATCH_SYSTEM_PROMPT},
+                {"role": "user", "content": json.dumps(reviews, ensure_ascii=False)}
+            ],
+            temperature=0.0,
+            max_tokens=15 * sum(len(fields) for _, _, fields in batch) + 10 * len(batch) + 20
+        )
+
+        start, end = response.find("["), response.rfind("]")
+        items = json.loads(response[start:end + 1]) if start != -1 and end > start else []
+
+    except Exception as e:
+        print(f"[Batch extraction failed: {e}]")
+        items = []
+
+    results = [None] * len(batch)
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        i = item.get("id")
+        if isinstance(i, int) and 0 <= i < len(batch) and results[i] is None:
+            results[i] = {k: v for k, v in _validate_fields(item).items() if k in batch[i][2]}
+    return [r if r is not None else {} for r in results]
+
+
+# The per-row call behind each field, used for fields a batch could not answer. Each takes (text, raw_date).
+FIELD_EXTRACTORS = {
+    "sentiment": lambda text, raw_date: classify_sentiment(text),
+    "state": lambda text, raw_date: get_location_from_text(text),
+    "date": lambda text, raw_date: get_dates_from_text(raw_date),
+}
 
+
+def extract_fields(texts: list[str], raw_dates: list[str], batch_size: int = 20,
+                   wanted: list[list[str]] | None = None) -> list[dict]:
+    """
+    Extracts sentiment, state and date for every row, sending batch_size rows per request.
+    'wanted' lists the fields to ask for per row (default: all of FIELD_EXTRACTORS); fields already
+    known are neither sent nor re-requested, and rows that want nothing are not sent at all.
+    Only the fields a batch could not answer validly are re-requested, each with its own per-row call.
+    Returns one dict per input row, in order, holding the wanted fields.
+    """
+    if wanted is None:
+        wanted = [list(FIELD_EXTRACTORS)] * len(texts)
+    rows = [(text, str(raw_date), [f for f in FIELD_EXTRACTORS if f in fields])
+            for text, raw_date, fields in zip(texts, raw_dates, wanted)]
+    todo = [i for i, (_, _, fields) in enumerate(rows) if fields]
+    batches = [todo[i:i + batch_size] for i in range(0, len(todo), batch_size)]
+
+    results = [{} for _ in rows]
+    answers = engine.map(_extract_batch, [[rows[i] for i in batch] for batch in batches], desc="Batched extraction")
+    for batch, fields in zip(batches, answers):
+        for i, row_fields in zip(batch, fields or []):
+            results[i] = row_fields
+
+    missing = [(i, field) for i in todo for field in rows[i][2] if field not in results[i]]
+    if missing:
+        rows_missing = len({i for i, _ in missing})
+        print(f"{len(missing)} fields in {rows_missing} of {len(rows)} rows fell back to per-row calls.")
+        fallback = engine.map(lambda job: FIELD_EXTRACTORS[job[1]](*rows[job[0]][:2]), missing,
+                              desc="Per-field fallback")
+        for (i, field), value in zip(missing, fallback):
+            results[i][field] = value
+
+    return results
+
+
+if __name__ == "__main__":
     df = pd.read_csv("tmobile_reviews_labeled.csv")
 
-    # Apply your function to the date column with a progress bar
-    df["date"] = df["date"].progress_apply(lambda x: get_dates_from_text(str(x)))
+    # Clean the date column concurrently; parseable dates never reach the API and results come back in row order
+    date_stats = TierStats("Dates")
+    df["date"] = engine.map(
+        lambda x: resolve(str(x), parse_date_local, get_dates_from_text, date_stats),
+        df["date"],
+        desc="Cleaning dates",
+    )
+    print(date_stats.report())
+
+    print(f"LLM cache: {cache.stats()}")
 
     # Drop rows with no valid date
     df = df.dropna(subset=["date"])
@@ -261,42 +509,22 @@ if __name__ == "__main__":
     # Save cleaned version (avoid overwriting original)
     df.to_csv("tmobile_reviews_labeled_cleaned.csv", index=False)
 
-    # api_key = os.getenv("NVIDIA_API_KEY")
-    # base_url = "https://integrate.api.nvidia.com/v1"
-
     # reviews = pd.read_csv("combined_data_with_locations.csv")
     # reviews = reviews.dropna(subset=['text'])
     # reviews = reviews.reset_index(drop=True)
     # texts = reviews["text"].tolist()
 
-    # embs = []
-    # batch_size = 16
-    # headers = {"Authorization": f"Bearer {api_key}"}
-
-    # for i in tqdm(range(0, len(texts), batch_size), desc="Generating Embeddings"):
-    #     batch = texts[i:i + batch_size]
-    #     payload = {
-    #         "model": "nvidia/llama-3.2-nemoretriever-300m-embed-v2",
-    #         "input": batch,
-    #         "input_type": "passage"
-    #     }
-    #     r = requests.post(f"{base_url}/embeddings", headers=headers, json=payload)
-    #     r.raise_for_status()
-    #     embs.extend([item["embedding"] for item in r.json()["data"]])
-
-    # kmeans = KMeans(n_clusters=10, n_init=10, random_state=42)
-    # topics = kmeans.fit_predict(embs)
+    # store = EmbeddingStore("embeddings", model=EMBED_MODEL)
+    # store.embed_missing(texts, embed_batch, batch_size=16, max_workers=4)
+    # embs = store.load(texts)
 
-    # topic_labels = {}
-    # for i in set(topics):
-    #     cluster_texts = [texts[j] for j in range(len(texts)) if topics[j] == i]
-    #     topic_labels[i] = name_topic(cluster_texts)
+    # topics, topic_names = assign_topics(fit_topics(store, texts), store, texts)
 
 
-    # sentiments = [classify_sentiment(t) for t in tqdm(texts, desc="Classifying Sentiments")]
+    # sentiments = classify_sentiments(texts)
 
     # reviews["topic_id"] = topics
-    # reviews["topic_name"] = [topic_labels[t] for t in topics]
+    # reviews["topic_name"] = topic_names
     # reviews["sentiment"] = sentiments
 
     # reviews.to_csv("tmobile_reviews_labeled.csv", index=False)
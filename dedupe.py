@@ -0,0 +1,102 @@
+import re
+import zlib
+from collections import defaultdict
+
+import numpy as np
+
+NUM_PERM = 128
+SHINGLE_SIZE = 5
+# 16 bands of 8 rows: pairs above ~0.7 Jaccard almost always share a bucket, pairs below ~0.4 rarely do.
+BANDS = 16
+MERSENNE_PRIME = (1 << 31) - 1
+
+_rng = np.random.default_rng(1)
+_A = _rng.integers(1, MERSENNE_PRIME, size=NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, MERSENNE_PRIME, size=NUM_PERM, dtype=np.uint64)
+
+
+def normalize(text: str) -> str:
+    return re.sub(r"\s+", " ", re.sub(r"[^\w\s]", "", str(text).lower())).strip()
+
+
+def shingles(text: str, k: int = SHINGLE_SIZE) -> np.ndarray:
+    """32-bit hashes of the character k-grams of the normalized text."""
+    text = normalize(text)
+    if len(text) <= k:
+        return np.array([zlib.crc32(text.encode("utf-8"))], dtype=np.uint64)
+    return np.unique(np.fromiter((zlib.crc32(text[i:i + k].encode("utf-8")) for i in range(len(text) - k + 1)),
+                                 dtype=np.uint64))
+
+
+def minhash(text: str) -> np.ndarray:
+    """MinHash signature of one text: the minimum of NUM_PERM random linear hashes over its shingles."""
+    h = shingles(text)
+    # a, b < 2^31 and h < 2^32, so a * h + b stays inside 64 bits.
+    hashed = (np.outer(_A, h) + _B[:, None]) % np.uint64(MERSENNE_PRIME)
+    return hashed.min(axis=1).astype(np.uint32)
+
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of two signatures."""
+    return float(np.mean(a == b))
+
+
+def near_duplicate_groups(signatures, threshold=0.8, bands=BANDS) -> np.ndarray:
+    """
+    Groups rows whose signatures are at least 'threshold' similar. Candidate pairs come from LSH buckets
+    (rows that agree on every value of some band), so only colliding rows are ever compared, and
+    groups are transitive: two rows below the threshold still join if a third row links them.
+    Returns, for each row, the index of its group's representative: the first row of the group.
+    """
+    signatures = np.asarray(signatures)
+    n = len(signatures)
+    parent = np.arange(n)
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    rows_per_band = signatures.shape[1] // bands if n else 0
+    for band in range(bands if n else 0):
+        buckets = defaultdict(list)
+        chunk = signatures[:, band * rows_per_band:(band + 1) * rows_per_band]
+        for i, key in enumerate(map(bytes, chunk)):
+            buckets[key].append(i)
+
+        for members in buckets.values():
+            # Every pair in the bucket, not just pairs with its first row, so that A ~ B ~ C joins
+            # all three even when A and C are below the threshold. Pairs already joined are skipped.
+            for j, other in enumerate(members):
+                for first in members[:j]:
+                    a, b = find(first), find(other)
+                    if a != b and similarity(signatures[first], signatures[other]) >= threshold:
+                        # The lower index wins, so the representative is always the earliest row.
+                        parent[max(a, b)] = min(a, b)
+
+    return np.array([find(i) for i in range(n)], dtype=np.int64)
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    import pandas as pd
+
+    parser = argparse.ArgumentParser(description="Report near-duplicate reviews in a CSV.")
+    parser.add_argument("input_file", nargs="?", default="combined_data.csv")
+    parser.add_argument("--threshold", type=float, default=0.8)
+    args = parser.parse_args()
+
+    texts = [t for t in pd.read_csv(args.input_file)["text"].dropna().astype(str) if t.strip()]
+    started = time.perf_counter()
+    signatures = np.array([minhash(t) for t in texts])
+    reps = near_duplicate_groups(signatures, threshold=args.threshold)
+    elapsed = time.perf_counter() - started
+
+    duplicates = int(np.sum(reps != np.arange(len(reps))))
+    groups = len(np.unique(reps))
+    print(f"{len(texts)} rows in {groups} groups; {duplicates} near-duplicates ({elapsed:.2f}s)")
+    for rep in np.unique(reps[reps != np.arange(len(reps))])[:10]:
+        print(f"- {texts[rep][:80]!r} x{int(np.sum(reps == rep))}")
@@ -0,0 +1,163 @@
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+from tqdm import tqdm
+
+
+def text_key(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingStore:
+    """
+    Embedding vectors keyed by text hash, kept in one contiguous float32 .npy file
+    that is memory-mapped on open, plus a sidecar listing the hash of each row (one per line)
+    and a small meta.json. Rows are appended in place; the file doubles in capacity when it runs out of room.
+    Vectors are flushed before their ids are appended, so a crash never leaves an id without its vector.
+    """
+
+    def __init__(self, directory="embeddings", model=None):
+        self.directory = directory
+        self.model = model
+        self.vectors_path = os.path.join(directory, "vectors.npy")
+        self.ids_path = os.path.join(directory, "ids.txt")
+        self.meta_path = os.path.join(directory, "meta.json")
+        self.ids = []
+        self.rows = {}
+        self.count = 0
+        self._data = None
+
+        os.makedirs(directory, exist_ok=True)
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            if model and meta.get("model") and meta["model"] != model:
+                raise ValueError(f"Store at '{directory}' holds '{meta['model']}' embeddings, not '{model}'.")
+            self.model = meta.get("model") or model
+            with open(self.ids_path, encoding="utf-8") as f:
+                self.ids = f.read().split()
+            self.count = len(self.ids)
+            self.rows = {key: i for i, key in enumerate(self.ids)}
+            self._data = np.load(self.vectors_path, mmap_mode="r+")
+
+    @property
+    def dim(self):
+        return None if self._data is None else self._data.shape[1]
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """All stored vectors as a zero-copy view of the memory map."""
+        if self._data is None:
+            return np.empty((0, 0), dtype=np.float32)
+        return self._data[:self.count]
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, text):
+        return text_key(text) in self.rows
+
+    def _reserve(self, needed, dim):
+        if self._data is None:
+            capacity = max(1024, needed)
+            self._data = np.lib.format.open_memmap(self.vectors_path, mode="w+", dtype=np.float32,
+                                                   shape=(capacity, dim))
+            return
+
+        if dim != self.dim:
+            raise ValueError(f"Expected {self.dim}-dimensional vectors, got {dim}.")
+
+        capacity = self._data.shape[0]
+        if self.count + needed <= capacity:
+            return
+
+        while capacity < self.count + needed:
+            capacity *= 2
+        tmp_path = self.vectors_path + ".tmp"
+        grown = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float32, shape=(capacity, dim))
+        grown[:self.count] = self._data[:self.count]
+        grown.flush()
+        del grown
+        os.replace(tmp_path, self.vectors_path)
+        self._data = np.load(self.vectors_path, mmap_mode="r+")
+
+    def _commit(self, keys):
+        self._data.flush()
+        if not os.path.exists(self.meta_path):
+            with open(self.meta_path, "w", encoding="utf-8") as f:
+                json.dump({"model": self.model, "dim": self.dim}, f)
+        with open(self.ids_path, "a", encoding="utf-8") as f:
+            f.write("".join(key + "\n" for key in keys))
+
+    def add(self, texts, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        new = [(i, text_key(t)) for i, t in enumerate(texts)]
+        new = [(i, key) for i, key in new if key not in self.rows]
+        if not new:
+            return
+
+        self._reserve(len(new), vectors.shape[1])
+        start = self.count
+        self._data[start:start + len(new)] = vectors[[i for i, _ in new]]
+        keys = [key for _, key in new]
+        self._commit(keys)
+
+        for offset, key in enumerate(keys):
+            self.rows[key] = start + offset
+        self.ids.extend(keys)
+        self.count += len(keys)
+
+    def missing(self, texts):
+        """Unique texts that have no stored vector yet, in first-seen order."""
+        seen = set()
+        result = []
+        for t in texts:
+            key = text_key(t)
+            if key not in self.rows and key not in seen:
+                seen.add(key)
+                result.append(t)
+        return result
+
+    def embed_missing(self, texts, embed_fn, batch_size=16, max_workers=4):
+        """
+        Embeds only the texts the store has not seen, sending up to max_workers batches at once.
+        embed_fn takes a list of texts and returns one vector per text. Each batch is persisted
+        as soon as it arrives, so an interrupted run keeps what it already paid for. A batch whose
+        call raises is reported and skipped; its texts stay missing, so the next run embeds them.
+        Returns the number of texts embedded.
+        """
+        todo = self.missing(texts)
+        if not todo:
+            return 0
+
+        batches = [todo[i:i + batch_size] for i in range(0, len(todo), batch_size)]
+        embedded = 0
+        failed = 0
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = {pool.submit(embed_fn, batch): batch for batch in batches}
+            for future in tqdm(as_completed(futures), total=len(batches), desc="Generating Embeddings"):
+                batch = futures[future]
+                try:
+                    vectors = future.result()
+                except Exception as e:
+                    failed += 1
+                    print(f"[Embedding batch of {len(batch)} texts failed: {e}]")
+                    continue
+                self.add(batch, vectors)
+                embedded += len(batch)
+        if failed:
+            print(f"⚠️ {failed} of {len(batches)} embedding batches failed and will be retried on the next run.")
+        return embedded
+
+    def row_indices(self, texts) -> np.ndarray:
+        return np.fromiter((self.rows[text_key(t)] for t in texts), dtype=np.int64, count=len(texts))
+
+    def load(self, texts) -> np.ndarray:
+        """Vectors for the given texts, in order. Returns the memmap view itself when the order already matches."""
+        idx = self.row_indices(texts)
+        if len(idx) == self.count and np.array_equal(idx, np.arange(self.count)):
+            return self.vectors
+        return self._data[idx]
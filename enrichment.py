@@ -0,0 +1,187 @@
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import openai
+from tqdm import tqdm
+
+import metrics
+from llm_cache import request_key
+
+RETRYABLE_STATUS = {408, 409, 429}
+
+
+class RateLimiter:
+    """
+    Token buckets for requests-per-minute and tokens-per-minute.
+    acquire() blocks until both budgets have room; a budget of None means unlimited.
+    """
+
+    def __init__(self, rpm=None, tpm=None):
+        self.rpm = rpm
+        self.tpm = tpm
+        self._requests = float(rpm or 0)
+        self._tokens = float(tpm or 0)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self._last
+        self._last = now
+        if self.rpm:
+            self._requests = min(self.rpm, self._requests + elapsed * self.rpm / 60)
+        if self.tpm:
+            self._tokens = min(self.tpm, self._tokens + elapsed * self.tpm / 60)
+
+    def acquire(self, tokens=0):
+        if self.tpm:
+            tokens = min(tokens, self.tpm)
+
+        while True:
+            with self._lock:
+                self._refill(time.monotonic())
+                wait = 0.0
+                if self.rpm and self._requests < 1:
+                    wait = max(wait, (1 - self._requests) * 60 / self.rpm)
+                if self.tpm and self._tokens < tokens:
+                    wait = max(wait, (tokens - self._tokens) * 60 / self.tpm)
+                if wait == 0:
+                    if self.rpm:
+                        self._requests -= 1
+                    if self.tpm:
+                        self._tokens -= tokens
+                    return
+            time.sleep(wait)
+
+
+def estimate_tokens(messages, max_tokens=0):
+    """Rough prompt size (about 4 characters per token) plus the completion budget."""
+    chars = sum(len(m.get("content") or "") for m in messages)
+    return chars // 4 + (max_tokens or 0)
+
+
+def is_retryable(error):
+    if isinstance(error, (openai.APIConnectionError, openai.APITimeoutError, openai.RateLimitError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in RETRYABLE_STATUS or error.status_code >= 500
+    return False
+
+
+def retry_after(error):
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    value = response.headers.get("retry-after")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class EnrichmentEngine:
+    """
+    Runs chat completions for the enrichment stages through one shared client,
+    a bounded thread pool and a shared rate limiter, retrying 429/5xx responses with backoff.
+    When a cache is given, complete_text() answers repeated requests from it without calling the API.
+    """
+
+    def __init__(self, client, max_workers=8, rpm=None, tpm=None, max_retries=5, base_delay=1.0, max_delay=30.0,
+                 cache=None):
+        self.client = client
+        self.cache = cache
+        self.max_workers = max_workers
+        self.limiter = RateLimiter(rpm=rpm, tpm=tpm)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    @classmethod
+    def from_env(cls, client, cache=None):
+        """Reads ENRICH_WORKERS, ENRICH_RPM, ENRICH_TPM and ENRICH_MAX_RETRIES."""
+        def env_int(name, default=None):
+            value = os.getenv(name)
+            return int(value) if value else default
+
+        return cls(
+            client,
+            max_workers=env_int("ENRICH_WORKERS", 8),
+            rpm=env_int("ENRICH_RPM"),
+            tpm=env_int("ENRICH_TPM"),
+            max_retries=env_int("ENRICH_MAX_RETRIES", 5),
+            cache=cache,
+        )
+
+    def complete(self, site="enrichment", **kwargs):
+        """
+        Same arguments as client.chat.completions.create(). 'site' names the caller in the LLM metrics.
+        """
+        tokens = estimate_tokens(kwargs.get("messages", []), kwargs.get("max_tokens"))
+        return self._call(self.client.chat.completions.create, site, tokens, **kwargs)
+
+    def embed(self, site="embeddings", **kwargs):
+        """Same arguments as client.embeddings.create(), with the same rate limit and retries as complete()."""
+        inputs = kwargs.get("input", [])
+        tokens = estimate_tokens([{"content": t} for t in ([inputs] if isinstance(inputs, str) else inputs)])
+        return self._call(self.client.embeddings.create, site, tokens, **kwargs)
+
+    def _call(self, create, site, tokens, **kwargs):
+        model = kwargs.get("model", "")
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire(tokens)
+            started = time.perf_counter()
+            try:
+                response = create(**kwargs)
+                metrics.record_llm_call(model, site, time.perf_counter() - started, getattr(response, "usage", None))
+                return response
+            except Exception as e:
+                metrics.record_llm_call(model, site, time.perf_counter() - started, error=True)
+                if attempt == self.max_retries or not is_retryable(e):
+                    raise
+                metrics.llm_retries.inc(model, site)
+                delay = retry_after(e)
+                if delay is None:
+                    delay = min(self.max_delay, self.base_delay * 2 ** attempt) * random.uniform(0.5, 1.0)
+                time.sleep(delay)
+
+    def complete_text(self, site="enrichment", **kwargs):
+        """Like complete(), but returns only the message text and goes through the cache."""
+        if self.cache is None:
+            return self.complete(site=site, **kwargs).choices[0].message.content
+
+        model = kwargs["model"]
+        messages = kwargs["messages"]
+        params = {k: v for k, v in kwargs.items() if k not in ("model", "messages")}
+        key = request_key(model, messages, params)
+
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        text = self.complete(site=site, **kwargs).choices[0].message.content
+        if text is not None:
+            system_prompt = next((m["content"] for m in messages if m["role"] == "system"), "")
+            self.cache.put(key, model, system_prompt, text)
+        return text
+
+    def map(self, fn, items, desc=None):
+        """
+        Applies fn to every item concurrently and returns the results in input order.
+        An item whose call raises gets None, so one bad row never throws away the rest of the stage.
+        """
+        items = list(items)
+        results = [None] * len(items)
+        failed = 0
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = {pool.submit(fn, item): i for i, item in enumerate(items)}
+            for future in tqdm(as_completed(futures), total=len(items), desc=desc):
+                try:
+                    results[futures[future]] = future.result()
+                except Exception as e:
+                    failed += 1
+                    print(f"[Item {futures[future]} failed: {e}]")
+        if failed:
+            print(f"⚠️ {failed} of {len(items)} items failed{f' in {desc!r}' if desc else ''} and were left empty.")
+        return results
@@ -0,0 +1,185 @@
+import re
+import threading
+import warnings
+from datetime import datetime
+
+from dateutil import parser as dateparser
+
+warnings.filterwarnings("ignore", category=dateparser.UnknownTimezoneWarning)
+
+STATE_NAMES = {
+    "AL": "Alabama", "AK": "Alaska", "AZ": "Arizona", "AR": "Arkansas", "CA": "California",
+    "CO": "Colorado", "CT": "Connecticut", "DE": "Delaware", "FL": "Florida", "GA": "Georgia",
+    "HI": "Hawaii", "ID": "Idaho", "IL": "Illinois", "IN": "Indiana", "IA": "Iowa",
+    "KS": "Kansas", "KY": "Kentucky", "LA": "Louisiana", "ME": "Maine", "MD": "Maryland",
+    "MA": "Massachusetts", "MI": "Michigan", "MN": "Minnesota", "MS": "Mississippi", "MO": "Missouri",
+    "MT": "Montana", "NE": "Nebraska", "NV": "Nevada", "NH": "New Hampshire", "NJ": "New Jersey",
+    "NM": "New Mexico", "NY": "New York", "NC": "North Carolina", "ND": "North Dakota", "OH": "Ohio",
+    "OK": "Oklahoma", "OR": "Oregon", "PA": "Pennsylvania", "RI": "Rhode Island", "SC": "South Carolina",
+    "SD": "South Dakota", "TN": "Tennessee", "TX": "Texas", "UT": "Utah", "VT": "Vermont",
+    "VA": "Virginia", "WA": "Washington", "WV": "West Virginia", "WI": "Wisconsin", "WY": "Wyoming",
+    "DC": "District of Columbia",
+}
+
+US_STATES = set(STATE_NAMES)
+
+# Large cities whose name points at a single state. Ambiguous names (Portland, Springfield, ...) are left out.
+CITY_STATES = {
+    "new york city": "NY", "nyc": "NY", "brooklyn": "NY", "manhattan": "NY", "queens": "NY", "the bronx": "NY",
+    "los angeles": "CA", "san francisco": "CA", "san diego": "CA", "san jose": "CA", "sacramento": "CA",
+    "oakland": "CA", "fresno": "CA",
+    "chicago": "IL", "houston": "TX", "dallas": "TX", "san antonio": "TX", "austin": "TX", "fort worth": "TX",
+    "el paso": "TX", "phoenix": "AZ", "tucson": "AZ", "scottsdale": "AZ", "philadelphia": "PA", "pittsburgh": "PA",
+    "seattle": "WA", "spokane": "WA", "tacoma": "WA", "denver": "CO", "detroit": "MI", "grand rapids": "MI",
+    "boston": "MA", "atlanta": "GA", "miami": "FL", "orlando": "FL", "tampa": "FL", "jacksonville": "FL",
+    "las vegas": "NV", "reno": "NV", "nashville": "TN", "memphis": "TN", "new orleans": "LA", "baton rouge": "LA",
+    "minneapolis": "MN", "milwaukee": "WI", "cleveland": "OH", "cincinnati": "OH",
+    "indianapolis": "IN", "louisville": "KY", "baltimore": "MD", "raleigh": "NC",
+    "oklahoma city": "OK", "tulsa": "OK", "albuquerque": "NM", "salt lake city": "UT", "honolulu": "HI",
+    "anchorage": "AK", "omaha": "NE", "boise": "ID", "des moines": "IA", "little rock": "AR",
+    "providence": "RI", "newark": "NJ", "jersey city": "NJ",
+}
+
+# 'City, ST' only counts at the very end of the value, where a signature or a location field puts it.
+# Mid-sentence, "Sure, OK I will switch" or "Verizon, OR T-Mobile" look just the same.
+CITY_STATE_PATTERN = re.compile(r"\b[A-Z][a-z]+(?:[ .'-]+[A-Z][a-z]+){0,2},\s*([A-Z]{2})[\s.!)\]]*$")
+# State codes that are also common words; these only count when the city is in the gazetteer.
+AMBIGUOUS_CODES = {"OK", "IN", "OR", "ME", "HI", "OH", "ID"}
+STATE_NAME_PATTERN = re.compile(
+    r"\b(" + "|".join(sorted((re.escape(n) for n in STATE_NAMES.values()), key=len, reverse=True)) + r")\b",
+    re.IGNORECASE,
+)
+CITY_PATTERN = re.compile(
+    r"\b(" + "|".join(sorted((re.escape(c) for c in CITY_STATES), key=len, reverse=True)) + r")\b",
+    re.IGNORECASE,
+)
+NAME_TO_STATE = {name.lower(): abbr for abbr, name in STATE_NAMES.items()}
+
+ISO_DATE_PATTERN = re.compile(r"^\s*(\d{4})-(\d{1,2})-(\d{1,2})(?:[ T]\d{1,2}:\d{2}(?::\d{2})?)?\s*$")
+US_DATE_PATTERN = re.compile(r"^\s*(\d{1,2})/(\d{1,2})/(\d{4})(?:\s+\d{1,2}:\d{2}(?::\d{2})?)?\s*$")
+# ConsumerAffairs dates, sometimes with the start of the review glued on: "Oct. 30, 2025 Re..."
+MONTH_DATE_PATTERN = re.compile(
+    r"^\s*(Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]*\.?\s+(\d{1,2}),?\s+(\d{4})\b",
+    re.IGNORECASE,
+)
+MONTHS = {m: i for i, m in enumerate(["jan", "feb", "mar", "apr", "may", "jun",
+                                       "jul", "aug", "sep", "oct", "nov", "dec"], start=1)}
+# Free-form parsing is only attempted on short values; long ones are mostly review text.
+MAX_FUZZY_LENGTH = 40
+
+# Two defaults that differ in every field: a component the string does not supply shows up as a mismatch.
+_DEFAULT_A = datetime(1904, 1, 1)
+_DEFAULT_B = datetime(1908, 2, 2)
+
+
+def format_date(dt: datetime) -> str:
+    """Same shape as the LLM date extractor returns: month/day/year like 11/9/2025."""
+    return f"{dt.month}/{dt.day}/{dt.year}"
+
+
+def parse_date_local(value) -> str | None:
+    """
+    Resolves a raw date value without the LLM. Returns None unless the value
+    unambiguously supplies a year, month and day.
+    """
+    if not isinstance(value, str) or not value.strip():
+        return None
+
+    try:
+        m = ISO_DATE_PATTERN.match(value)
+        if m:
+            return format_date(datetime(int(m.group(1)), int(m.group(2)), int(m.group(3))))
+
+        m = US_DATE_PATTERN.match(value)
+        if m:
+            return format_date(datetime(int(m.group(3)), int(m.group(1)), int(m.group(2))))
+
+        m = MONTH_DATE_PATTERN.match(value)
+        if m:
+            return format_date(datetime(int(m.group(3)), MONTHS[m.group(1).lower()], int(m.group(2))))
+
+        if len(value) > MAX_FUZZY_LENGTH:
+            return None
+
+        a = dateparser.parse(value, default=_DEFAULT_A, fuzzy=True)
+        b = dateparser.parse(value, default=_DEFAULT_B, fuzzy=True)
+    except (ValueError, OverflowError):
+        return None
+
+    if a.date() != b.date():
+        return None
+    return format_date(a)
+
+
+def parse_location_local(text) -> str | None:
+    """
+    Resolves a state abbreviation from a trailing 'City, ST', full state names and a city gazetteer.
+    Returns None when nothing matches or when the matches point at more than one state. A trailing code
+    that is also a common word (see AMBIGUOUS_CODES) is only trusted when the gazetteer knows the city.
+    """
+    if not isinstance(text, str) or not text.strip():
+        return None
+
+    found = set()
+    m = CITY_STATE_PATTERN.search(text)
+    # An ambiguous code is left to the gazetteer below: "Tulsa, OK" still resolves from 'Tulsa'.
+    if m and m.group(1) in US_STATES and m.group(1) not in AMBIGUOUS_CODES:
+        found.add(m.group(1))
+    # Names are matched case-insensitively but must be capitalized, so "reno" in running text is not Reno, NV.
+    found.update(NAME_TO_STATE[m.group(1).lower()] for m in STATE_NAME_PATTERN.finditer(text) if m.group(1)[0].isupper())
+    found.update(CITY_STATES[m.group(1).lower()] for m in CITY_PATTERN.finditer(text) if m.group(1)[0].isupper())
+
+    # "New York" is both a state and a city; the city maps to the same state so this stays unambiguous.
+    if len(found) == 1:
+        return found.pop()
+    return None
+
+
+class TierStats:
+    """Counts how many rows each extraction tier resolved."""
+
+    def __init__(self, name):
+        self.name = name
+        self.counts = {"local": 0, "llm": 0, "unresolved": 0}
+        self._lock = threading.Lock()
+
+    def record(self, tier):
+        with self._lock:
+            self.counts[tier] += 1
+
+    def report(self):
+        total = sum(self.counts.values())
+        saved = self.counts["local"]
+        parts = ", ".join(f"{tier}: {count}" for tier, count in self.counts.items())
+        share = f"{saved / total:.1%}" if total else "0.0%"
+        return f"{self.name} — {parts} ({saved} API calls saved, {share} of {total} rows)"
+
+
+def resolve(value, local_fn, llm_fn, stats: TierStats):
+    """Tries the local extractor first and only calls the LLM extractor if it cannot answer."""
+    result = local_fn(value)
+    if result is not None:
+        stats.record("local")
+        return result
+
+    result = llm_fn(value)
+    stats.record("llm" if result is not None else "unresolved")
+    return result
+
+
+if __name__ == "__main__":
+    import argparse
+    import pandas as pd
+
+    parser = argparse.ArgumentParser(description="Report how many rows the local extractors resolve without the LLM.")
+    parser.add_argument("input_file", nargs="?", default="combined_data.csv")
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.input_file)
+
+    dates = df["date"].astype(str).map(parse_date_local)
+    print(f"Dates: {dates.notna().sum()} of {len(df)} resolved locally.")
+
+    missing = df[df["location"].isna()] if "location" in df.columns else df
+    locations = missing["text"].map(parse_location_local)
+    print(f"Locations: {locations.notna().sum()} of {len(missing)} rows without a location resolved locally.")
@@ -0,0 +1,190 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+
+def prompt_hash(model, system_prompt):
+    return hashlib.sha256(json.dumps([model, system_prompt or ""]).encode("utf-8")).hexdigest()
+
+
+def request_key(model, messages, params):
+    """Content address of a completion: model, every message and the generation params."""
+    payload = json.dumps(
+        {"model": model, "messages": messages, "params": params},
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """
+    Persistent SQLite cache of completion text, keyed by request_key().
+    Entries are evicted least-recently-used once there are more than max_entries
+    (checked every evict_every inserts, so the table can briefly run over).
+    Hits only note their use time in memory; those are written in one transaction on the next put,
+    every flush_every hits, and on close(), so a rerun served from the cache does not commit per row.
+    """
+
+    def __init__(self, path="llm_cache.sqlite", max_entries=500_000, evict_every=1000, flush_every=1000):
+        self.path = path
+        self.max_entries = max_entries
+        self.evict_every = evict_every
+        self.flush_every = flush_every
+        self._puts = 0
+        self._used = {}
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # In WAL mode this is still crash-safe; a power loss can only drop the latest commits.
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS completions (
+                key TEXT PRIMARY KEY,
+                prompt_hash TEXT NOT NULL,
+                model TEXT NOT NULL,
+                response TEXT NOT NULL,
+                last_used REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_prompt ON completions (prompt_hash)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON completions (last_used)")
+        # The system prompt behind each prompt_hash, so a changed prompt can be found and invalidated by hash.
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS prompts (
+                prompt_hash TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                system_prompt TEXT NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT response FROM completions WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._used[key] = time.time()
+            if len(self._used) >= self.flush_every:
+                self._flush()
+                self._conn.commit()
+            return row[0]
+
+    def put(self, key, model, system_prompt, response):
+        with self._lock:
+            digest = prompt_hash(model, system_prompt)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO completions VALUES (?, ?, ?, ?, ?)",
+                (key, digest, model, response, time.time()),
+            )
+            self._conn.execute("INSERT OR IGNORE INTO prompts VALUES (?, ?, ?)", (digest, model, system_prompt or ""))
+            self._flush()
+            self._puts += 1
+            if self._puts % self.evict_every == 0:
+                self._evict()
+            self._conn.commit()
+
+    def _flush(self):
+        """Writes the use times of recent hits. Callers hold the lock and commit."""
+        if self._used:
+            self._conn.executemany("UPDATE completions SET last_used = ? WHERE key = ?",
+                                   [(t, k) for k, t in self._used.items()])
+            self._used.clear()
+
+    def close(self):
+        with self._lock:
+            self._flush()
+            self._conn.commit()
+            self._conn.close()
+
+    def _evict(self):
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM completions").fetchone()
+        excess = count - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM completions WHERE key IN "
+                "(SELECT key FROM completions ORDER BY last_used LIMIT ?)",
+                (excess,),
+            )
+
+    def invalidate(self, model=None, system_prompt=None, digest=None):
+        """
+        Drops cached completions. With a prompt 'digest' (see prompts()), or model and system_prompt,
+        only the entries produced by that prompt are removed (use this after editing a prompt);
+        with only model, everything for that model. Returns the number of entries removed.
+        """
+        if digest is None and model is not None and system_prompt is not None:
+            digest = prompt_hash(model, system_prompt)
+        with self._lock:
+            self._flush()
+            if digest is not None:
+                cur = self._conn.execute("DELETE FROM completions WHERE prompt_hash = ?", (digest,))
+                self._conn.execute("DELETE FROM prompts WHERE prompt_hash = ?", (digest,))
+            elif model is not None:
+                cur = self._conn.execute("DELETE FROM completions WHERE model = ?", (model,))
+                self._conn.execute("DELETE FROM prompts WHERE model = ?", (model,))
+            else:
+                cur = self._conn.execute("DELETE FROM completions")
+                self._conn.execute("DELETE FROM prompts")
+            self._conn.commit()
+            return cur.rowcount
+
+    def prompts(self):
+        """One entry per cached prompt: its hash, model, entry count, last use and the start of the prompt."""
+        with self._lock:
+            self._flush()
+            self._conn.commit()
+            rows = self._conn.execute(
+                "SELECT c.prompt_hash, c.model, COUNT(*), MAX(c.last_used), p.system_prompt "
+                "FROM completions c LEFT JOIN prompts p ON p.prompt_hash = c.prompt_hash "
+                "GROUP BY c.prompt_hash ORDER BY MAX(c.last_used) DESC"
+            ).fetchall()
+        return [
+            {"hash": digest, "model": model, "entries": count, "last_used": last_used,
+             "prompt": (prompt or "")[:80]}
+            for digest, model, count, last_used, prompt in rows
+        ]
+
+    def stats(self):
+        with self._lock:
+            (entries,) = self._conn.execute("SELECT COUNT(*) FROM completions").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect or clear the LLM response cache.")
+    parser.add_argument("--path", default="llm_cache.sqlite")
+    parser.add_argument("--clear", action="store_true", help="remove every cached completion")
+    parser.add_argument("--model", help="only clear entries for this model")
+    parser.add_argument("--prompt-hash", help="only clear entries produced by this prompt (see --list)")
+    parser.add_argument("--list", action="store_true", help="list cached prompts with their hashes")
+    args = parser.parse_args()
+
+    cache = LLMCache(args.path)
+    if args.list:
+        for p in cache.prompts():
+            last_used = time.strftime("%Y-%m-%d %H:%M", time.localtime(p["last_used"]))
+            print(f"{p['hash']}  {p['model']}  {p['entries']} entries, last used {last_used}  {p['prompt']!r}")
+    if args.clear or args.model or args.prompt_hash:
+        removed = cache.invalidate(model=args.model, digest=args.prompt_hash)
+        print(f"Removed {removed} cached completions.")
+    print(cache.stats())
+    cache.close()
@@ -0,0 +1,203 @@
+"""
+A local OpenAI-compatible server for load-testing the enrichment stages and the chat endpoints without
+spending API credits. It answers /chat/completions (streamed or not) and /embeddings with plausible
+canned output, after a configurable latency, and fails a configurable share of requests with 429 or 500.
+
+    python llm_stub.py --port 8765 --latency 0.2 --jitter 0.1 --error-rate 0.05
+    NVIDIA_BASE_URL=http://127.0.0.1:8765/v1 NVIDIA_API_KEY=stub python pipeline.py
+"""
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+
+def canned_answer(messages):
+    """Picks an answer that the enrichment prompts will parse and validate, based on the system prompt."""
+    system = next((m["content"] for m in messages if m["role"] == "system"), "").lower()
+    user = next((m["content"] for m in reversed(messages) if m["role"] == "user"), "")
+
+    if "json array" in system:
+        try:
+            reviews = json.loads(user)
+        except ValueError:
+            reviews = []
+        return json.dumps([{"id": r.get("id"), "sentiment": "Negative", "state": "TX", "date": "11/8/2025"}
+                           for r in reviews if isinstance(r, dict)])
+    if "sentiment analysis" in system:
+        return "Negative"
+    if "month/day/year" in system:
+        return "11/8/2025"
+    if "state abbreviation" in system:
+        return "TX"
+    if "topic labeling" in system:
+        return "Billing"
+    return "Most reviews complain about billing errors and dropped calls."
+
+
+class StubStats:
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def record(self, failed):
+        with self._lock:
+            self.requests += 1
+            if failed:
+                self.errors += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {"requests": self.requests, "errors": self.errors}
+
+
+class StubServer:
+    """
+    Runs the stub in a background thread. 'latency' and 'jitter' are in seconds; 'error_rate' is the
+    share of requests answered with an error instead (429 with a Retry-After, or 500, half each).
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, jitter=0.0, error_rate=0.0, dim=16,
+                 retry_after=0.05, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.dim = dim
+        self.retry_after = retry_after
+        self.stats = StubStats()
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def _roll(self):
+        with self._random_lock:
+            delay = self.latency + self._random.uniform(0, self.jitter) if self.jitter else self.latency
+            failure = self._random.random() < self.error_rate
+            status = self._random.choice((429, 500)) if failure else 200
+        return delay, status
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send_json(self, status, payload, headers=()):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in headers:
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                delay, status = stub._roll()
+                time.sleep(delay)
+                stub.stats.record(status != 200)
+
+                if status != 200:
+                    headers = [("Retry-After", str(stub.retry_after))] if status == 429 else []
+                    message = "Rate limit exceeded" if status == 429 else "Internal server error"
+                    return self._send_json(status, {"error": {"message": message, "code": status}}, headers)
+
+                if self.path.endswith("/embeddings"):
+                    return self._embeddings(body)
+                if self.path.endswith("/chat/completions"):
+                    return self._chat(body)
+                self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+            def _embeddings(self, body):
+                inputs = body.get("input", [])
+                inputs = [inputs] if isinstance(inputs, str) else inputs
+                data = []
+                for i, text in enumerate(inputs):
+                    # Deterministic per text, so cached and fresh embeddings agree.
+                    seed = int(hashlib.md5(text.encode("utf-8")).hexdigest()[:8], 16)
+                    vector = np.random.default_rng(seed).normal(size=stub.dim)
+                    data.append({"object": "embedding", "index": i, "embedding": vector.tolist()})
+                self._send_json(200, {"object": "list", "data": data, "model": body.get("model"),
+                                      "usage": {"prompt_tokens": len(inputs), "total_tokens": len(inputs)}})
+
+            def _chat(self, body):
+                answer = canned_answer(body.get("messages", []))
+                prompt_tokens = sum(len(m.get("content") or "") for m in body.get("messages", [])) // 4
+                base = {"id": "stub", "created": int(time.time()), "model": body.get("model")}
+                if not body.get("stream"):
+                    return self._send_json(200, dict(base, object="chat.completion", choices=[
+                        {"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": answer}}
+                    ], usage={"prompt_tokens": prompt_tokens, "completion_tokens": len(answer) // 4 + 1,
+                              "total_tokens": prompt_tokens + len(answer) // 4 + 1}))
+
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                try:
+                    for word in answer.split(" "):
+                        chunk = dict(base, object="chat.completion.chunk", choices=[
+                            {"index": 0, "delta": {"content": word + " "}, "finish_reason": None}])
+                        self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                        self.wfile.flush()
+                    self.wfile.write(b"data: [DONE]\n\n")
+                    self.wfile.flush()
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+                self.close_connection = True
+
+        return Handler
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="llm-stub", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run a local OpenAI-compatible stub server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait before every answer.")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra random delay of up to this many seconds.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests that fail with 429/500.")
+    parser.add_argument("--dim", type=int, default=16, help="Embedding size.")
+    args = parser.parse_args()
+
+    server = StubServer(args.host, args.port, args.latency, args.jitter, args.error_rate, args.dim)
+    print(f"✅ Stub listening on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
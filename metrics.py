@@ -0,0 +1,233 @@
+"""
+In-process metrics in the Prometheus text format, shared by the API server and the enrichment pipeline.
+Recording is a dict lookup and an add under a lock, so it stays cheap on hot paths; METRICS_ENABLED=0
+turns every recording call into a no-op.
+
+The server renders everything on /metrics. The pipeline is a batch job, so it writes its metrics to a
+file at the end of a run (write_textfile) and the server appends that file to its own output.
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+ENABLED = os.getenv("METRICS_ENABLED", "1") != "0"
+
+# Seconds. Covers in-memory filters (sub-millisecond) through slow LLM calls.
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# The route being served on this thread or task, so code below the web layer can label its phases.
+current_route = ContextVar("current_route", default=None)
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    type = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def header(self, name):
+        return [f"# HELP {name} {self.help}", f"# TYPE {name} {self.type}"]
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, *labels, amount=1):
+        if not ENABLED:
+            return
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self, name):
+        with self._lock:
+            items = list(self._values.items())
+        return self.header(name) + [f"{name}{_format_labels(self.labels, k)} {_format_value(v)}" for k, v in items]
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def set(self, *labels, value):
+        if not ENABLED:
+            return
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, *labels, value):
+        if not ENABLED:
+            return
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    @contextmanager
+    def time(self, *labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(*labels, value=time.perf_counter() - started)
+
+    def render(self, name):
+        with self._lock:
+            items = [(k, (list(v[0]), v[1], v[2])) for k, v in self._values.items()]
+        lines = self.header(name)
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                lines.append(f"{name}_bucket{_format_labels(self.labels, key, [('le', _format_value(bound))])} "
+                             f"{cumulative}")
+            lines.append(f"{name}_sum{_format_labels(self.labels, key)} {total}")
+            lines.append(f"{name}_count{_format_labels(self.labels, key)} {count}")
+        return lines
+
+
+class Collected(Metric):
+    """A metric read from elsewhere at scrape time, e.g. a cache's own hit counters. 'fn' returns {labels: value}."""
+
+    def __init__(self, name, help, labels, fn, type="gauge"):
+        super().__init__(name, help, labels)
+        self.type = type
+        self.fn = fn
+
+    def render(self, name):
+        try:
+            items = self.fn().items()
+        except Exception as e:
+            print(f"ERROR: Could not collect metric '{self.name}': {e}")
+            items = []
+        return self.header(name) + [f"{name}{_format_labels(self.labels, k)} {_format_value(v)}" for k, v in items]
+
+
+def _register(metric):
+    with _registry_lock:
+        existing = _registry.get(metric.name)
+        if existing is not None:
+            # Modules can be imported twice (e.g. under test runners); keep the first definition.
+            return existing
+        _registry[metric.name] = metric
+        return metric
+
+
+def counter(name, help, labels=()):
+    return _register(Counter(name, help, labels))
+
+
+def gauge(name, help, labels=()):
+    return _register(Gauge(name, help, labels))
+
+
+def histogram(name, help, labels=(), buckets=DEFAULT_BUCKETS):
+    return _register(Histogram(name, help, labels, buckets))
+
+
+def collected(name, help, labels, fn, type="gauge"):
+    """Registers (or replaces) a metric computed by fn() on every scrape."""
+    metric = Collected(name, help, labels, fn, type)
+    with _registry_lock:
+        _registry[name] = metric
+    return metric
+
+
+def render(prefix=""):
+    with _registry_lock:
+        metrics = list(_registry.values())
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render(prefix + metric.name))
+    return "\n".join(lines) + "\n"
+
+
+def write_textfile(path, prefix=""):
+    """Writes all metrics to 'path' atomically, for batch jobs whose metrics are served by another process."""
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(render(prefix))
+    os.replace(tmp, path)
+
+
+# Shared families. LLM calls are labelled by model and call site, e.g. 'locations' or 'chat'.
+llm_requests = counter("llm_requests_total", "LLM API calls by outcome (ok, error, cancelled).",
+                       ("model", "site", "outcome"))
+llm_retries = counter("llm_retries_total", "LLM API calls retried after a retryable error.", ("model", "site"))
+llm_latency = histogram("llm_request_seconds", "Latency of LLM API calls, including streamed responses.",
+                        ("model", "site"))
+llm_tokens = counter("llm_tokens_total", "Tokens sent (prompt) and received (completion).",
+                     ("model", "site", "kind"))
+phase_latency = histogram("http_request_phase_seconds",
+                          "Time spent per request phase: load (snapshot/reload), filter, serialize, llm.",
+                          ("route", "phase"))
+
+
+def record_llm_call(model, site, seconds, usage=None, error=False, outcome=None):
+    """
+    Records one LLM call. 'usage' is the response's usage object or a (prompt, completion) token pair.
+    'outcome' overrides the ok/error label, e.g. 'cancelled' for a stream the client walked away from.
+    """
+    llm_requests.inc(model, site, outcome or ("error" if error else "ok"))
+    llm_latency.observe(model, site, value=seconds)
+    if usage is None:
+        return
+    if isinstance(usage, tuple):
+        prompt, completion = usage
+    else:
+        prompt, completion = getattr(usage, "prompt_tokens", 0), getattr(usage, "completion_tokens", 0)
+    if prompt:
+        llm_tokens.inc(model, site, "prompt", amount=prompt)
+    if completion:
+        llm_tokens.inc(model, site, "completion", amount=completion)
+
+
+@contextmanager
+def phase(name):
+    """Times a block as phase 'name' of the route in current_route. Outside a request nothing is recorded."""
+    route = current_route.get()
+    if route is None or not ENABLED:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        phase_latency.observe(route, name, value=time.perf_counter() - started)
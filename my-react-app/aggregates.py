@@ -0,0 +1,119 @@
+import pandas as pd
+
+CUBE_DIMENSIONS = ['region', 'state', 'topic_name', 'sentiment', 'day']
+
+BUCKET_FORMATS = {
+    "day": "%Y-%m-%d",
+    "week": "%Y-%m-%d",
+    "month": "%Y-%m",
+}
+
+
+def build_cube(df, dates, regions):
+    """
+    Collapses the review table into counts per (region, state, topic_name, sentiment, day).
+    Rows without a known state are counted under the 'Other' region so that 'All' totals still add up.
+    """
+    state_to_region = {state: name for name, states in regions.items() for state in states}
+
+    def column(name):
+        # Categorical columns can't be filled with a value outside their categories, so go through object.
+        if name not in df.columns:
+            return pd.Series('', index=df.index)
+        return df[name].astype(object).fillna('')
+
+    state = column('state')
+    cube = pd.DataFrame({
+        'region': state.map(state_to_region).fillna('Other'),
+        'state': state,
+        'topic_name': column('topic_name'),
+        'sentiment': column('sentiment'),
+        'day': dates.dt.normalize(),
+    })
+
+    return (
+        cube.groupby(CUBE_DIMENSIONS, dropna=False)
+        .size()
+        .rename('count')
+        .reset_index()
+    )
+
+
+def slice_cube(cube, region="All", topic=None, sentiments=None):
+    mask = pd.Series(True, index=cube.index)
+    if region and region != "All":
+        mask &= cube['region'] == region
+    if topic:
+        mask &= cube['topic_name'].str.lower() == topic.lower()
+    if sentiments:
+        wanted = {s.strip().lower() for s in sentiments}
+        mask &= cube['sentiment'].str.lower().isin(wanted)
+    return cube[mask]
+
+
+def topic_counts(cube, limit=None):
+    counts = (
+        cube[cube['topic_name'] != '']
+        .groupby('topic_name')['count'].sum()
+        .sort_values(ascending=False, kind='stable')
+    )
+    if limit:
+        counts = counts.head(limit)
+    return [{"topic_name": name, "count": int(count)} for name, count in counts.items()]
+
+
+def sentiment_share(cube):
+    counts = cube[cube['sentiment'] != ''].groupby('sentiment')['count'].sum()
+    total = int(counts.sum())
+    positive = int(counts.get('Positive', 0))
+    return {
+        "total": total,
+        "counts": {name: int(count) for name, count in counts.items()},
+        "positive_pct": (positive / total) * 100 if total > 0 else 0,
+    }
+
+
+def topic_trends(cube, bucket="month", top=10):
+    """Returns the top-N topics and one {date, <topic>: count, ...} row per time bucket."""
+    if bucket not in BUCKET_FORMATS:
+        raise ValueError(f"Unknown bucket '{bucket}'. Use one of: {', '.join(BUCKET_FORMATS)}.")
+
+    topics = [t["topic_name"] for t in topic_counts(cube, limit=top)]
+    dated = cube[cube['day'].notna() & cube['topic_name'].isin(topics)]
+    if dated.empty:
+        return {"topics": topics, "series": []}
+
+    days = dated['day']
+    if bucket == "week":
+        days = days - pd.to_timedelta(days.dt.weekday, unit='D')
+    keys = days.dt.strftime(BUCKET_FORMATS[bucket])
+
+    table = (
+        dated.assign(date=keys)
+        .pivot_table(index='date', columns='topic_name', values='count', aggfunc='sum', fill_value=0)
+        .reindex(columns=topics, fill_value=0)
+        .sort_index()
+    )
+
+    series = []
+    for date, row in table.iterrows():
+        point = {"date": date}
+        point.update({topic: int(row[topic]) for topic in topics})
+        series.append(point)
+
+    return {"topics": topics, "series": series}
+
+
+def region_breakdown(cube, regions, top=3):
+    result = []
+    for name in list(regions) + ["Other"]:
+        part = cube[cube['region'] == name]
+        share = sentiment_share(part)
+        result.append({
+            "region": name,
+            "total": int(part['count'].sum()),
+            "sentiment": share["counts"],
+            "positive_pct": share["positive_pct"],
+            "top_topics": topic_counts(part, limit=top),
+        })
+    return result
@@ -1,67 +1,147 @@
 import json
-from flask import Flask, request, jsonify
+import os
+import sys
+from functools import wraps
+from flask import Flask, Response, request, jsonify, g
 from flask_cors import CORS
 from dotenv import load_dotenv
-from chatbot import get_client, get_chat_response
-import pandas as pd
-import os
+
+# metrics.py lives at the repository root; it is shared with the enrichment pipeline.
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import metrics
+from chatbot import context, get_client, complete_chat, completion_params, stream_chat_response
+from dataset import REGIONS, ReviewStore
+from retrieval import Retriever, compact_aggregates, format_reviews
+from summary_cache import SummaryCache, prompt_hash
+from search_index import SearchIndex
+import threading
+import aggregates
+import time
 
 load_dotenv()
 
 app = Flask(__name__)
-CORS(app) 
+CORS(app, expose_headers=["ETag"])
 client = get_client()
 if isinstance(client, str):
     print(client)
     exit()
 
 
-df = pd.read_csv("../tmobile_reviews_labeled.csv")
-sampled = df.sample(n=10, random_state=42) 
+# Point this at the .parquet written by 'python dataset.py' for faster loads (needs pyarrow).
+store = ReviewStore(os.getenv("REVIEWS_PATH", "../tmobile_reviews_labeled.csv"), phase=metrics.phase)
+search_index = SearchIndex(os.getenv("SEARCH_INDEX_PATH", "../reviews_search.pkl"))
+retriever = Retriever(store, search_index)
+
+
+def keep_search_index_fresh():
+    """Indexes the reviews of every new dataset version as soon as it is loaded."""
+    while True:
+        snap = store.snapshot()
+        try:
+            started = time.perf_counter()
+            added = search_index.sync(snap)
+            if added:
+                print(f"Indexed {added} new reviews for search in {time.perf_counter() - started:.1f}s.")
+        except Exception as e:
+            print(f"ERROR: Could not update the search index: {e}")
+        store.wait_for_change(snap.version)
 
-data_string = json.dumps(sampled.to_dict(orient="records"), indent=2)
 
-system_prompt = (
+INSTRUCTIONS = (
     "You are a T-Mobile internal assistant designed to assist T-Mobile "
     "use customer feedback to produce actionable insight. "
-    "Use the data below to summarize the common complaint that T-Mobile users are facing.\n\n"
-    "CUSTOMER FEEDBACK DATA:\n"
-    f"{data_string}\n\n"
+    "Use the aggregates and the customer reviews below, which were retrieved for the latest question, "
+    "to summarize the common complaints that T-Mobile users are facing.\n\n"
     "After your initial summary, answer any follow-up questions the user has about the data."
     "All responses should be at short and concise and be at most 3 sentences."
 )
 
-REGIONS = {
-    "South": ["LA", "FL", "OK", "TX", "GA", "AR"],
-    "Midwest": ["IL", "MI", "OH", "IN", "WI", "MN"],
-    "West": ["NV", "CA", "AZ", "WA", "OR"],
-    "Northeast": ["NY", "PA", "NJ", "MA", "CT"]
-}
-
-def filter_and_save_by_region(region_name, 
-                             input_file='../tmobile_reviews_labeled.csv', 
-                             output_file='filtered_data.csv'):
-    df = pd.read_csv(input_file)
-    
+
+def build_system_prompt(snap, question, region="All", topic=None, k=8):
+    """Instructions plus compact aggregates and the top-k reviews for this question, region and topic."""
+    reviews = retriever.search(snap, question, region=region, topic=topic, k=k)
+    return (
+        f"{INSTRUCTIONS}\n\n"
+        f"AGGREGATES:\n{compact_aggregates(snap.cube, region, topic)}\n\n"
+        f"RELEVANT REVIEWS:\n{format_reviews(reviews)}"
+    )
+
+request_latency = metrics.histogram("http_request_seconds",
+                                    "Time to build each response; for streams, until the stream starts.",
+                                    ("route", "method", "status"))
+
+
+@app.before_request
+def start_request_timer():
+    g.started = time.perf_counter()
+    g.route_token = metrics.current_route.set(request.url_rule.rule if request.url_rule else "unmatched")
+
+
+@app.after_request
+def record_request_latency(response):
+    route = metrics.current_route.get() or "unmatched"
+    request_latency.observe(route, request.method, str(response.status_code),
+                            value=time.perf_counter() - g.started)
+    return response
+
+
+@app.teardown_request
+def clear_request_route(exc):
+    token = g.pop('route_token', None)
+    if token is not None:
+        metrics.current_route.reset(token)
+
+
+def filter_and_save_by_region(region_name, output_file='filtered_data.csv', save=False):
+    filtered_df = store.filter_region(region_name)
+
+    if save:
+        filtered_df.to_csv(output_file, index=False)
+
     if region_name == "All":
-        df.to_csv(output_file, index=False)
-        return f"Selected 'All'. Found {len(df)} records."
+        return filtered_df, f"Selected 'All'. Found {len(filtered_df)} records."
+    return filtered_df, f"Filtered for {region_name}. Found {len(filtered_df)} records."
 
-    if 'location' not in df.columns:
-        raise KeyError("The CSV file is missing the 'location' column.")
-        
-    df.dropna(subset=['location'], inplace=True)
-    
-    df['state'] = df['location'].astype(str).str.split(', ').str[1]
-    
-    states_to_filter = REGIONS.get(region_name)
-    
-    if not states_to_filter:
-        raise ValueError(f"Region '{region_name}' not found in REGIONS map.")
 
-    filtered_df = df[df['state'].isin(states_to_filter)].copy()
-    filtered_df.to_csv(output_file, index=False)
-    return f"Filtered for {region_name}. Found {len(filtered_df)} records."
+def serialize_rows(df):
+    with metrics.phase("serialize"):
+        return json.loads(df.to_json(orient='records'))
+
+
+def versioned(view):
+    """
+    Tags a GET response with the dataset version as its ETag and answers a
+    matching If-None-Match with 304, so unchanged data is never re-sent.
+    The snapshot is taken once and handed to the view as g.snapshot, so the body
+    and the ETag always come from the same version, even if a reload lands meanwhile.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g.snapshot = store.snapshot()
+        version = g.snapshot.version
+        if request.if_none_match.contains(version):
+            response = Response(status=304)
+        else:
+            response = view(*args, **kwargs)
+            if isinstance(response, tuple) or response.status_code != 200:
+                return response
+        response.set_etag(version)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+    return wrapper
+
+
+def parse_filters(args):
+    """Reads the shared filter parameters (region, topic, sentiment, start, end) from a query string."""
+    sentiment = args.get('sentiment')
+    return {
+        "region": args.get('region', 'All'),
+        "topic": args.get('topic') or None,
+        "sentiments": tuple(s for s in sentiment.split(',') if s) if sentiment else None,
+        "start": args.get('start') or None,
+        "end": args.get('end') or None,
+    }
 
 
 
@@ -70,16 +150,24 @@ def handle_filter_request():
     """
     This endpoint is triggered by your 'filter' button.
     It expects a 'region' parameter (e.g., 'South', 'Midwest').
+    The matching rows are returned in the response; nothing is shared between requests.
+    Pass 'save=1' to also export them to 'filtered_data.csv'.
     """
     region_name = request.args.get('region')
+    save = request.args.get('save', '0') == '1'
     
     if not region_name:
         return jsonify({"status": "error", "message": "No 'region' parameter provided."}), 400
         
     try:
-        message = filter_and_save_by_region(region_name)
-        
-        return jsonify({"status": "success", "message": message})
+        filtered_df, message = filter_and_save_by_region(region_name, save=save)
+
+        return jsonify({
+            "status": "success",
+            "message": message,
+            "count": len(filtered_df),
+            "data": serialize_rows(filtered_df),
+        })
         
     except FileNotFoundError as e:
         print(f"ERROR: File not found: {e}")
@@ -105,45 +193,376 @@ def handle_filter_request():
 
 
 @app.route('/get-filtered-data', methods=['GET'])
+@versioned
 def get_filtered_data_for_graphs():
     """
-    This endpoint reads the 'filtered_data.csv' file and returns
-    its contents as JSON, ready to be used by charts.
+    Returns the reviews matching the 'region', 'topic', 'sentiment' (comma separated),
+    'start' and 'end' query parameters as JSON, ready to be used by charts.
     """
     try:
-        df = pd.read_csv('filtered_data.csv')
-        data_json = df.to_json(orient='records')
-        
-        import json
-        return jsonify(json.loads(data_json))
-        
-    except FileNotFoundError:
-        return jsonify({"error": "No filtered data found. Please select a region first."}), 404
+        data_json = store.query_json(g.snapshot, **parse_filters(request.args))
+        return Response(data_json, mimetype='application/json')
+
+    except FileNotFoundError as e:
+        return jsonify({"error": f"Data file not found: {e.filename}"}), 404
+    except (KeyError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/posts', methods=['GET'])
+@versioned
+def get_posts():
+    """
+    One page of reviews for the topic page, read from indexes presorted at load time.
+    Takes 'region', 'topic', 'sentiment' (comma separated), 'sort' ('newest' or 'likes'),
+    'limit' and the 'cursor' returned with the previous page.
+    """
+    try:
+        filters = parse_filters(request.args)
+        limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+        data_json = store.page_json(
+            sort=request.args.get('sort', 'newest'),
+            region=filters["region"],
+            topic=filters["topic"],
+            sentiments=filters["sentiments"],
+            cursor=request.args.get('cursor') or None,
+            limit=limit,
+            snap=g.snapshot,
+        )
+        return Response(data_json, mimetype='application/json')
+
+    except LookupError as e:
+        return jsonify({"error": str(e)}), 409
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/search', methods=['GET'])
+@versioned
+def search_reviews():
+    """
+    Full-text search over review text, ranked with BM25. Takes 'q', the usual 'region', 'topic'
+    and 'sentiment' filters, and 'limit'/'offset' for paging. Each result gets its BM25 score
+    as 'relevance', since 'score' is already the review's vote count.
+    """
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({"error": "No 'q' parameter provided."}), 400
+
+    try:
+        filters = parse_filters(request.args)
+        region = filters["region"]
+        if region != "All" and region not in REGIONS:
+            raise ValueError(f"Region '{region}' not found in REGIONS map.")
+        limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+        offset = max(request.args.get('offset', 0, type=int), 0)
+
+        snap = g.snapshot
+        with metrics.phase("filter"):
+            rows, scores, total = search_index.search(snap, query, region, filters["topic"],
+                                                      filters["sentiments"], limit=limit, offset=offset)
+        results = serialize_rows(snap.df.iloc[rows])
+        for result, score in zip(results, scores):
+            result["relevance"] = round(float(score), 4)
+        return jsonify({"query": query, "total": total, "results": results})
+
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+def sliced_cube(args):
+    filters = parse_filters(args)
+    region = filters["region"]
+    if region != "All" and region not in REGIONS:
+        raise ValueError(f"Region '{region}' not found in REGIONS map.")
+    return aggregates.slice_cube(g.snapshot.cube, region, filters["topic"], filters["sentiments"])
+
+
+@app.route('/api/aggregates/topics', methods=['GET'])
+@versioned
+def get_topic_counts():
+    """Review counts per topic, most common first. Accepts the same filters as /get-filtered-data."""
+    try:
+        limit = request.args.get('limit', type=int)
+        return jsonify(aggregates.topic_counts(sliced_cube(request.args), limit=limit))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+@app.route('/api/aggregates/sentiment', methods=['GET'])
+@versioned
+def get_sentiment_share():
+    """Sentiment counts and the share of positive reviews, used by the satisfaction gauge."""
+    try:
+        return jsonify(aggregates.sentiment_share(sliced_cube(request.args)))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/aggregates/trends', methods=['GET'])
+@versioned
+def get_topic_trends():
+    """Counts of the top-N topics per 'day', 'week' or 'month' bucket."""
+    try:
+        bucket = request.args.get('bucket', 'month')
+        top = request.args.get('top', 10, type=int)
+        return jsonify(aggregates.topic_trends(sliced_cube(request.args), bucket=bucket, top=top))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/aggregates/regions', methods=['GET'])
+@versioned
+def get_region_breakdown():
+    """Totals, sentiment and top topics for every region."""
+    try:
+        return jsonify(aggregates.region_breakdown(g.snapshot.cube, REGIONS))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/events', methods=['GET'])
+def dataset_events():
+    """
+    Server-Sent Events stream. Emits 'dataset-changed' with the new version and row
+    count whenever the underlying file is reloaded, and a comment every 15s to keep the connection open.
+    """
+    def stream():
+        version = store.version
+        yield f"retry: 5000\nevent: ready\ndata: {json.dumps({'version': version})}\n\n"
+        while True:
+            new_version = store.wait_for_change(version, timeout=15)
+            if new_version is None:
+                yield ": keep-alive\n\n"
+                continue
+            version = new_version
+            payload = {"version": version, "count": len(store.df)}
+            yield f"event: dataset-changed\ndata: {json.dumps(payload)}\n\n"
+
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+# The question chatbot.jsx opens with; its answers are precomputed for every region and topic.
+INITIAL_QUESTION = "What are the main issues users are reporting?"
+summaries = SummaryCache(max_entries=int(os.getenv("SUMMARY_CACHE_SIZE", "512")),
+                         ttl=float(os.getenv("SUMMARY_CACHE_TTL", str(6 * 3600))))
+
+
+def chat_messages(data, snap):
+    """
+    Validates a chat request body. Returns the messages to send, with the retrieval system prompt first and
+    already fitted to the context budget, and the answer's cache key: (region, topic, dataset version, prompt hash).
+    """
+    if not isinstance(data, dict):
+        raise ValueError("The request body must be a JSON object.")
+    user_messages = data.get('messages', [])
+    if not user_messages:
+        raise ValueError("No messages provided")
+    if not isinstance(user_messages, list):
+        raise ValueError("'messages' must be a list.")
+    for i, m in enumerate(user_messages):
+        if not isinstance(m, dict) or m.get('role') not in ('user', 'assistant') \
+                or not isinstance(m.get('content'), str):
+            raise ValueError(f"Message {i} must have a 'role' of 'user' or 'assistant' and a string 'content'.")
+
+    region = data.get('region') or "All"
+    if region != "All" and region not in REGIONS:
+        raise ValueError(f"Region '{region}' not found.")
+    # Topic filters are case-insensitive; normalizing keeps the prompt, and so the cache key, the same too.
+    topic = (data.get('topic') or "").lower() or None
+    question = next((m['content'] for m in reversed(user_messages) if m.get('role') == 'user'), "")
+    system_prompt = build_system_prompt(snap, question, region=region, topic=topic)
+
+    api_messages = context.fit([
+        {"role": "system", "content": system_prompt}
+    ] + user_messages)
+    key = (region, topic, snap.version, prompt_hash(completion_params(api_messages, fitted=True)))
+    return api_messages, key
+
+
+def summary_scopes(snap, max_topics=10):
+    """Every (region, topic) pair the chatbot can open on: each region on its own and with each of its top topics."""
+    for region in ["All", *REGIONS]:
+        yield region, None
+        for t in aggregates.topic_counts(aggregates.slice_cube(snap.cube, region), limit=max_topics):
+            yield region, t["topic_name"]
+
+
+def warm_summaries():
+    """Precomputes the opening answer for every scope, again after every dataset change."""
+    version = None
+    while True:
+        snap = store.snapshot()
+        if snap.version != version:
+            version = snap.version
+            started = time.perf_counter()
+            for region, topic in summary_scopes(snap):
+                if store.version != version:
+                    break
+                body = {"messages": [{"role": "user", "content": INITIAL_QUESTION}], "region": region, "topic": topic}
+                try:
+                    api_messages, key = chat_messages(body, snap)
+                    summaries.get_or_compute(key, lambda: complete_chat(client, api_messages, site="warm_summaries", fitted=True))
+                except Exception as e:
+                    print(f"ERROR: Could not precompute the summary for {region}/{topic}: {e}")
+            print(f"Summaries warmed for version {version} in {time.perf_counter() - started:.1f}s. {summaries.stats()}")
+        store.wait_for_change(version)
+
+
+_background_lock = threading.Lock()
+_background_pid = None
+
+
+def start_background_tasks(warm=None):
+    """
+    Starts the dataset watcher, the search indexer and, if 'warm', the summary warmer, once per process.
+    Warming costs one LLM call per scope (about 55) on every start and every dataset change, so it is opt-in
+    (WARM_SUMMARIES=1). The process id is checked rather than a flag, so a worker forked from a process
+    that already started them can start its own; with gunicorn --preload, call this from a post_fork hook.
+    """
+    global _background_pid
+    if _background_pid == os.getpid():
+        return
+    with _background_lock:
+        if _background_pid == os.getpid():
+            return
+        _background_pid = os.getpid()
+    if warm is None:
+        warm = os.getenv("WARM_SUMMARIES", "0") == "1"
+    store.start_watcher()
+    threading.Thread(target=keep_search_index_fresh, name="search-indexer", daemon=True).start()
+    if warm:
+        threading.Thread(target=warm_summaries, name="summary-warmer", daemon=True).start()
+
+
 @app.route('/api/chat', methods=['POST'])
 def chat():
     if isinstance(client, str):
         return jsonify({"error": client}), 500
 
     try:
-        data = request.json
-        user_messages = data.get('messages', [])
-
-        if not user_messages:
-            return jsonify({"error": "No messages provided"}), 400
-        
-        api_messages = [
-            {"role": "system", "content": system_prompt}
-        ] + user_messages
-        bot_response = get_chat_response(client, api_messages)
-        return jsonify({"response": bot_response})
+        snap = store.snapshot()
+        with metrics.phase("retrieve"):
+            api_messages, key = chat_messages(request.json or {}, snap)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
+    try:
+        with metrics.phase("llm"):
+            bot_response = summaries.get_or_compute(key, lambda: complete_chat(client, api_messages, fitted=True))
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        bot_response = f"An error occurred: {e}"
+    return jsonify({"response": bot_response})
+
+
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """
+    Same request as /api/chat, answered as Server-Sent Events: one 'data' event per token chunk
+    ({"delta": "..."}), then 'done'. Upstream errors are sent as an 'error' event.
+    If the client disconnects, the generator is closed and the upstream completion is cancelled.
+    Cached answers are sent as a single chunk; completed streams are added to the cache.
+    """
+    if isinstance(client, str):
+        return jsonify({"error": client}), 500
+
+    try:
+        snap = store.snapshot()
+        with metrics.phase("retrieve"):
+            api_messages, key = chat_messages(request.json or {}, snap)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    def stream():
+        cached = summaries.lookup(key)
+        if cached is not None:
+            yield f"data: {json.dumps({'delta': cached})}\n\n"
+            yield "event: done\ndata: {}\n\n"
+            return
+
+        parts = []
+        upstream = stream_chat_response(client, api_messages, fitted=True)
+        try:
+            for delta in upstream:
+                parts.append(delta)
+                yield f"data: {json.dumps({'delta': delta})}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+            return
+        finally:
+            # Runs on GeneratorExit too, so a client that disconnects cancels the completion right away.
+            upstream.close()
+        if parts:
+            summaries.put(key, "".join(parts))
+        yield "event: done\ndata: {}\n\n"
+
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+def cache_lookups():
+    stats = summaries.stats()
+    return {
+        ("summaries", "hit"): stats["hits"],
+        ("summaries", "miss"): stats["misses"],
+        ("query_json", "hit"): store.cache_hits,
+        ("query_json", "miss"): store.cache_misses,
+    }
+
+
+metrics.collected("cache_lookups_total", "Cache lookups by cache and result.", ("cache", "result"),
+                  cache_lookups, type="counter")
+metrics.collected("cache_entries", "Entries currently held per cache.", ("cache",),
+                  lambda: {("summaries",): summaries.stats()["entries"], ("query_json",): store.cache_size()})
+metrics.collected("dataset_rows", "Rows in the loaded dataset.", (), lambda: {(): len(store.df)})
+metrics.collected("dataset_load_seconds", "How long the last (re)load of the dataset took.", (),
+                  lambda: {(): store.load_seconds or 0.0})
+metrics.collected("search_index_documents", "Documents in the full-text search index.", (),
+                  lambda: {(): len(search_index)})
+
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """
+    Metrics in the Prometheus text format. The enrichment pipeline's last run (written by
+    'python pipeline.py' to PIPELINE_METRICS_PATH) is appended with a 'pipeline_' prefix.
+    """
+    body = metrics.render()
+    pipeline_path = os.getenv("PIPELINE_METRICS_PATH", "../pipeline_metrics.prom")
+    if os.path.exists(pipeline_path):
+        with open(pipeline_path, encoding="utf-8") as f:
+            body += f.read()
+    return Response(body, mimetype='text/plain; version=0.0.4')
 
 
 if __name__ == '__main__':
-    app.run(debug=True, port=5001)
\ No newline at end of file
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the review API.")
+    parser.add_argument("--port", type=int, default=5001)
+    parser.add_argument("--warm-summaries", action="store_true", default=os.getenv("WARM_SUMMARIES", "0") == "1",
+                        help="Precompute the chatbot's opening answers for every scope (also WARM_SUMMARIES=1).")
+    parser.add_argument("--debug", action="store_true", default=os.getenv("FLASK_DEBUG", "0") == "1",
+                        help="Run with the debugger and reloader (also FLASK_DEBUG=1).")
+    args = parser.parse_args()
+
+    # With --debug the reloader runs this file twice; only the child that serves requests starts the threads.
+    if not args.debug or os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_background_tasks(warm=args.warm_summaries)
+    app.run(debug=args.debug, port=args.port)
+else:
+    # Imported by a WSGI server (gunicorn app:app, flask run): there is no __main__ block to start them.
+    start_background_tasks()
\ No newline at end of file
@@ -0,0 +1,124 @@
+import re
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except ImportError:
+    _encoding = None
+
+# Per-message overhead of the chat format (role, separators), as counted by OpenAI-style APIs.
+MESSAGE_OVERHEAD = 4
+
+
+def count_tokens(text: str) -> int:
+    """Exact with tiktoken installed, otherwise about 4 characters per token."""
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return len(text) // 4 + 1
+
+
+def message_tokens(message) -> int:
+    return count_tokens(message.get("content") or "") + MESSAGE_OVERHEAD
+
+
+def truncate_to_tokens(text: str, tokens: int) -> str:
+    if count_tokens(text) <= tokens:
+        return text
+    if _encoding is not None:
+        return _encoding.decode(_encoding.encode(text)[:tokens]) + "…"
+    return text[:tokens * 4] + "…"
+
+
+def summarize_turn(message, max_chars=160) -> str:
+    """One line per dropped turn: who said it and how it started."""
+    text = re.sub(r"\s+", " ", message.get("content") or "").strip()
+    if len(text) > max_chars:
+        text = text[:max_chars].rsplit(" ", 1)[0] + "…"
+    speaker = "User asked" if message.get("role") == "user" else "Assistant answered"
+    return f"- {speaker}: {text}"
+
+
+class ContextManager:
+    """
+    Fits a chat history into a token budget. Leading system messages (instructions and retrieved data)
+    are always kept. Then the newest turns are kept for as long as they fit; the turns before them are
+    folded into one rolling summary message of at most 'summary_budget' tokens, so the prompt size
+    stays bounded however long the conversation gets.
+    """
+
+    def __init__(self, budget=3000, summary_budget=300):
+        self.budget = budget
+        self.summary_budget = summary_budget
+
+    def summarize(self, turns, budget=None) -> str:
+        """Extractive and deterministic, so equal histories still produce equal prompts (and cache hits)."""
+        budget = self.summary_budget if budget is None else budget
+        lines = []
+        used = count_tokens("Earlier in this conversation:\n")
+        # Newest dropped turns matter most; older lines go first when the summary is full.
+        for message in reversed(turns):
+            line = summarize_turn(message)
+            cost = count_tokens(line + "\n")
+            if used + cost > budget:
+                break
+            lines.append(line)
+            used += cost
+        return "Earlier in this conversation:\n" + "\n".join(reversed(lines))
+
+    def fit(self, messages):
+        split = 0
+        while split < len(messages) and messages[split].get("role") == "system":
+            split += 1
+        system, turns = list(messages[:split]), list(messages[split:])
+
+        remaining = self.budget - sum(message_tokens(m) for m in system)
+        if not turns:
+            return system
+
+        kept = []
+        for message in reversed(turns):
+            cost = message_tokens(message)
+            if cost > remaining - (self.summary_budget if len(kept) < len(turns) - 1 else 0):
+                break
+            kept.append(message)
+            remaining -= cost
+        kept.reverse()
+
+        if not kept:
+            return self.fit_latest(system, turns)
+
+        dropped = turns[:len(turns) - len(kept)]
+        if dropped:
+            system.append({"role": "system", "content": self.summarize(dropped)})
+        return system + kept
+
+    def fit_latest(self, system, turns):
+        """
+        The latest message does not fit next to the system prompt. It is never cut: the summary of the
+        earlier turns shrinks first, then the system prompt is cut from its end (the retrieved reviews).
+        Raises ValueError if the message alone is over the budget.
+        """
+        latest = turns[-1]
+        room = self.budget - message_tokens(latest)
+        if room < 0:
+            raise ValueError(f"The message is too long ({message_tokens(latest)} tokens, "
+                             f"the limit is {self.budget}).")
+
+        summary = []
+        summary_room = min(self.summary_budget, room - sum(message_tokens(m) for m in system)) - MESSAGE_OVERHEAD
+        if len(turns) > 1 and summary_room > count_tokens("Earlier in this conversation:\n"):
+            summary = [{"role": "system", "content": self.summarize(turns[:-1], budget=summary_room)}]
+            room -= message_tokens(summary[0])
+
+        fitted = []
+        for message in system:
+            cost = message_tokens(message)
+            if cost > room:
+                # One token of slack for the ellipsis truncate_to_tokens adds.
+                if room > MESSAGE_OVERHEAD + 1:
+                    content = truncate_to_tokens(message.get("content") or "", room - MESSAGE_OVERHEAD - 1)
+                    fitted.append(dict(message, content=content))
+                break
+            fitted.append(message)
+            room -= cost
+        return fitted + summary + [latest]
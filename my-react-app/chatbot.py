@@ -1,12 +1,19 @@
 import os
-import json
-import dotenv
+import time
 from openai import OpenAI
-from typing import Dict, Any, List, Union
+from typing import Dict, Any, Iterator, List, Union
 from dotenv import load_dotenv
+from chat_context import ContextManager, count_tokens, message_tokens
+import metrics
 
 load_dotenv()
 
+MODEL = "qwen/qwen3-next-80b-a3b-instruct"
+context = ContextManager(
+    budget=int(os.getenv("CHAT_CONTEXT_BUDGET", "3000")),
+    summary_budget=int(os.getenv("CHAT_SUMMARY_BUDGET", "300")),
+)
+
 
 def get_client() -> Union[OpenAI, str]:
     api_key = os.getenv("NVIDIA_API_KEY")
@@ -14,25 +21,69 @@ def get_client() -> Union[OpenAI, str]:
         return "Error: The 'NVIDIA_API_KEY' environment variable is not set. Make sure it's in your .env file."
 
     client = OpenAI(
-        base_url="https://integrate.api.nvidia.com/v1",
+        base_url=os.getenv("NVIDIA_BASE_URL", "https://integrate.api.nvidia.com/v1"),
         api_key=api_key
     )
     return client
 
+def completion_params(messages: List[Dict[str, str]], fitted: bool = False) -> Dict[str, Any]:
+    """Pass fitted=True for messages that already went through context.fit, so the history is not counted again."""
+    return dict(
+        model=MODEL,
+        messages=messages if fitted else context.fit(messages),
+        temperature=0.3,
+        top_p=0.9,
+        max_tokens=128,
+    )
+
+
+def complete_chat(client: OpenAI, messages: List[Dict[str, str]], site: str = "chat", fitted: bool = False) -> str:
+    """Like get_chat_response, but raises instead of returning the error as text."""
+    started = time.perf_counter()
+    try:
+        response = client.chat.completions.create(**completion_params(messages, fitted))
+    except Exception:
+        metrics.record_llm_call(MODEL, site, time.perf_counter() - started, error=True)
+        raise
+    metrics.record_llm_call(MODEL, site, time.perf_counter() - started, getattr(response, "usage", None))
+    if response.choices and response.choices[0].message and response.choices[0].message.content:
+        return response.choices[0].message.content
+    raise RuntimeError("No response received from the API.")
+
+
 def get_chat_response(client: OpenAI, messages: List[Dict[str, str]]) -> str:
     try:
-        response = client.chat.completions.create(
-            model="qwen/qwen3-next-80b-a3b-instruct",
-            messages=messages[-5:], 
-            temperature=0.3,
-            top_p=0.9,
-            max_tokens=128,
-        )
-        
-        if response.choices and response.choices[0].message:
-            return response.choices[0].message.content
-        else:
-            return "Error: No response received from the API."
-            
+        return complete_chat(client, messages)
+    except RuntimeError as e:
+        return f"Error: {e}"
     except Exception as e:
         return f"An error occurred: {e}"
+
+
+def stream_chat_response(client: OpenAI, messages: List[Dict[str, str]], site: str = "chat_stream",
+                         fitted: bool = False) -> Iterator[str]:
+    """
+    Yields the completion piece by piece as the model produces it.
+    Closing the generator (e.g. when the HTTP client goes away) closes the upstream stream too.
+    Streams carry no usage, so the token metrics for them are counted locally.
+    """
+    params = completion_params(messages, fitted)
+    started = time.perf_counter()
+    parts = []
+    outcome = "error"
+    try:
+        stream = client.chat.completions.create(**params, stream=True)
+        try:
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta and chunk.choices[0].delta.content:
+                    parts.append(chunk.choices[0].delta.content)
+                    yield parts[-1]
+            outcome = "ok"
+        except GeneratorExit:
+            outcome = "cancelled"
+            raise
+        finally:
+            stream.close()
+    finally:
+        usage = (sum(message_tokens(m) for m in params["messages"]), count_tokens("".join(parts)) if parts else 0)
+        metrics.record_llm_call(MODEL, site, time.perf_counter() - started, usage, outcome=outcome)
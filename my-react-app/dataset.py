@@ -0,0 +1,424 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import nullcontext
+import numpy as np
+import pandas as pd
+from aggregates import build_cube
+
+REGIONS = {
+    "South": ["LA", "FL", "OK", "TX", "GA", "AR"],
+    "Midwest": ["IL", "MI", "OH", "IN", "WI", "MN"],
+    "West": ["NV", "CA", "AZ", "WA", "OR"],
+    "Northeast": ["NY", "PA", "NJ", "MA", "CT"]
+}
+
+# Low-cardinality columns, stored and held as categoricals.
+CATEGORICAL_COLUMNS = ['location', 'state', 'topic_name', 'sentiment', 'date']
+# Everything the filters and the aggregate cube need. The free-text columns are not in here.
+AGGREGATE_COLUMNS = ['location', 'topic_name', 'sentiment', 'date', 'parsed_date']
+# Orders the /posts feed can be read in.
+SORT_KEYS = ('newest', 'likes')
+
+
+def read_reviews(path, columns=None):
+    """
+    Reads a review table from Parquet or CSV, loading only 'columns' when given.
+    Low-cardinality columns come back as categoricals either way.
+    """
+    if path.endswith('.parquet'):
+        if columns is not None:
+            import pyarrow.parquet as pq
+            available = pq.read_schema(path).names
+            columns = [c for c in columns if c in available]
+        df = pd.read_parquet(path, columns=columns)
+    else:
+        usecols = None if columns is None else (lambda c: c in columns)
+        df = pd.read_csv(path, usecols=usecols, dtype={c: 'category' for c in CATEGORICAL_COLUMNS})
+
+    for c in CATEGORICAL_COLUMNS:
+        if c in df.columns and not isinstance(df[c].dtype, pd.CategoricalDtype):
+            df[c] = df[c].astype('category')
+    return df
+
+
+def state_column(location):
+    """'City, ST' -> 'ST', split once per distinct location instead of once per row."""
+    location = location.astype('category')
+    states = location.cat.categories.astype(str).str.split(', ').str[1]
+    # The extra trailing None is what code -1 (a missing location) picks up.
+    lookup = np.append(np.asarray(states, dtype=object), None)
+    return pd.Series(lookup[location.cat.codes.to_numpy()], index=location.index, dtype='category')
+
+
+def date_column(date):
+    """
+    Parses a categorical 'date' column once per distinct value. pd.to_datetime would otherwise hand back
+    a categorical (via its duplicate cache) on large inputs, which can't be range-compared.
+    """
+    date = date.astype('category')
+    parsed = pd.to_datetime(date.cat.categories.astype(str), errors='coerce', format='mixed')
+    lookup = np.append(parsed.to_numpy(dtype='datetime64[ns]'), np.datetime64('NaT', 'ns'))
+    return pd.Series(lookup[date.cat.codes.to_numpy()], index=date.index)
+
+
+def write_columnar(df, path):
+    """
+    Writes the review table as Parquet with categorical columns and a parsed 'parsed_date' column.
+    The original 'date' strings are kept so the rows still serialize the way the front end expects.
+    """
+    df = df.copy()
+    if 'date' in df.columns:
+        df['parsed_date'] = pd.to_datetime(df['date'], errors='coerce', format='mixed')
+    for c in CATEGORICAL_COLUMNS:
+        if c in df.columns:
+            df[c] = df[c].astype('category')
+
+    tmp = path + '.tmp'
+    df.to_parquet(tmp, index=False)
+    os.replace(tmp, path)
+
+
+class PostIndex:
+    """
+    Row positions of every displayable review (non-empty text and a topic), presorted once per load
+    for each sort key, overall and per lowercased topic. Reading a page walks one of these arrays
+    from the cursor, so it costs about the page size instead of a filter and sort over the table.
+    """
+
+    def __init__(self, df, dates, region_index):
+        n = len(df)
+        text = df['text'] if 'text' in df.columns else pd.Series('', index=df.index)
+        topic = df['topic_name'] if 'topic_name' in df.columns else pd.Series(None, index=df.index)
+        shown = (text.fillna('').astype(str).str.strip() != '') & topic.notna()
+
+        # Missing dates and scores sort last; ties keep file order.
+        # The keys are negated before missing dates are filled, since negating int64 min overflows.
+        newest = -dates.to_numpy(dtype='datetime64[ns]').astype(np.int64)
+        newest = np.where(dates.isna().to_numpy(), np.iinfo(np.int64).max, newest)
+        score = pd.to_numeric(df['score'], errors='coerce').fillna(-1).to_numpy() if 'score' in df.columns else np.zeros(n)
+        position = np.arange(n)
+        orders = {
+            'newest': np.lexsort((position, newest)),
+            'likes': np.lexsort((position, newest, -score)),
+        }
+
+        topic_key = topic.astype(object).str.lower().to_numpy()
+        self.orders = {}
+        for sort, order in orders.items():
+            order = order[shown.to_numpy()[order]]
+            by_topic = {None: order}
+            keys = topic_key[order]
+            # A stable sort by topic keeps each topic's rows in the order above.
+            sorter = np.argsort(keys, kind='stable')
+            grouped = order[sorter]
+            names, starts = np.unique(keys[sorter], return_index=True)
+            for name, start, end in zip(names, starts, list(starts[1:]) + [len(grouped)]):
+                by_topic[name] = grouped[start:end]
+            self.orders[sort] = by_topic
+
+        self.topic = topic_key
+        self.sentiment = (df['sentiment'].astype(object).fillna('').str.lower().to_numpy()
+                          if 'sentiment' in df.columns else np.full(n, '', dtype=object))
+        self.region_masks = {}
+        for name, rows in region_index.items():
+            mask = np.zeros(n, dtype=bool)
+            mask[rows] = True
+            self.region_masks[name] = mask
+
+    @staticmethod
+    def encode_cursor(version, position):
+        return f"{version}:{position}"
+
+    @staticmethod
+    def decode_cursor(cursor, version):
+        """
+        The position in an opaque '<version>:<position>' cursor. Raises ValueError for anything
+        that is not such a cursor, and LookupError for a cursor issued by another dataset version.
+        """
+        cursor_version, sep, position = cursor.rpartition(':')
+        if not sep or not cursor_version or not (position.isascii() and position.isdigit()):
+            raise ValueError(f"Invalid cursor '{cursor}'. Pass the 'next_cursor' of the previous page as is.")
+        if cursor_version != version:
+            raise LookupError("The dataset changed since this cursor was issued. Start again without one.")
+        return int(position)
+
+    def page(self, sort, topic=None, region=None, sentiments=None, cursor=0, limit=20):
+        """
+        Returns (row positions, next cursor) for up to 'limit' matching rows starting at 'cursor'.
+        The next cursor is None once the list is exhausted.
+        """
+        order = self.orders[sort].get(topic.lower() if topic else None, np.empty(0, dtype=np.int64))
+        region_mask = self.region_masks.get(region) if region and region != "All" else None
+        wanted = [s.strip().lower() for s in sentiments] if sentiments else None
+
+        rows = []
+        pos = cursor
+        step = max(limit, 64)
+        while pos < len(order) and len(rows) < limit:
+            chunk = order[pos:pos + step]
+            keep = np.ones(len(chunk), dtype=bool)
+            if region_mask is not None:
+                keep &= region_mask[chunk]
+            if wanted is not None:
+                keep &= np.isin(self.sentiment[chunk], wanted)
+            hits = np.flatnonzero(keep)[:limit - len(rows)]
+            rows.extend(chunk[hits])
+            pos += int(hits[-1]) + 1 if len(rows) == limit else len(chunk)
+            # Sparse filters widen the window so a page needs only a few passes.
+            step *= 2
+
+        return rows, (pos if pos < len(order) else None)
+
+
+class Snapshot:
+    """
+    An immutable view of one load of the dataset. Requests only ever read from one of these.
+    'frame' holds just the filter columns; 'df' holds the full rows returned to clients.
+    """
+
+    def __init__(self, frame, df, region_index, dates, cube, version, posts=None):
+        self.frame = frame
+        self.df = df
+        self.region_index = region_index
+        self.dates = dates
+        self.cube = cube
+        self.version = version
+        self.posts = posts
+
+
+class ReviewStore:
+    """
+    Keeps the labeled review dataset resident in memory.
+    The 'state' column and the per-region row indexes are built once per load,
+    and the file is only re-read when its mtime or size changes.
+    'path' may be a CSV or a Parquet file; 'columns' limits which columns are loaded.
+    'phase' is an optional factory of context managers, called with 'load', 'filter' or 'serialize'
+    around each step of a read, for timing them.
+    """
+
+    def __init__(self, path, regions=REGIONS, cache_size=128, columns=None, phase=None):
+        self.path = path
+        self.columns = columns
+        self.regions = regions
+        self.max_cache_size = cache_size
+        self.phase = phase or (lambda name: nullcontext())
+        self.load_seconds = None
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._snapshot = None
+        self._signature = None
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._changed = threading.Condition()
+        self._watcher = None
+        self.reload_if_changed()
+
+    def _file_signature(self):
+        st = os.stat(self.path)
+        return (st.st_mtime_ns, st.st_size)
+
+    def _load(self, signature):
+        df = read_reviews(self.path, self.columns)
+
+        region_index = {}
+        if 'location' in df.columns:
+            df['state'] = state_column(df['location'])
+            for name, states in self.regions.items():
+                region_index[name] = df.index[df['state'].isin(states)].to_numpy()
+
+        if 'parsed_date' in df.columns:
+            dates = df.pop('parsed_date')
+        elif 'date' in df.columns:
+            dates = date_column(df['date'])
+        else:
+            dates = pd.Series(pd.NaT, index=df.index)
+
+        frame = df[[c for c in AGGREGATE_COLUMNS + ['state'] if c in df.columns]]
+        cube = build_cube(frame, dates, self.regions)
+        posts = PostIndex(df, dates, region_index)
+
+        version = f"{signature[0]:x}-{signature[1]:x}"
+        return Snapshot(frame, df, region_index, dates, cube, version, posts)
+
+    def reload_if_changed(self):
+        """Reloads the table if the source file changed. Returns True if it did."""
+        signature = self._file_signature()
+        if signature == self._signature:
+            return False
+
+        with self._lock:
+            if signature == self._signature:
+                return False
+            started = time.perf_counter()
+            self._snapshot = self._load(signature)
+            self.load_seconds = time.perf_counter() - started
+            self._signature = signature
+            with self._cache_lock:
+                self._cache.clear()
+            print(f"Loaded {len(self._snapshot.df)} reviews from '{self.path}'.")
+
+        with self._changed:
+            self._changed.notify_all()
+        return True
+
+    def start_watcher(self, interval=1.0):
+        """Polls the source file in a daemon thread so that waiters are woken up without a request."""
+        # A process forked after the watcher started inherits the Thread object but not the thread.
+        if self._watcher is not None and self._watcher.is_alive():
+            return
+
+        def watch():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.reload_if_changed()
+                except Exception as e:
+                    print(f"ERROR: Could not reload '{self.path}': {e}")
+
+        self._watcher = threading.Thread(target=watch, name="dataset-watcher", daemon=True)
+        self._watcher.start()
+
+    def wait_for_change(self, version, timeout=None):
+        """Blocks until the dataset version differs from 'version'. Returns the new version, or None on timeout."""
+        with self._changed:
+            self._changed.wait_for(lambda: self._snapshot.version != version, timeout=timeout)
+        current = self._snapshot.version
+        return current if current != version else None
+
+    def snapshot(self):
+        with self.phase("load"):
+            self.reload_if_changed()
+            return self._snapshot
+
+    def cache_size(self):
+        """Number of query_json results currently cached."""
+        with self._cache_lock:
+            return len(self._cache)
+
+    @property
+    def df(self):
+        return self._snapshot.df
+
+    @property
+    def version(self):
+        return self._snapshot.version
+
+    def filter_region(self, region_name):
+        return self.query(region=region_name)
+
+    def query(self, region="All", topic=None, sentiments=None, start=None, end=None):
+        """
+        Returns the rows matching the given filters without touching any shared state.
+        'sentiments' is an iterable of labels, 'start'/'end' are anything pd.to_datetime accepts.
+        """
+        return self.query_in(self.snapshot(), region, topic, sentiments, start, end)
+
+    def query_in(self, snap, region="All", topic=None, sentiments=None, start=None, end=None):
+        """query() against a given snapshot, for callers that need several reads to agree on one version."""
+        with self.phase("filter"):
+            return self._filter(snap, region, topic, sentiments, start, end)
+
+    def _filter(self, snap, region, topic, sentiments, start, end):
+        df = snap.frame
+
+        if region and region != "All":
+            if 'location' not in df.columns:
+                raise KeyError("The CSV file is missing the 'location' column.")
+            if region not in self.regions:
+                raise ValueError(f"Region '{region}' not found in REGIONS map.")
+
+        dates = snap.dates
+
+        if region and region != "All":
+            rows = snap.region_index[region]
+            df, dates = df.iloc[rows], dates.iloc[rows]
+
+        mask = None
+
+        def add(condition):
+            nonlocal mask
+            mask = condition if mask is None else mask & condition
+
+        if topic:
+            add(df['topic_name'].str.lower() == topic.lower())
+
+        if sentiments:
+            wanted = {s.strip().lower() for s in sentiments}
+            add(df['sentiment'].str.lower().isin(wanted))
+
+        if start:
+            add(dates >= pd.to_datetime(start))
+        if end:
+            add(dates <= pd.to_datetime(end))
+
+        if mask is not None:
+            df = df[mask]
+        return snap.df if df is snap.frame else snap.df.loc[df.index]
+
+    def page_json(self, sort="newest", region="All", topic=None, sentiments=None, cursor=None, limit=20,
+                  snap=None):
+        """
+        One page of the /posts feed as a JSON object: {"posts": [...], "next_cursor": ...}.
+        Cursors are opaque '<version>:<position>' strings; a cursor from an older load raises LookupError.
+        Reads 'snap' if given, otherwise the current snapshot.
+        """
+        snap = snap or self.snapshot()
+        if sort not in SORT_KEYS:
+            raise ValueError(f"Unknown sort '{sort}'. Use one of: {', '.join(SORT_KEYS)}.")
+        if region and region != "All" and region not in self.regions:
+            raise ValueError(f"Region '{region}' not found in REGIONS map.")
+
+        position = PostIndex.decode_cursor(cursor, snap.version) if cursor else 0
+
+        with self.phase("filter"):
+            rows, next_position = snap.posts.page(sort, topic, region, sentiments, position, limit)
+        next_cursor = None if next_position is None else PostIndex.encode_cursor(snap.version, next_position)
+        with self.phase("serialize"):
+            posts = snap.df.iloc[rows].to_json(orient='records')
+        return f'{{"posts": {posts}, "next_cursor": {json.dumps(next_cursor)}}}'
+
+    def query_json(self, snap=None, **params):
+        """
+        Same as query(), but returns the rows serialized as a JSON array.
+        Results are cached per dataset version and filter parameters.
+        Reads 'snap' if given, otherwise the current snapshot.
+        """
+        snap = snap or self.snapshot()
+        key = (snap.version,) + tuple(sorted(
+            (k, tuple(sorted(v)) if isinstance(v, (list, tuple, set)) else v)
+            for k, v in params.items()
+        ))
+
+        with self._cache_lock:
+            if key in self._cache:
+                self.cache_hits += 1
+                self._cache.move_to_end(key)
+                return self._cache[key]
+            self.cache_misses += 1
+
+        rows = self.query_in(snap, **params)
+        with self.phase("serialize"):
+            result = rows.to_json(orient='records')
+
+        with self._cache_lock:
+            self._cache[key] = result
+            while len(self._cache) > self.max_cache_size:
+                self._cache.popitem(last=False)
+
+        return result
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Convert the labeled review CSV to the columnar Parquet store.")
+    parser.add_argument("input_file", nargs="?", default="../tmobile_reviews_labeled.csv")
+    parser.add_argument("output_file", nargs="?", default="../tmobile_reviews_labeled.parquet")
+    args = parser.parse_args()
+
+    write_columnar(pd.read_csv(args.input_file), args.output_file)
+    print(f"✅ Wrote '{args.output_file}'")
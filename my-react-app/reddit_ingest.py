@@ -0,0 +1,174 @@
+import csv
+import json
+import os
+import re
+from datetime import datetime, timezone
+
+# data.py reads the Reddit CSV from the repository root, whichever directory this runs from.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+OUTPUT_CSV = os.path.join(ROOT, "reddit_text.csv")
+STATE_FILE = os.path.join(ROOT, "reddit_state.json")
+# Columns of reddit_text.csv, as read by combining_file / load_sources in data.py.
+FIELDNAMES = ["title", "date", "upvotes", "url", "text"]
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def make_subreddit(name="tmobile"):
+    """PRAW subreddit, with credentials from REDDIT_CLIENT_ID / REDDIT_CLIENT_SECRET."""
+    import praw
+
+    reddit = praw.Reddit(
+        client_id=os.getenv("REDDIT_CLIENT_ID", ""),
+        client_secret=os.getenv("REDDIT_CLIENT_SECRET", ""),
+        user_agent="my_tmobile_sentiment_scraper"
+    )
+    return reddit.subreddit(name)
+
+
+def post_to_row(post):
+    created_time = datetime.fromtimestamp(post.created_utc, tz=timezone.utc).strftime(DATE_FORMAT)
+
+    # Clean up post text (remove newlines, excessive spaces, and quotes)
+    clean_text = re.sub(r'\s+', ' ', post.selftext or "").strip()
+    clean_text = clean_text.replace('"', "'")
+
+    return {
+        "title": post.title.strip(),
+        "date": created_time,
+        "upvotes": post.score,
+        "url": post.url,
+        "text": clean_text[:1000] if clean_text else "(No text provided)"
+    }
+
+
+class RedditIngestor:
+    """
+    Appends posts newer than the last run to the Reddit CSV.
+
+    The state file holds a watermark (the newest created_utc of the last completed run) and the ids
+    of posts at or above it. subreddit.new() yields newest first, so the ingestor stops at the first
+    post older than the watermark; the watermark only moves once a run reaches it.
+
+    Each chunk is recorded as in flight (id, url and date) before it is appended and marked seen after.
+    If a run dies in between, the next one checks the CSV for the in-flight posts, so a post is
+    neither written twice nor skipped.
+    """
+
+    def __init__(self, subreddit, output=OUTPUT_CSV, state_path=STATE_FILE, first_run_limit=100):
+        self.subreddit = subreddit
+        self.output = output
+        self.state_path = state_path
+        self.first_run_limit = first_run_limit
+        self.from_csv = False
+        self.in_flight = {}
+        self.watermark, self.seen = self._load_state()
+
+    def _load_state(self):
+        if os.path.exists(self.state_path):
+            with open(self.state_path, encoding="utf-8") as f:
+                state = json.load(f)
+            seen = dict(state["seen"])
+            in_flight = state.get("in_flight") or {}
+            if in_flight:
+                seen.update(self._recover(in_flight))
+            return state["watermark"], seen
+
+        # No state yet: start from the newest post already in the CSV, if there is one.
+        watermark = None
+        if os.path.exists(self.output):
+            with open(self.output, newline="", encoding="utf-8-sig") as f:
+                for row in csv.DictReader(f):
+                    try:
+                        ts = datetime.strptime(row["date"], DATE_FORMAT).replace(tzinfo=timezone.utc).timestamp()
+                    except (KeyError, TypeError, ValueError):
+                        continue
+                    watermark = ts if watermark is None else max(watermark, ts)
+        self.from_csv = watermark is not None
+        return watermark, {}
+
+    def _recover(self, in_flight):
+        """Ids and created_utc of the in-flight posts from a run that died that did make it into the CSV."""
+        written = set()
+        if os.path.exists(self.output):
+            with open(self.output, newline="", encoding="utf-8-sig") as f:
+                written = {(row.get("url"), row.get("date")) for row in csv.DictReader(f)}
+        recovered = {post_id: created for post_id, (created, url, date) in in_flight.items()
+                     if (url, date) in written}
+        print(f"⚠️ The last run stopped while appending; {len(recovered)} of {len(in_flight)} "
+              f"in-flight posts were already written.")
+        return recovered
+
+    def _save_state(self):
+        tmp = self.state_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"watermark": self.watermark, "seen": self.seen, "in_flight": self.in_flight}, f)
+        os.replace(tmp, self.state_path)
+
+    def _is_known(self, post):
+        if post.id in self.seen:
+            return True
+        # Without state there are no ids, so a post from the CSV's newest second is assumed to be in it.
+        return self.from_csv and post.created_utc <= self.watermark
+
+    def poll(self, chunk_size=25):
+        """Streams new posts into the CSV and returns how many were appended."""
+        limit = self.first_run_limit if self.watermark is None else None
+        write_header = not os.path.exists(self.output) or os.path.getsize(self.output) == 0
+        newest = self.watermark
+        appended = 0
+        pending = []
+
+        with open(self.output, "a", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
+            if write_header:
+                writer.writeheader()
+
+            def flush():
+                self.in_flight = {post_id: (created, row["url"], row["date"]) for (post_id, created), row in pending}
+                self._save_state()
+                writer.writerows(row for _, row in pending)
+                f.flush()
+                os.fsync(f.fileno())
+                self.seen.update((post_id, created) for (post_id, created), _ in pending)
+                self.in_flight = {}
+                self._save_state()
+                pending.clear()
+
+            for post in self.subreddit.new(limit=limit):
+                if self.watermark is not None and post.created_utc < self.watermark:
+                    break
+                if self._is_known(post):
+                    continue
+
+                pending.append(((post.id, post.created_utc), post_to_row(post)))
+                newest = post.created_utc if newest is None else max(newest, post.created_utc)
+                appended += 1
+                if len(pending) >= chunk_size:
+                    flush()
+
+            if pending:
+                flush()
+
+        # Caught up: move the watermark and forget ids that are now below it.
+        self.watermark = newest
+        if newest is not None:
+            self.seen = {post_id: created for post_id, created in self.seen.items() if created >= newest}
+        self._save_state()
+        self.from_csv = False
+        return appended
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Append new r/tmobile posts to the Reddit CSV.")
+    parser.add_argument("--subreddit", default="tmobile")
+    parser.add_argument("--output", default=OUTPUT_CSV)
+    parser.add_argument("--state", default=STATE_FILE)
+    parser.add_argument("--limit", type=int, default=100, help="Posts to fetch on the very first run.")
+    args = parser.parse_args()
+
+    ingestor = RedditIngestor(make_subreddit(args.subreddit), output=args.output, state_path=args.state,
+                              first_run_limit=args.limit)
+    count = ingestor.poll()
+    print(f"✅ Appended {count} new posts to {args.output}")
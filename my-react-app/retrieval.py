@@ -0,0 +1,46 @@
+import re
+
+import aggregates
+
+
+class Retriever:
+    """
+    Picks the reviews most relevant to a chat question, restricted to a region and topic.
+    Ranking comes from the same SearchIndex that serves /api/search, so the review text is indexed once.
+    """
+
+    def __init__(self, store, index):
+        self.store = store
+        self.index = index
+
+    def search(self, snap, question, region="All", topic=None, k=8):
+        rows, _, _ = self.index.search(snap, question, region=region, topic=topic, limit=k)
+        if len(rows) == 0:
+            # No review shares a term with the question; the first k rows of the slice are still a fair sample.
+            return self.store.query_in(snap, region=region, topic=topic).head(k)
+        return snap.df.iloc[rows]
+
+
+def compact_aggregates(cube, region="All", topic=None):
+    """A few lines of counts for the prompt: sentiment split and top topics for the selected slice."""
+    sliced = aggregates.slice_cube(cube, region, topic)
+    share = aggregates.sentiment_share(sliced)
+    sentiment = ", ".join(f"{name} {count}" for name, count in share["counts"].items())
+    topics = ", ".join(f"{t['topic_name']} {t['count']}" for t in aggregates.topic_counts(sliced, limit=5))
+    scope = region if not topic else f"{region} / {topic}"
+    return (
+        f"Scope: {scope}. Reviews: {share['total']}.\n"
+        f"Sentiment: {sentiment or 'n/a'}.\n"
+        f"Top topics: {topics or 'n/a'}."
+    )
+
+
+def format_reviews(rows, max_chars=300):
+    lines = []
+    for _, row in rows.iterrows():
+        text = re.sub(r"\s+", " ", str(row.get('text', ''))).strip()
+        if len(text) > max_chars:
+            text = text[:max_chars].rsplit(" ", 1)[0] + "…"
+        tags = [str(row[c]) for c in ('state', 'topic_name', 'sentiment') if c in row and isinstance(row[c], str)]
+        lines.append(f"- [{' | '.join(tags)}] {text}")
+    return "\n".join(lines)
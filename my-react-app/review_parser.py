@@ -0,0 +1,161 @@
+import importlib.util
+import re
+from functools import lru_cache
+
+from bs4 import BeautifulSoup, NavigableString, SoupStrainer
+from dateutil import parser as dateparser
+
+PARSER = "lxml" if importlib.util.find_spec("lxml") else "html.parser"
+
+REVIEW_BLOCK = re.compile(r"\bjs-rvw\b|\brvw\b", re.I)
+VOTE_TEXT = re.compile(r"\bthanks\b|helpful", re.I)
+VOTE_CLASS = re.compile(r"(thanks|helpful|vote|rvw_thanks|rvw_like)", re.I)
+PAREN_COUNT = re.compile(r"\((\d+)\)")
+HELPFUL_COUNT = re.compile(r"(\d+)\s*(people )?(found this helpful|helpful)?", re.I)
+DIGITS = re.compile(r"(\d+)")
+DATE_CLASS = re.compile(r"rvw_rvd-dt|rvw-dt|rvw_rvd", re.I)
+REVIEWED_PREFIX = re.compile(r"Reviewed\s*[:\-]?\s*(.+)", re.I)
+REVIEWED_IN_TEXT = re.compile(r"Reviewed\s*[:\-]?\s*([A-Za-z0-9,\.\s]+(?:\d{4})?)", re.I)
+REVIEWED_LINE = re.compile(r"Reviewed\s+", re.I)
+TEXT_CLASS = re.compile(r"js-collapsed|rvw_all-text|rvw_top-text", re.I)
+MORE_LESS = re.compile(r"\b(More|Less)\b$")
+LOCATION_CLASS = re.compile(r"rvw_inf-lctn", re.I)
+LOCATION_FALLBACK_CLASS = re.compile(r"lctn|location", re.I)
+VOTE_TAGS = {"button", "a", "span", "div"}
+
+
+def class_matches(classes, pattern):
+    """Same rule BeautifulSoup applies to class_=<regex>: any single class, or the whole class string."""
+    if not classes:
+        return False
+    if isinstance(classes, str):
+        return bool(pattern.search(classes))
+    return any(pattern.search(c) for c in classes) or (len(classes) > 1 and bool(pattern.search(" ".join(classes))))
+
+
+@lru_cache(maxsize=4096)
+def normalize_date(date_str):
+    """Review dates repeat heavily across a page, so each distinct string is only parsed once."""
+    try:
+        return dateparser.parse(date_str).strftime("%Y-%m-%d %H:%M:%S")
+    except Exception:
+        return date_str
+
+
+def extract_review(block):
+    """
+    Pulls location, date, thanks and text out of one review block in a single walk of its subtree.
+    Returns the same values as the per-field find_all extractors it replaces.
+    """
+    string_types = block.interesting_string_types
+    time_tag = date_p = text_div = location = location_fallback = vote_fallback = None
+    paragraphs = []
+    vote_tags = []
+    has_vote_text = set()
+
+    for node in block.descendants:
+        if isinstance(node, NavigableString):
+            # Mark every ancestor of a 'thanks'/'helpful' string: those are the tags whose text would match.
+            if type(node) in string_types and VOTE_TEXT.search(node):
+                parent = node.parent
+                while parent is not block and id(parent) not in has_vote_text:
+                    has_vote_text.add(id(parent))
+                    parent = parent.parent
+            continue
+
+        name = node.name
+        classes = node.get("class")
+
+        if name in VOTE_TAGS:
+            vote_tags.append(node)
+        if vote_fallback is None and class_matches(classes, VOTE_CLASS):
+            vote_fallback = node
+
+        if name == "time":
+            if time_tag is None:
+                time_tag = node
+        elif name == "p":
+            paragraphs.append(node)
+            if date_p is None and class_matches(classes, DATE_CLASS):
+                date_p = node
+        elif name == "div":
+            if text_div is None and class_matches(classes, TEXT_CLASS):
+                text_div = node
+        elif name == "span":
+            if location is None and class_matches(classes, LOCATION_CLASS):
+                location = node
+            if location_fallback is None and class_matches(classes, LOCATION_FALLBACK_CLASS):
+                location_fallback = node
+
+    block_text = None
+
+    def whole_text():
+        nonlocal block_text
+        if block_text is None:
+            block_text = block.get_text(" ", strip=True)
+        return block_text
+
+    # Location
+    location_tag = location or location_fallback
+    location_value = location_tag.get_text(strip=True) if location_tag else ""
+
+    # Date
+    if time_tag is not None and time_tag.has_attr("datetime"):
+        date_value = normalize_date(time_tag["datetime"])
+    elif date_p is not None:
+        txt = date_p.get_text(" ", strip=True)
+        m = REVIEWED_PREFIX.search(txt)
+        date_value = normalize_date(m.group(1) if m else txt)
+    else:
+        m = REVIEWED_IN_TEXT.search(whole_text())
+        date_value = normalize_date(m.group(1).strip()) if m else ""
+
+    # Thanks
+    thanks_value = None
+    for tag in vote_tags:
+        if id(tag) not in has_vote_text:
+            continue
+        txt = tag.get_text(" ", strip=True)
+        m = PAREN_COUNT.search(txt) or HELPFUL_COUNT.search(txt)
+        if m:
+            thanks_value = int(m.group(1))
+            break
+    if thanks_value is None:
+        m = DIGITS.search(vote_fallback.get_text() or "") if vote_fallback is not None else None
+        thanks_value = int(m.group(1)) if m else 0
+
+    # Text
+    text_value = ""
+    if text_div is not None:
+        text_value = MORE_LESS.sub("", text_div.get_text(" ", strip=True)).strip()
+    if not text_value and paragraphs:
+        texts = []
+        for p in paragraphs:
+            pt = p.get_text(" ", strip=True)
+            if pt and not REVIEWED_LINE.search(pt):
+                texts.append(pt)
+        text_value = " ".join(texts).strip()
+    if not text_value:
+        text_value = whole_text()
+
+    return {"location": location_value, "date": date_value, "thanks": thanks_value, "text": text_value}
+
+
+def extract_reviews(html):
+    """
+    Parses a review listing page. Only the review blocks are built into a tree, and reviews with the
+    same (location, date, text) are kept once.
+    """
+    soup = BeautifulSoup(html, PARSER, parse_only=SoupStrainer("div", class_=REVIEW_BLOCK))
+    seen = set()
+    results = []
+
+    for block in soup.find_all("div", class_=REVIEW_BLOCK):
+        review = extract_review(block)
+        key = (review["location"], review["date"], review["text"])
+        if not review["text"] or key in seen:
+            continue
+        seen.add(key)
+        results.append(review)
+
+    return results
@@ -0,0 +1,196 @@
+"""
+Benchmarks review_parser against the per-field extractor it replaced, over the saved pages in
+fixtures/consumeraffairs. The old extractor is kept here verbatim as the reference; its in-page
+dedupe never matched, so its output is deduplicated by (location, date, text) before comparing.
+
+    python scraper_benchmark.py [--repeat 5]
+"""
+import glob
+import os
+import re
+import time
+
+from bs4 import BeautifulSoup
+from dateutil import parser as dateparser
+
+import review_parser
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "consumeraffairs")
+
+
+def parse_thanks_count(review_block):
+    """Extracts number of 'thanks' or 'helpful' votes."""
+    candidates = []
+    for tag in review_block.find_all(["button", "a", "span", "div"]):
+        txt = (tag.get_text(" ", strip=True) or "").strip()
+        if not txt:
+            continue
+        if re.search(r"\bthanks\b", txt, re.I) or re.search(r"helpful", txt, re.I):
+            candidates.append(txt)
+
+    for txt in candidates:
+        m = re.search(r"\((\d+)\)", txt)
+        if m:
+            return int(m.group(1))
+        m = re.search(r"(\d+)\s*(people )?(found this helpful|helpful)?", txt, re.I)
+        if m:
+            return int(m.group(1))
+
+    fallback = review_block.find(attrs={"class": re.compile(r"(thanks|helpful|vote|rvw_thanks|rvw_like)", re.I)})
+    if fallback:
+        m = re.search(r"(\d+)", fallback.get_text() or "")
+        if m:
+            return int(m.group(1))
+
+    return 0
+
+
+def parse_review_date(review_block):
+    """Extracts and normalizes review date."""
+    time_tag = review_block.find("time")
+    if time_tag and time_tag.has_attr("datetime"):
+        try:
+            dt = dateparser.parse(time_tag["datetime"])
+            return dt.strftime("%Y-%m-%d %H:%M:%S")
+        except Exception:
+            return time_tag["datetime"]
+
+    pdt = review_block.find("p", class_=re.compile(r"rvw_rvd-dt|rvw-dt|rvw_rvd", re.I))
+    if pdt:
+        txt = pdt.get_text(" ", strip=True)
+        m = re.search(r"Reviewed\s*[:\-]?\s*(.+)", txt, re.I)
+        date_str = m.group(1) if m else txt
+        try:
+            dt = dateparser.parse(date_str)
+            return dt.strftime("%Y-%m-%d %H:%M:%S")
+        except Exception:
+            return date_str
+
+    txt_block = review_block.get_text(" ", strip=True)
+    m = re.search(r"Reviewed\s*[:\-]?\s*([A-Za-z0-9,\.\s]+(?:\d{4})?)", txt_block, re.I)
+    if m:
+        date_str = m.group(1).strip()
+        try:
+            dt = dateparser.parse(date_str)
+            return dt.strftime("%Y-%m-%d %H:%M:%S")
+        except Exception:
+            return date_str
+    return ""
+
+
+def parse_review_text(review_block):
+    """Extracts full review text (including hidden parts)."""
+    full_text_div = review_block.find("div", class_=re.compile(r"js-collapsed|rvw_all-text|rvw_top-text", re.I))
+    if full_text_div:
+        text = full_text_div.get_text(" ", strip=True)
+        text = re.sub(r"\b(More|Less)\b$", "", text).strip()
+        if text:
+            return text
+
+    ps = review_block.find_all("p")
+    if ps:
+        texts = []
+        for p in ps:
+            pt = p.get_text(" ", strip=True)
+            if not pt:
+                continue
+            if re.search(r"Reviewed\s+", pt, re.I):
+                continue
+            texts.append(pt)
+        combined = " ".join(texts).strip()
+        if combined:
+            return combined
+
+    return review_block.get_text(" ", strip=True)
+
+
+def parse_location(review_block):
+    """Extracts reviewer location."""
+    loc = review_block.find("span", class_=re.compile(r"rvw_inf-lctn", re.I))
+    if loc:
+        return loc.get_text(strip=True)
+    loc2 = review_block.find("span", class_=re.compile(r"lctn|location", re.I))
+    if loc2:
+        return loc2.get_text(strip=True)
+    return ""
+
+
+def legacy_extract(html):
+    soup = BeautifulSoup(html, "html.parser")
+    review_blocks = soup.find_all("div", class_=re.compile(r"\bjs-rvw\b|\brvw\b", re.I))
+    results = []
+    for rb in review_blocks:
+        text = parse_review_text(rb)
+        if not text:
+            continue
+        results.append({
+            "location": parse_location(rb),
+            "date": parse_review_date(rb),
+            "thanks": parse_thanks_count(rb),
+            "text": text
+        })
+    return results
+
+
+def dedupe(reviews):
+    seen = set()
+    unique = []
+    for r in reviews:
+        key = (r["location"], r["date"], r["text"])
+        if key not in seen:
+            seen.add(key)
+            unique.append(r)
+    return unique
+
+
+def pages_per_second(extract, pages, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for html in pages:
+            extract(html)
+    return len(pages) * repeat / (time.perf_counter() - started)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compare the review extractors on the saved fixture pages.")
+    parser.add_argument("--fixtures", default=FIXTURES)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    paths = sorted(glob.glob(os.path.join(args.fixtures, "*.html")))
+    pages = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            pages.append(f.read())
+    if not pages:
+        raise SystemExit(f"No fixture pages found in '{args.fixtures}'.")
+
+    mismatches = 0
+    total = duplicates = 0
+    for path, html in zip(paths, pages):
+        old = legacy_extract(html)
+        expected = dedupe(old)
+        actual = review_parser.extract_reviews(html)
+        total += len(actual)
+        duplicates += len(old) - len(expected)
+        if actual != expected:
+            mismatches += 1
+            print(f"❌ {os.path.basename(path)}: outputs differ")
+            for a, b in zip(expected, actual):
+                if a != b:
+                    print(f"   old: {a}\n   new: {b}")
+                    break
+
+    print(f"Parser backend: {review_parser.PARSER}")
+    print(f"Pages: {len(pages)}, reviews: {total}, in-page duplicates dropped: {duplicates}")
+    print("✅ Output matches the old extractor." if not mismatches else f"❌ {mismatches} page(s) differ.")
+
+    old_rate = pages_per_second(legacy_extract, pages, args.repeat)
+    new_rate = pages_per_second(review_parser.extract_reviews, pages, args.repeat)
+    print(f"old: {old_rate:8.1f} pages/s")
+    print(f"new: {new_rate:8.1f} pages/s ({new_rate / old_rate:.1f}x)")
+
+    if mismatches:
+        raise SystemExit(1)
@@ -0,0 +1,360 @@
+import os
+import pickle
+import re
+import threading
+from array import array
+from collections import Counter
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+
+# Bumped whenever tokenization or the file layout changes, so old files are rebuilt instead of misread.
+FORMAT_VERSION = 2
+# Columns that identify a review; a row whose values all match an indexed one is not tokenized again.
+KEY_COLUMNS = ['text', 'url', 'date']
+TOKEN_PATTERN = r"(?u)\b[a-z0-9][a-z0-9']+\b"
+# The change log is folded into the base file once it is this large relative to the base file.
+COMPACT_RATIO = 0.25
+
+_token_re = re.compile(TOKEN_PATTERN)
+# Longest first, so 'ations' wins over 's'.
+_suffixes = ('ational', 'ization', 'fulness', 'ousness', 'iveness', 'ations', 'ingly', 'ement', 'ments',
+             'ities', 'ation', 'ness', 'ment', 'able', 'ible', 'ings', 'edly', 'ies', 'ing', 'ers', 'est',
+             'ful', 'ous', 'ive', 'ize', 'ed', 'er', 'ly', 'es', 's')
+
+
+@lru_cache(maxsize=65536)
+def stem(token: str) -> str:
+    """
+    A small suffix-stripping stemmer: 'charges', 'charged' and 'charging' all become 'charg'.
+    It only has to map related forms together consistently, not produce real words.
+    """
+    if len(token) <= 3 or not token.isalpha():
+        return token
+    for suffix in _suffixes:
+        if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+            base = token[:-len(suffix)]
+            if suffix == 'ies':
+                return base + 'y'
+            if suffix in ('ing', 'ed', 'er', 'ings', 'ers') and len(base) >= 4 \
+                    and base[-1] == base[-2] and base[-1] not in 'lsz':
+                base = base[:-1]
+            return base
+    if token.endswith('e') and len(token) > 4:
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str):
+    return [stem(t) for t in _token_re.findall(text.lower()) if t not in ENGLISH_STOP_WORDS]
+
+
+def row_keys(df):
+    """One 64-bit hash per row over KEY_COLUMNS, vectorized so a reload of millions of rows stays cheap."""
+    columns = [c for c in KEY_COLUMNS if c in df.columns]
+    if not columns:
+        return np.arange(len(df), dtype=np.uint64)
+    return pd.util.hash_pandas_object(df[columns].astype(object), index=False).to_numpy()
+
+
+def row_map(docs, n_docs):
+    """
+    Groups row positions by the document they hold, as (starts, rows): the rows of document d are
+    rows[starts[d]:starts[d + 1]]. Rows with identical text, url and date share one document, and
+    each of them is returned by a match on it. Rows whose document is -1 are left out.
+    """
+    docs = np.asarray(docs, dtype=np.int64)
+    rows = np.flatnonzero(docs >= 0)
+    rows = rows[np.argsort(docs[rows], kind='stable')]
+    starts = np.zeros(n_docs + 1, dtype=np.int64)
+    starts[1:] = np.cumsum(np.bincount(docs[rows], minlength=n_docs))
+    return starts, rows
+
+
+def _to_array(values):
+    result = array('I')
+    result.frombytes(np.ascontiguousarray(values, dtype=np.uint32).tobytes())
+    return result
+
+
+class SearchIndex:
+    """
+    Inverted index over review text with BM25 ranking, shared by /api/search and the chat retriever.
+    Postings are appendable arrays of (document id, term frequency) per stemmed term. Documents are
+    keyed by a hash of text, url and date; on every dataset version the index maps those keys to row
+    positions, tokenizing only rows it has not seen before and purging the ones that are gone, so
+    document frequencies and the average length always describe the current dataset.
+
+    Only sync() changes the index, and the background indexer calls it. search() ranks with whatever
+    was last synced: rows of a newer snapshot that are not indexed yet are found once the indexer has
+    caught up, and rows that have left the dataset are never returned.
+
+    On disk it is a base pickle plus an append-only log of the documents each sync added and removed.
+    The log is folded into the base once it grows past COMPACT_RATIO of it.
+    """
+
+    def __init__(self, path=None, k1=1.5, b=0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.postings = {}
+        self.doc_keys = {}
+        self.doc_len = array('I')
+        self.total_len = 0
+        # Number of changes applied; the base file records how many it already contains.
+        self.seq = 0
+        # Row map of the last synced snapshot, and the latest one built for another version.
+        self._rows = row_map([], 0)
+        self._version = None
+        self._other_rows = (None, None)
+        self._lock = threading.Lock()
+
+        if path:
+            try:
+                self._read(path)
+            except Exception as e:
+                print(f"⚠️ Could not read search index '{path}', rebuilding it: {e}")
+                self._reset()
+
+    @property
+    def log_path(self):
+        return self.path + '.log'
+
+    def _reset(self):
+        self.postings, self.doc_keys = {}, {}
+        self.doc_len, self.total_len, self.seq = array('I'), 0, 0
+        for path in (self.path, self.log_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _read(self, path):
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                data = pickle.load(f)
+            if data.get('format') != FORMAT_VERSION:
+                print(f"⚠️ Search index '{path}' has an old format, rebuilding it.")
+                self._reset()
+                return
+            self.postings = data['postings']
+            self.doc_keys = data['doc_keys']
+            self.doc_len = data['doc_len']
+            self.total_len = data['total_len']
+            self.seq = data['seq']
+
+        if not os.path.exists(self.log_path):
+            return
+        with open(self.log_path, 'rb') as f:
+            while True:
+                try:
+                    change = pickle.load(f)
+                except EOFError:
+                    break
+                except Exception as e:
+                    # A run that died mid-write leaves a partial last entry; that sync is simply redone.
+                    print(f"⚠️ Ignoring a truncated entry at the end of '{self.log_path}': {e}")
+                    break
+                if change['seq'] > self.seq:
+                    self._apply(change)
+
+    def _apply(self, change):
+        self._remove(change['removed'])
+        for key, doc, counts in change['added']:
+            assert doc == len(self.doc_len), "search index log is out of order"
+            self._add(key, dict(counts))
+        self.seq = change['seq']
+
+    def save(self):
+        """Writes the whole index as the new base file and empties the log."""
+        if not self.path:
+            return
+        tmp = self.path + '.tmp'
+        with open(tmp, 'wb') as f:
+            pickle.dump({
+                'format': FORMAT_VERSION,
+                'postings': self.postings,
+                'doc_keys': self.doc_keys,
+                'doc_len': self.doc_len,
+                'total_len': self.total_len,
+                'seq': self.seq,
+            }, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self.path)
+        # Entries still in the log after a crash here are at or below 'seq' and skipped on the next read.
+        open(self.log_path, 'wb').close()
+
+    def _log(self, removed, added):
+        if not self.path:
+            return
+        self.seq += 1
+        with open(self.log_path, 'ab') as f:
+            pickle.dump({'seq': self.seq, 'removed': removed, 'added': added}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        base = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        if os.path.getsize(self.log_path) > COMPACT_RATIO * base:
+            self.save()
+
+    def __len__(self):
+        return len(self.doc_keys)
+
+    def _add(self, key, counts):
+        doc = len(self.doc_len)
+        for term, tf in counts.items():
+            entry = self.postings.get(term)
+            if entry is None:
+                entry = self.postings[term] = (array('I'), array('I'))
+            entry[0].append(doc)
+            entry[1].append(tf)
+        length = sum(counts.values())
+        self.doc_len.append(length)
+        self.total_len += length
+        self.doc_keys[key] = doc
+        return doc
+
+    def _remove(self, removed):
+        """Drops (key, doc id) pairs from the postings, the lengths and the key map."""
+        if not removed:
+            return
+        gone = np.zeros(len(self.doc_len), dtype=bool)
+        for key, doc in removed:
+            gone[doc] = True
+            del self.doc_keys[key]
+            self.total_len -= self.doc_len[doc]
+            self.doc_len[doc] = 0
+
+        for term in list(self.postings):
+            docs, tfs = self.postings[term]
+            ids = np.frombuffer(docs, dtype=np.uint32)
+            keep = ~gone[ids]
+            if keep.all():
+                continue
+            if not keep.any():
+                del self.postings[term]
+            else:
+                self.postings[term] = (_to_array(ids[keep]), _to_array(np.frombuffer(tfs, dtype=np.uint32)[keep]))
+
+    def sync(self, snap):
+        """
+        Brings the index up to date with a snapshot: new reviews are added and reviews no longer
+        in it are removed. Returns the number of newly indexed reviews.
+        """
+        if self._version == snap.version:
+            return 0
+        with self._lock:
+            if self._version == snap.version:
+                return 0
+            df = snap.df
+            texts = df['text'].astype(object).to_numpy() if 'text' in df.columns else np.full(len(df), '')
+            keys = row_keys(df).tolist()
+
+            docs = np.full(len(df), -1, dtype=np.int64)
+            new = {}
+            for row, key in enumerate(keys):
+                doc = self.doc_keys.get(key)
+                if doc is None:
+                    new.setdefault(key, row)
+                else:
+                    docs[row] = doc
+
+            current = np.zeros(len(self.doc_len), dtype=bool)
+            current[docs[docs >= 0]] = True
+            removed = [(key, doc) for key, doc in self.doc_keys.items() if not current[doc]]
+            self._remove(removed)
+
+            added = []
+            for key, row in new.items():
+                text = texts[row]
+                counts = Counter(tokenize(text if isinstance(text, str) else ''))
+                added.append((key, self._add(key, counts), list(counts.items())))
+            for row in np.flatnonzero(docs < 0):
+                docs[row] = self.doc_keys[keys[row]]
+
+            self._rows = row_map(docs, len(self.doc_len))
+            self._version = snap.version
+            self._other_rows = (None, None)
+            if removed or added:
+                self._log(removed, added)
+            return len(added)
+
+    def _scores(self, terms):
+        """BM25 score of every document that contains at least one of 'terms', as (doc ids, scores)."""
+        n = len(self.doc_keys)
+        if n == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        doc_len = np.frombuffer(self.doc_len, dtype=np.uint32)
+        avg_len = self.total_len / n or 1.0
+
+        ids, weights = [], []
+        for term in set(terms):
+            entry = self.postings.get(term)
+            if entry is None:
+                continue
+            docs = np.frombuffer(entry[0], dtype=np.uint32)
+            tf = np.frombuffer(entry[1], dtype=np.uint32).astype(np.float64)
+            idf = np.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * doc_len[docs] / avg_len)
+            ids.append(docs)
+            weights.append(idf * tf * (self.k1 + 1) / (tf + norm))
+        if not ids:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        ids = np.concatenate(ids)
+        if len(weights) == 1:
+            return ids.astype(np.int64), weights[0]
+        docs, inverse = np.unique(ids, return_inverse=True)
+        return docs.astype(np.int64), np.bincount(inverse, weights=np.concatenate(weights))
+
+    def _rows_for(self, snap, keys=None):
+        """
+        Row map of 'snap' against the documents indexed now, without indexing anything. Called with
+        the lock held. The map of a version other than the synced one is kept until the next sync or
+        another version is asked for, so it is built once per version rather than once per request.
+        """
+        if snap.version == self._version:
+            return self._rows
+        version, rows = self._other_rows
+        if version == snap.version:
+            return rows
+        if keys is None:
+            keys = row_keys(snap.df)
+        docs = [self.doc_keys.get(key, -1) for key in keys.tolist()]
+        rows = row_map(docs, len(self.doc_len))
+        self._other_rows = (snap.version, rows)
+        return rows
+
+    def search(self, snap, query, region="All", topic=None, sentiments=None, limit=20, offset=0):
+        """
+        Ranks the reviews of 'snap' against 'query', restricted to the given filters.
+        Returns (row positions, scores, total number of matches). Filters are only evaluated on rows
+        that contain a query term, so the cost follows the postings touched, not the table size.
+        """
+        terms = tokenize(query)
+        # Hashing the rows of a version the index has not synced yet does not need the lock.
+        keys = row_keys(snap.df) if snap.version not in (self._version, self._other_rows[0]) else None
+        # Appends during sync() need the arrays unexported, so numpy views only live under the lock.
+        # Scores and the row map are read together, so doc ids always map to rows of 'snap'.
+        with self._lock:
+            docs, scores = self._scores(terms)
+            starts, order = self._rows_for(snap, keys)
+            counts = starts[docs + 1] - starts[docs]
+            first = np.repeat(starts[docs], counts)
+            rows = order[first + np.arange(len(first)) - np.repeat(np.cumsum(counts) - counts, counts)]
+            scores = np.repeat(scores, counts)
+
+        keep = np.ones(len(rows), dtype=bool)
+        posts = snap.posts
+        if region and region != "All":
+            keep &= posts.region_masks[region][rows]
+        if topic:
+            keep &= posts.topic[rows] == topic.lower()
+        if sentiments:
+            keep &= np.isin(posts.sentiment[rows], [s.strip().lower() for s in sentiments])
+        rows, scores = rows[keep], scores[keep]
+
+        total = len(rows)
+        end = min(offset + limit, total)
+        if offset >= end:
+            return rows[:0], scores[:0], total
+        # Only the first 'end' results need ordering.
+        top = np.argpartition(-scores, end - 1)[:end] if end < total else np.arange(total)
+        top = top[np.lexsort((rows[top], -scores[top]))][offset:end]
+        return rows[top], scores[top], total
@@ -0,0 +1,51 @@
+export const API_BASE = "http://127.0.0.1:5001";
+
+export const fetchJSON = async (path, params = {}) => {
+  const response = await fetch(`${API_BASE}${path}?${new URLSearchParams(params)}`, { cache: "no-cache" });
+  if (!response.ok) {
+    throw new Error(`${path} failed: ${response.status} ${response.statusText}`);
+  }
+  return response.json();
+};
+
+// Calls onChange whenever the server reports that the dataset was reloaded.
+// Returns a function that closes the stream.
+export const subscribeToDataset = (onChange) => {
+  const events = new EventSource(`${API_BASE}/events`);
+  events.addEventListener("dataset-changed", onChange);
+  return () => events.close();
+};
+
+// POSTs a chat request to /api/chat/stream and calls onDelta with each piece of the answer as it arrives.
+// Aborting 'signal' closes the connection, which also stops the generation on the server.
+export const streamChat = async (body, onDelta, signal) => {
+  const response = await fetch(`${API_BASE}/api/chat/stream`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify(body),
+    signal,
+  });
+  if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
+
+  const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+  let buffer = "";
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) return;
+    buffer += value;
+
+    const events = buffer.split("\n\n");
+    buffer = events.pop();
+    for (const raw of events) {
+      let event = "message";
+      let data = "";
+      for (const line of raw.split("\n")) {
+        if (line.startsWith("event: ")) event = line.slice(7);
+        else if (line.startsWith("data: ")) data += line.slice(6);
+      }
+      if (event === "error") throw new Error(JSON.parse(data).error);
+      if (event === "done") return;
+      if (data) onDelta(JSON.parse(data).delta);
+    }
+  }
+};
@@ -10,23 +10,9 @@ import {
   ResponsiveContainer,
 } from "recharts";
 
-const TrendingChart = ({ posts }) => {
-  const topTopics = useMemo(() => {
-    if (!posts || !Array.isArray(posts)) return [];
-
-    const counts = {};
-    posts.forEach((post) => {
-        if (post.topic_name) {
-        counts[post.topic_name] = (counts[post.topic_name] || 0) + 1;
-        }
-    });
-
-    return Object.entries(counts)
-        .sort((a, b) => b[1] - a[1])
-        .slice(0, 10)
-        .map(([name]) => name);
-    }, [posts]);
-
+const TrendingChart = ({ topics, data }) => {
+  const topTopics = useMemo(() => topics || [], [topics]);
+  const chartData = data || [];
 
   const [activeLines, setActiveLines] = useState(() =>
     topTopics.reduce((acc, topic) => {
@@ -44,42 +30,6 @@ const TrendingChart = ({ posts }) => {
     );
   }, [topTopics]);
 
-  const chartData = useMemo(() => {
-    if (!posts || posts.length === 0) return [];
-
-    const grouped = {};
-    const allMonths = new Set();
-
-    posts.forEach((post) => {
-      if (!post.date || !post.topic_name) return;
-
-      const date = new Date(post.date);
-      if (isNaN(date)) return;
-
-      const monthKey = `${date.getFullYear()}-${String(
-        date.getMonth() + 1
-      ).padStart(2, "0")}`;
-      const topic = post.topic_name;
-
-      allMonths.add(monthKey);
-
-      if (!grouped[monthKey]) grouped[monthKey] = {};
-      grouped[monthKey][topic] = (grouped[monthKey][topic] || 0) + 1;
-    });
-
-    const sortedMonths = Array.from(allMonths).sort();
-
-    return sortedMonths.map((monthKey) => {
-      const monthData = { date: monthKey };
-
-      topTopics.forEach((topic) => {
-        monthData[topic] = grouped[monthKey]?.[topic] || 0;
-      });
-
-      return monthData;
-    });
-  }, [posts, topTopics]);
-
   const colors = [
     "#e91e63",
     "#9c27b0",
@@ -132,7 +82,7 @@ const TrendingChart = ({ posts }) => {
     return null;
   };
 
-  if (!posts || posts.length === 0 || chartData.length === 0) {
+  if (chartData.length === 0) {
     return (
       <div
         style={{
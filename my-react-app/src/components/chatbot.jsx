@@ -1,37 +1,42 @@
-import React, { useState, useEffect, useRef } from 'react';
+import React, { useState, useEffect, useRef, useCallback } from 'react';
+import { streamChat } from '../api';
 
-function Chatbot() {
+function Chatbot({ region = 'All', topic = null }) {
   const [messages, setMessages] = useState([]);
   const [currentInput, setCurrentInput] = useState("");
   const messagesEndRef = useRef(null);
+  const requestRef = useRef(null);
+
+  // Streams the answer to 'history' into a new assistant message, cancelling any answer still in flight.
+  const ask = useCallback(async (history) => {
+    requestRef.current?.abort();
+    const controller = new AbortController();
+    requestRef.current = controller;
+
+    setMessages([...history, { role: "assistant", content: "" }]);
+    const appendToAnswer = (delta) =>
+      setMessages((prev) => {
+        const last = prev[prev.length - 1];
+        return [...prev.slice(0, -1), { ...last, content: last.content + delta }];
+      });
 
-  useEffect(() => {
-    const getInitialSummary = async () => {
-      const initialQuery = "What are the main issues users are reporting?";
-      const userMessage = { role: "user", content: initialQuery };
-
-      try {
-        const response = await fetch('http://localhost:5001/api/chat', {
-          method: 'POST',
-          headers: { 'Content-Type': 'application/json' },
-          body: JSON.stringify({ messages: [userMessage] }),
-        });
-
-        if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
-
-        const data = await response.json();
-        const botMessage = { role: "assistant", content: data.response };
-        setMessages([userMessage, botMessage]);
-      } catch (error) {
-        console.error("Failed to fetch initial summary:", error);
-        setMessages([
-          { role: "assistant", content: `Error: Could not connect to the chatbot. ${error.message}` },
-        ]);
-      }
-    };
+    try {
+      await streamChat({ messages: history, region, topic }, appendToAnswer, controller.signal);
+    } catch (error) {
+      if (error.name === "AbortError") return;
+      console.error("Failed to fetch chat response:", error);
+      setMessages([
+        ...history,
+        { role: "assistant", content: `Error: Could not get a response. ${error.message}` },
+      ]);
+    }
+  }, [region, topic]);
 
-    getInitialSummary();
-  }, []);
+  useEffect(() => {
+    const initialQuery = "What are the main issues users are reporting?";
+    ask([{ role: "user", content: initialQuery }]);
+    return () => requestRef.current?.abort();
+  }, [ask]);
 
   useEffect(() => {
     if (messagesEndRef.current) {
@@ -39,34 +44,13 @@ function Chatbot() {
     }
   }, [messages]);
 
-  const handleSubmit = async (e) => {
+  const handleSubmit = (e) => {
     e.preventDefault();
     if (!currentInput.trim()) return;
 
     const newUserMessage = { role: "user", content: currentInput };
-    const messageHistory = [...messages, newUserMessage];
-    setMessages(messageHistory);
     setCurrentInput("");
-
-    try {
-      const response = await fetch('http://localhost:5001/api/chat', {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ messages: messageHistory }),
-      });
-
-      if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
-
-      const data = await response.json();
-      const botMessage = { role: "assistant", content: data.response };
-      setMessages([...messageHistory, botMessage]);
-    } catch (error) {
-      console.error("Failed to fetch chat response:", error);
-      setMessages([
-        ...messageHistory,
-        { role: "assistant", content: `Error: Could not get a response. ${error.message}` },
-      ]);
-    }
+    ask([...messages, newUserMessage]);
   };
 
   const Message = ({ role, content }) => (
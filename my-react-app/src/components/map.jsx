@@ -17,38 +17,14 @@ const buttons = [
   { id: 4, region: "Northeast", top: "30%", left: "80%", size: "8%", color: "grey" },
 ];
 
-const Map = ({ onRegionSelect, loadCSV }) => {
+const Map = ({ onRegionSelect }) => {
   const [activeButton, setActiveButton] = useState(null);
-  const [isLoading, setIsLoading] = useState(false);
-  const [error, setError] = useState(null);
-
-  const handleClick = async (id, region) => {
-    if (isLoading) return; 
 
+  const handleClick = (id, region) => {
     setActiveButton(id);
-    setIsLoading(true);
-    setError(null);
-
-    try {
-      const response = await fetch(`http://127.0.0.1:5001/filter?region=${region}`);
-
-      if (!response.ok) {
-        throw new Error(`Filter API failed: ${response.statusText}`);
-      }
-
-      const result = await response.json();
-      console.log(result.message); 
-
-      if (onRegionSelect) {
-        onRegionSelect(region);
-      }
 
-      loadCSV();
-    } catch (err) {
-      console.error("Failed to filter data:", err);
-      setError(err.message);
-    } finally {
-      setIsLoading(false);
+    if (onRegionSelect) {
+      onRegionSelect(region);
     }
   };
 
@@ -72,10 +48,9 @@ const Map = ({ onRegionSelect, loadCSV }) => {
             
             zIndex: btn.zIndex !== undefined ? btn.zIndex : 0,
             backgroundColor: activeButton === btn.id ? "magenta" : (btn.color || 'transparent'),
-            cursor: isLoading ? "wait" : "pointer",
+            cursor: "pointer",
           }}
           onClick={() => handleClick(btn.id, btn.region)}
-          disabled={isLoading}
         />
       ))}
     </div>
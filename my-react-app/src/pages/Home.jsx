@@ -1,60 +1,40 @@
 import React, { useState, useEffect } from "react";
 import { useNavigate } from "react-router-dom";
-import Papa from 'papaparse';
 import "./Home.css";
 import Map from "../components/map";
 import TrendingChart from "../components/TrendingChart";
+import { fetchJSON, subscribeToDataset } from "../api";
 
 const Home = () => {
   const [hovered, setHovered] = useState(null);
   const [gaugePercent, setGaugePercent] = useState(0);
   const navigate = useNavigate();
-  const [posts, setPosts] = useState([]);
+  const [trendingTopics, setTrendingTopics] = useState([]);
+  const [trends, setTrends] = useState({ topics: [], series: [] });
+  const [region, setRegion] = useState("All");
 
-  const loadCSV = async () => {
-    try {
-      const response = await fetch("filtered_data.csv", { cache: "no-store" });
-      if (!response.ok) {
-        console.error("CSV error:", response.status, response.statusText);
-        return;
+  useEffect(() => {
+    const loadAggregates = async () => {
+      try {
+        const params = { region };
+        const [topics, sentiment, trendData] = await Promise.all([
+          fetchJSON("/api/aggregates/topics", params),
+          fetchJSON("/api/aggregates/sentiment", params),
+          fetchJSON("/api/aggregates/trends", { ...params, bucket: "month", top: 10 }),
+        ]);
+
+        setTrendingTopics(topics);
+        setTrends(trendData);
+        setGaugePercent(sentiment.positive_pct * 5);
+      } catch (error) {
+        console.error("Error loading aggregates:", error);
       }
+    };
 
-      const csvText = await response.text();
-      Papa.parse(csvText, {
-        header: true,
-        skipEmptyLines: true,
-        transformHeader: (h) => h.trim().toLowerCase(),
-        complete: (results) => {
-          const cleanedPosts = results.data
-            .filter(
-              (post) =>
-                post && post.text && post.text.trim() !== "" && post.topic_name
-            )
-            .sort((a, b) => new Date(b.date) - new Date(a.date));
-
-          setPosts(cleanedPosts);
+    loadAggregates();
 
-          const total = cleanedPosts.length;
-          const positiveCount = cleanedPosts.filter(
-            (p) => p.sentiment?.toLowerCase() === "positive"
-          ).length;
-          const percentPositive =
-            total > 0 ? (positiveCount / total) * 500 : 0;
-
-          setGaugePercent(percentPositive);
-        },
-        error: (error) => {
-          console.error("Error parsing CSV:", error);
-        },
-      });
-    } catch (error) {
-      console.error("Error loading CSV:", error);
-    }
-  };
-
-  useEffect(() => {
-    loadCSV();
-  }, []);
+    return subscribeToDataset(loadAggregates);
+  }, [region]);
 
 
   // Function to calculate the stroke-dashoffset for the gauge animation
@@ -64,28 +44,6 @@ const Home = () => {
     return circumference * (1 - (percent / 100));
   };
 
-  const trendingTopics = React.useMemo(() => {
-    const topicCounts = {};
-
-    for (const post of posts) {
-      const topicId = post.topic_name; 
-      
-      if (topicId) {
-        topicCounts[topicId] = (topicCounts[topicId] || 0) + 1;
-      }
-    }
-
-    const countsArray = Object.entries(topicCounts);
-
-    countsArray.sort((a, b) => b[1] - a[1]);
-
-    return countsArray.map(([topic_name, count]) => ({
-      topic_name: topic_name,
-      count: count
-    }));
-
-  }, [posts]);
-
   return (
     <div className="home-body">
       <aside className="home-sidebar">
@@ -103,7 +61,7 @@ const Home = () => {
               onMouseEnter={() => setHovered(index)}
               onMouseLeave={() => setHovered(null)}
 
-              onClick={() => navigate(`/topics/${encodeURIComponent(topic.topic_name)}`)}
+              onClick={() => navigate(`/topics/${encodeURIComponent(topic.topic_name)}?region=${encodeURIComponent(region)}`)}
               className={`trending-box ${hovered === index ? "hovered" : ""}`}
             >
               <div className="trending-box-content">
@@ -121,7 +79,7 @@ const Home = () => {
 
         <div className="dashboard-item chart-container">
           <p style={{ fontWeight: "bold" }}>Trend Frequency by Topic</p>
-          <TrendingChart posts={posts} />
+          <TrendingChart topics={trends.topics} data={trends.series} />
         </div>
 
          <div className="dashboard-item gauge-container">
@@ -156,7 +114,7 @@ const Home = () => {
             minWidth: "400px"
           }}
         >
-          <Map loadCSV={loadCSV} />
+          <Map onRegionSelect={setRegion} />
         </div>
       </main>
     </div>
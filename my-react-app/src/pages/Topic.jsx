@@ -1,8 +1,10 @@
-import React, { useState, useEffect } from 'react';
-import { useParams, useNavigate, useLocation } from 'react-router-dom';
-import Papa from 'papaparse';
+import React, { useState, useEffect, useCallback } from 'react';
+import { useParams, useNavigate, useLocation, useSearchParams } from 'react-router-dom';
 import "./Topic.css";
 import Chatbot from '../components/chatbot';
+import { fetchJSON, subscribeToDataset } from '../api';
+
+const PAGE_SIZE = 20;
 
 const getGaugeOffset = (percent) => {
   const circumference = 282.74; 
@@ -14,10 +16,13 @@ const Topic = () => {
   const location = useLocation();
   const { trendingIndex, trendingTopics } = location.state || { trendingIndex: 1, trendingTopics: [] };
   const decodedTopic = decodeURIComponent(topicName);
+  const [searchParams] = useSearchParams();
+  const region = searchParams.get('region') || 'All';
   const [gaugePercent, setGaugePercent] = useState(0);
   const navigate = useNavigate();
 
   const [posts, setPosts] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [sortKey, setSortKey] = useState("newest"); 
   const [sentimentFilter, setSentimentFilter] = useState({
     positive: true,
@@ -35,69 +40,49 @@ const Topic = () => {
     }));
   };
 
+  // Fetches the page after 'cursor' (or the first page) and appends to or replaces the list.
+  // Sentiments the checkboxes don't cover (e.g. neutral) are always shown.
+  const loadPosts = useCallback(async (cursor = null) => {
+    const params = { region, topic: decodedTopic, sort: sortKey, limit: PAGE_SIZE };
+    if (!(sentimentFilter.positive && sentimentFilter.negative)) {
+      const wanted = Object.keys(sentimentFilter).filter((s) => sentimentFilter[s]);
+      params.sentiment = [...wanted, "neutral"].join(",");
+    }
+    if (cursor) params.cursor = cursor;
+
+    try {
+      const page = await fetchJSON("/posts", params);
+      setPosts((prev) => (cursor ? [...prev, ...page.posts] : page.posts));
+      setNextCursor(page.next_cursor);
+    } catch (error) {
+      console.error('Error loading posts:', error);
+    }
+  }, [region, decodedTopic, sortKey, sentimentFilter]);
+
+  useEffect(() => {
+    loadPosts();
+    return subscribeToDataset(() => loadPosts());
+  }, [loadPosts]);
+
   useEffect(() => {
-    const loadCSV = async () => {
+    const loadGauge = async () => {
       try {
-        const response = await fetch('../filtered_data.csv', { cache: 'no-store' });
-        if (!response.ok) {
-          console.error('CSV error:', response.status, response.statusText);
-          return;
-        }
-        const csvText = await response.text();
-  
-        Papa.parse(csvText, {
-          header: true,
-          skipEmptyLines: true,
-          transformHeader: (h) => h.trim().toLowerCase(),
-          complete: (results) => {
-            const cleanedPosts = results.data
-              .filter(post => post && post.text && post.text.trim() !== '' && post.topic_name)
-              .sort((a, b) => new Date(b.date) - new Date(a.date));
-  
-            setPosts(cleanedPosts);
-  
-            const total = cleanedPosts.length;
-            const positiveCount = cleanedPosts.filter(p => p.sentiment?.toLowerCase() === 'positive').length;
-            const percentPositive = total > 0 ? (positiveCount / total) * 500 : 0;
-  
-            setGaugePercent(percentPositive);
-          },
-          error: (error) => {
-            console.error('Error parsing CSV:', error);
-          }
-        });
+        const sentiment = await fetchJSON("/api/aggregates/sentiment", { region, topic: decodedTopic });
+        setGaugePercent(sentiment.positive_pct * 5);
       } catch (error) {
-        console.error('Error loading CSV:', error);
+        console.error('Error loading sentiment:', error);
       }
     };
-  
-    loadCSV();
-  
-    const interval = setInterval(loadCSV, 500);
-  
-    return () => clearInterval(interval);
-  }, []);
-
-
-  //Filter and sort posts
-  const filteredPosts = posts
-    .filter(post => post.topic_name.toLowerCase() === decodedTopic.toLowerCase())
-    .filter(post => sentimentFilter[post.sentiment?.toLowerCase()] ?? true)
-    .sort((a, b) => {
-      if (sortKey === "likes") {
-        return Number(b.thanks || 0) - Number(a.thanks || 0);
-      }
-      if (sortKey === "newest") {
-        return new Date(b.date) - new Date(a.date);
-      }
-      return 0;
-    });
+
+    loadGauge();
+    return subscribeToDataset(loadGauge);
+  }, [region, decodedTopic]);
 
   return (
     <div className="topic-container">
       <div className="bubbles-container">
-        {filteredPosts.length > 0 ? (
-          filteredPosts.map((post, index) => (
+        {posts.length > 0 ? (
+          posts.map((post, index) => (
             <div key={index} className="bubble">
               <div className="bubble-source">
                 {post.url?.toLowerCase().includes("reddit") && (
@@ -113,6 +98,11 @@ const Topic = () => {
         ) : (
           <p>No posts found for this topic.</p>
         )}
+        {nextCursor && (
+          <button className="filter-btn" onClick={() => loadPosts(nextCursor)}>
+            Load more
+          </button>
+        )}
       </div>
 
       <div className="dashboard-container">
@@ -181,7 +171,7 @@ const Topic = () => {
                 const nextIndex = (trendingIndex % trendingTopics.length) + 1;
                 const nextTopic = trendingTopics[nextIndex - 1];
                 if (nextTopic) {
-                  navigate(`/topics/${encodeURIComponent(nextTopic)}`, {
+                  navigate(`/topics/${encodeURIComponent(nextTopic)}?region=${encodeURIComponent(region)}`, {
                     state: {
                       trendingIndex: nextIndex,
                       trendingTopics
@@ -202,7 +192,7 @@ const Topic = () => {
             display: "flex",
             flexDirection: "column"
           }}>
-            <Chatbot />
+            <Chatbot region={region} topic={decodedTopic} />
           </div>
 
           
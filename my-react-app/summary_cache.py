@@ -0,0 +1,107 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+def prompt_hash(params):
+    """Hash of everything sent to the model: model name, sampling settings and the exact messages."""
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class SummaryCache:
+    """
+    Thread-safe LRU of chat answers with a time-to-live. Keys are expected to contain the dataset
+    version, so a reload makes old entries unreachable and LRU pushes them out.
+    Concurrent misses on the same key share one computation instead of each calling the model.
+    """
+
+    def __init__(self, max_entries=512, ttl=6 * 3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, stored_at = entry
+            if time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def lookup(self, key):
+        """get() that also counts towards the hit rate."""
+        value = self.get(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_compute(self, key, compute):
+        """Returns the cached value for key, or runs compute() once (even under concurrent calls) and caches it."""
+        value = self.get(key)
+        if value is not None:
+            with self._lock:
+                self.hits += 1
+            return value
+
+        with self._lock:
+            waiter = self._inflight.get(key)
+            if waiter is None:
+                waiter = self._inflight[key] = threading.Event()
+                owner = True
+                self.misses += 1
+            else:
+                owner = False
+
+        if not owner:
+            waiter.wait()
+            value = self.get(key)
+            with self._lock:
+                if value is not None:
+                    self.hits += 1
+                else:
+                    self.misses += 1
+            if value is not None:
+                return value
+            # The computation we waited on failed; try it ourselves.
+            value = compute()
+            self.put(key, value)
+            return value
+
+        try:
+            value = compute()
+            self.put(key, value)
+            return value
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            waiter.set()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
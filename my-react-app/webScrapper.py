@@ -1,220 +1,166 @@
 import requests
-from bs4 import BeautifulSoup
-from dateutil import parser as dateparser
-import re
+import os
 import time
-import praw
+import threading
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+from requests.adapters import HTTPAdapter
+from review_parser import extract_reviews
 import csv
-from datetime import datetime
-
-import praw
-import csv
-from datetime import datetime
-import re
-
-# --- Reddit Setup ---
-reddit = praw.Reddit(
-    client_id="",
-    client_secret="",
-    user_agent="my_tmobile_sentiment_scraper"
-)
-
-subreddit = reddit.subreddit("tmobile")
-
-# --- Scrape Latest Posts ---
-posts_data = []
-
-for post in subreddit.new(limit=100):
-    created_time = datetime.utcfromtimestamp(post.created_utc).strftime('%Y-%m-%d %H:%M:%S')
-
-    # Clean up post text (remove newlines, excessive spaces, and quotes)
-    clean_text = re.sub(r'\s+', ' ', post.selftext).strip()
-    clean_text = clean_text.replace('"', "'")
-
-    posts_data.append({
-        "Title": post.title.strip(),
-        "Date": created_time,
-        "Upvotes": post.score,
-        "URL": post.url,
-        "Text": clean_text[:1000] if clean_text else "(No text provided)"
-    })
-
-# --- Save to CSV ---
-output_file = "reddit_tmobile_clean.csv"
-
-with open(output_file, mode="w", newline="", encoding="utf-8-sig") as file:
-    writer = csv.DictWriter(file, fieldnames=["Title", "Date", "Upvotes", "URL", "Text"])
-    writer.writeheader()
-    writer.writerows(posts_data)
-
-print(f"✅ Scraped {len(posts_data)} posts and saved clean data to {output_file}")
 
 
-
-BASE_URL = "https://www.consumeraffairs.com/cell_phones/tmobile_network.html?page={}"
+# Override to scrape saved pages from a local server, e.g. "http://127.0.0.1:8000/page{}.html".
+BASE_URL = os.getenv("CONSUMERAFFAIRS_URL", "https://www.consumeraffairs.com/cell_phones/tmobile_network.html?page={}")
 HEADERS = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"}
 OUTPUT_CSV = "tmobile_reviews_combined.csv"
 PAGES_TO_SCRAPE = 5
-
-
-def parse_thanks_count(review_block):
-    """Extracts number of 'thanks' or 'helpful' votes."""
-    candidates = []
-    for tag in review_block.find_all(["button", "a", "span", "div"]):
-        txt = (tag.get_text(" ", strip=True) or "").strip()
-        if not txt:
-            continue
-        if re.search(r"\bthanks\b", txt, re.I) or re.search(r"helpful", txt, re.I):
-            candidates.append(txt)
-
-    for txt in candidates:
-        m = re.search(r"\((\d+)\)", txt)
-        if m:
-            return int(m.group(1))
-        m = re.search(r"(\d+)\s*(people )?(found this helpful|helpful)?", txt, re.I)
-        if m:
-            return int(m.group(1))
-
-    fallback = review_block.find(attrs={"class": re.compile(r"(thanks|helpful|vote|rvw_thanks|rvw_like)", re.I)})
-    if fallback:
-        m = re.search(r"(\d+)", fallback.get_text() or "")
-        if m:
-            return int(m.group(1))
-
-    return 0
-
-
-def parse_review_date(review_block):
-    """Extracts and normalizes review date."""
-    time_tag = review_block.find("time")
-    if time_tag and time_tag.has_attr("datetime"):
+FIELDNAMES = ["location", "date", "thanks", "text"]
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class HostRateLimiter:
+    """Spaces out requests to the same host by at least 1 / rate seconds, across all threads."""
+
+    def __init__(self, rate=1.0):
+        self.interval = 1.0 / rate
+        self.next_slot = {}
+        self.lock = threading.Lock()
+
+    def wait(self, url):
+        host = urlparse(url).netloc
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot.get(host, now))
+            self.next_slot[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def make_session(pool_size=8):
+    """One pooled session for the whole run, so connections are reused between pages."""
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def fetch(session, url, limiter, retries=4, backoff=1.0):
+    """GETs a page under the rate limit, retrying connection errors, 429 and 5xx with exponential backoff."""
+    for attempt in range(retries + 1):
+        limiter.wait(url)
         try:
-            dt = dateparser.parse(time_tag["datetime"])
-            return dt.strftime("%Y-%m-%d %H:%M:%S")
-        except Exception:
-            return time_tag["datetime"]
-
-    pdt = review_block.find("p", class_=re.compile(r"rvw_rvd-dt|rvw-dt|rvw_rvd", re.I))
-    if pdt:
-        txt = pdt.get_text(" ", strip=True)
-        m = re.search(r"Reviewed\s*[:\-]?\s*(.+)", txt, re.I)
-        date_str = m.group(1) if m else txt
-        try:
-            dt = dateparser.parse(date_str)
-            return dt.strftime("%Y-%m-%d %H:%M:%S")
-        except Exception:
-            return date_str
-
-    txt_block = review_block.get_text(" ", strip=True)
-    m = re.search(r"Reviewed\s*[:\-]?\s*([A-Za-z0-9,\.\s]+(?:\d{4})?)", txt_block, re.I)
-    if m:
-        date_str = m.group(1).strip()
-        try:
-            dt = dateparser.parse(date_str)
-            return dt.strftime("%Y-%m-%d %H:%M:%S")
-        except Exception:
-            return date_str
-    return ""
-
-
-def parse_review_text(review_block):
-    """Extracts full review text (including hidden parts)."""
-    full_text_div = review_block.find("div", class_=re.compile(r"js-collapsed|rvw_all-text|rvw_top-text", re.I))
-    if full_text_div:
-        text = full_text_div.get_text(" ", strip=True)
-        text = re.sub(r"\b(More|Less)\b$", "", text).strip()
-        if text:
-            return text
-
-    ps = review_block.find_all("p")
-    if ps:
-        texts = []
-        for p in ps:
-            pt = p.get_text(" ", strip=True)
-            if not pt:
-                continue
-            if re.search(r"Reviewed\s+", pt, re.I):
-                continue
-            texts.append(pt)
-        combined = " ".join(texts).strip()
-        if combined:
-            return combined
-
-    return review_block.get_text(" ", strip=True)
-
-
-def parse_location(review_block):
-    """Extracts reviewer location."""
-    loc = review_block.find("span", class_=re.compile(r"rvw_inf-lctn", re.I))
-    if loc:
-        return loc.get_text(strip=True)
-    loc2 = review_block.find("span", class_=re.compile(r"lctn|location", re.I))
-    if loc2:
-        return loc2.get_text(strip=True)
-    return ""
-
-
-def scrape_page(page_number):
+            resp = session.get(url, timeout=15)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if attempt == retries:
+                raise
+            delay = backoff * 2 ** attempt
+            print(f"  ↻ {url}: {e.__class__.__name__}, retrying in {delay:.1f}s")
+        else:
+            if resp.status_code not in RETRY_STATUSES or attempt == retries:
+                resp.raise_for_status()
+                return resp.text
+            retry_after = resp.headers.get("Retry-After", "")
+            delay = float(retry_after) if retry_after.isdigit() else backoff * 2 ** attempt
+            print(f"  ↻ {url}: HTTP {resp.status_code}, retrying in {delay:.1f}s")
+        time.sleep(delay)
+
+
+def scrape_page(page_number, session=None, limiter=None):
     """Scrapes one page and returns list of reviews."""
     url = BASE_URL.format(page_number)
     print(f"Scraping page {page_number} → {url}")
 
-    resp = requests.get(url, headers=HEADERS, timeout=15)
-    resp.raise_for_status()
-    soup = BeautifulSoup(resp.text, "html.parser")
+    html = fetch(session or make_session(1), url, limiter or HostRateLimiter())
+    results = extract_reviews(html)
 
-    review_blocks = soup.find_all("div", class_=re.compile(r"\bjs-rvw\b|\brvw\b", re.I))
-    results = []
+    print(f"  → Found {len(results)} reviews on page {page_number}")
+    return results
 
-    for rb in review_blocks:
-        location = parse_location(rb)
-        date = parse_review_date(rb)
-        thanks = parse_thanks_count(rb)
-        text = parse_review_text(rb)
 
-        # Avoid empty or duplicate content
-        key = (location, date, text)
-        if not text or key in results:
-            continue
+def review_key(review):
+    """Identity of a review across runs. 'thanks' is left out because it changes over time."""
+    raw = "\x1f".join(str(review.get(k) or "") for k in ("location", "date", "text"))
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
 
-        results.append({
-            "location": location,
-            "date": date,
-            "thanks": thanks,
-            "text": text
-        })
 
-    print(f"  → Found {len(results)} reviews on page {page_number}")
-    return results
+def load_seen(path=OUTPUT_CSV):
+    """Keys of every review already saved in 'path'."""
+    if not os.path.exists(path):
+        return set()
+    with open(path, newline="", encoding="utf-8") as f:
+        return {review_key(r) for r in csv.DictReader(f)}
 
 
-def scrape_multiple_pages(pages=PAGES_TO_SCRAPE):
-    """Scrape multiple pages and deduplicate by text."""
-    all_reviews = []
-    seen = set()
+def scrape_multiple_pages(pages=PAGES_TO_SCRAPE, seen=None, concurrency=4, rate=1.0, stop_when_seen=True):
+    """
+    Scrapes pages 1..pages, 'concurrency' at a time under a per-host rate limit, and returns the reviews
+    whose keys are not in 'seen'. Pages are checked in order; as soon as one holds only reviews that were
+    already seen, the pages behind it are skipped, since older reviews come later. A page that fails or
+    parses no reviews at all never stops the crawl, since that says nothing about the pages behind it.
+    """
+    seen = set() if seen is None else seen
+    session = make_session(concurrency)
+    limiter = HostRateLimiter(rate)
+    new_reviews = []
 
-    for i in range(1, pages + 1):
+    def fetch_page(i):
         try:
-            reviews = scrape_page(i)
-            for r in reviews:
-                key = (r["location"], r["date"], r["text"])
-                if key not in seen:
-                    seen.add(key)
-                    all_reviews.append(r)
-            time.sleep(1.5)
+            return scrape_page(i, session, limiter)
         except Exception as e:
             print(f"⚠️ Error scraping page {i}: {e}")
-
-    return all_reviews
+            return None
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for start in range(1, pages + 1, concurrency):
+            window = range(start, min(start + concurrency, pages + 1))
+            stop = False
+            for i, reviews in zip(window, pool.map(fetch_page, window)):
+                if reviews is None:
+                    continue
+                if not reviews:
+                    print(f"⚠️ Page {i} parsed no reviews; check the page or the parser. Continuing.")
+                    continue
+                fresh = []
+                for r in reviews:
+                    key = review_key(r)
+                    if key not in seen:
+                        seen.add(key)
+                        fresh.append(r)
+                new_reviews.extend(fresh)
+                if stop_when_seen and not fresh and not stop:
+                    print(f"  → Page {i} has no new reviews, stopping.")
+                    stop = True
+            if stop:
+                break
+
+    return new_reviews
 
 
 if __name__ == "__main__":
-    all_data = scrape_multiple_pages(PAGES_TO_SCRAPE)
-    print(f"\n✅ Total unique reviews scraped: {len(all_data)}")
-
-    with open(OUTPUT_CSV, "w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=["location", "date", "thanks", "text"])
-        writer.writeheader()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Scrape new ConsumerAffairs reviews into the output CSV.")
+    parser.add_argument("--pages", type=int, default=PAGES_TO_SCRAPE, help="Maximum number of pages to visit.")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=1.0, help="Requests per second to the review host.")
+    parser.add_argument("--output", default=OUTPUT_CSV)
+    parser.add_argument("--full", action="store_true", help="Visit every page instead of stopping at known reviews.")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    seen = load_seen(args.output)
+    all_data = scrape_multiple_pages(args.pages, seen=seen, concurrency=args.concurrency, rate=args.rate,
+                                     stop_when_seen=not args.full)
+    print(f"\n✅ New unique reviews scraped: {len(all_data)} ({time.perf_counter() - started:.1f}s)")
+
+    write_header = not os.path.exists(args.output)
+    with open(args.output, "a", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
+        if write_header:
+            writer.writeheader()
         writer.writerows(all_data)
 
-    print(f"💾 Saved to {OUTPUT_CSV}")
+    print(f"💾 Appended to {args.output}")
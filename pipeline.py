@@ -0,0 +1,391 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+import numpy as np
+import pandas as pd
+
+import data
+import dedupe
+import metrics
+from embedding_store import EmbeddingStore
+from extractors import TierStats, parse_date_local, parse_location_local, resolve
+
+OUTPUT_COLUMNS = ["text", "score", "url", "date", "location", "topic_id", "topic_name", "sentiment", "group_id"]
+
+# Written to --metrics-file with a 'pipeline_' prefix, so these show up as pipeline_stage_rows_total etc.
+stage_rows = metrics.counter("stage_rows_total", "Rows per stage: enriched, copied from a near-duplicate, or failed.",
+                             ("stage", "source"))
+stage_seconds = metrics.counter("stage_seconds_total", "Wall time spent per stage.", ("stage",))
+stage_throughput = metrics.gauge("stage_rows_per_second", "Throughput of each stage in the last run.", ("stage",))
+last_run = metrics.gauge("last_run_timestamp_seconds", "When the last run finished, successful or not.")
+
+
+def row_hash(record: dict) -> str:
+    """Identity of a source row. The score is left out so that vote changes don't force re-enrichment."""
+    identity = [str(record.get(k) if pd.notna(record.get(k)) else "") for k in ("text", "url", "date", "location")]
+    return hashlib.sha256("\x1f".join(identity).encode("utf-8")).hexdigest()
+
+
+def clean_value(value):
+    return None if value is None or (isinstance(value, float) and pd.isna(value)) else value
+
+
+class PipelineState:
+    """
+    SQLite checkpoint of every source row (by content hash) and the stages that have completed for it.
+    Each chunk of stage results is committed together with its 'done' marks, so a crash loses at most one chunk.
+    """
+
+    def __init__(self, path="pipeline.sqlite"):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS rows (
+                hash TEXT PRIMARY KEY,
+                seq INTEGER NOT NULL,
+                record TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS stages_done (
+                hash TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                PRIMARY KEY (hash, stage)
+            );
+            CREATE TABLE IF NOT EXISTS signatures (
+                hash TEXT PRIMARY KEY,
+                minhash BLOB NOT NULL
+            );
+            """
+        )
+        self.conn.commit()
+
+    def sync_sources(self, df: pd.DataFrame):
+        """Adds new rows, refreshes scores of known ones and drops rows no longer in the sources."""
+        records = [{k: clean_value(v) for k, v in r.items()} for r in df.to_dict(orient="records")]
+        hashes = [row_hash(r) for r in records]
+
+        known = dict(self.conn.execute("SELECT hash, record FROM rows"))
+        (next_seq,) = self.conn.execute("SELECT COALESCE(MAX(seq), -1) + 1 FROM rows").fetchone()
+
+        added = 0
+        for h, r in zip(hashes, records):
+            if h in known:
+                stored = json.loads(known[h])
+                if stored.get("score") != r.get("score"):
+                    stored["score"] = r.get("score")
+                    self.conn.execute("UPDATE rows SET record = ? WHERE hash = ?", (json.dumps(stored), h))
+            else:
+                self.conn.execute("INSERT OR IGNORE INTO rows VALUES (?, ?, ?)", (h, next_seq, json.dumps(r)))
+                known[h] = None
+                next_seq += 1
+                added += 1
+
+        stale = set(known) - set(hashes)
+        self.conn.executemany("DELETE FROM rows WHERE hash = ?", [(h,) for h in stale])
+        self.conn.executemany("DELETE FROM stages_done WHERE hash = ?", [(h,) for h in stale])
+        self.conn.executemany("DELETE FROM signatures WHERE hash = ?", [(h,) for h in stale])
+        self.conn.commit()
+        return added, len(stale)
+
+    def pending(self, stage):
+        rows = self.conn.execute(
+            "SELECT hash, record FROM rows WHERE hash NOT IN (SELECT hash FROM stages_done WHERE stage = ?) "
+            "ORDER BY seq",
+            (stage,),
+        )
+        return [(h, json.loads(r)) for h, r in rows]
+
+    def complete(self, stage, results):
+        with self.conn:
+            self.conn.executemany("UPDATE rows SET record = ? WHERE hash = ?",
+                                  [(json.dumps(r), h) for h, r in results])
+            self.conn.executemany("INSERT OR IGNORE INTO stages_done VALUES (?, ?)",
+                                  [(h, stage) for h, _ in results])
+
+    def records(self):
+        return [json.loads(r) for (r,) in self.conn.execute("SELECT record FROM rows ORDER BY seq")]
+
+    def rows(self):
+        return [(h, seq, json.loads(r)) for h, seq, r in
+                self.conn.execute("SELECT hash, seq, record FROM rows ORDER BY seq")]
+
+    def get(self, row_hash):
+        (record,) = self.conn.execute("SELECT record FROM rows WHERE hash = ?", (row_hash,)).fetchone()
+        return json.loads(record)
+
+    def signatures(self, rows):
+        """MinHash signature of every (hash, record) in rows, computing and storing only the missing ones."""
+        stored = {h: np.frombuffer(blob, dtype=np.uint32) for h, blob in
+                  self.conn.execute("SELECT hash, minhash FROM signatures")}
+        missing = [(h, dedupe.minhash(r["text"])) for h, r in rows if h not in stored]
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO signatures VALUES (?, ?)",
+                                  [(h, sig.tobytes()) for h, sig in missing])
+        stored.update(missing)
+        return np.array([stored[h] for h, _ in rows])
+
+    def update_records(self, results):
+        with self.conn:
+            self.conn.executemany("UPDATE rows SET record = ? WHERE hash = ?",
+                                  [(json.dumps(r), h) for h, r in results])
+
+
+def has_text(record):
+    return isinstance(record.get("text"), str) and bool(record["text"].strip())
+
+
+def assign_groups(state, threshold=0.8):
+    """
+    Groups near-duplicate texts and stores each row's group id (the seq of the group's first row).
+    Returns {row hash: representative row hash} for the rows that are not their own representative.
+    """
+    rows = [(h, seq, r) for h, seq, r in state.rows() if has_text(r)]
+    signatures = state.signatures([(h, r) for h, _, r in rows])
+    reps = dedupe.near_duplicate_groups(signatures, threshold=threshold)
+
+    followers = {}
+    changed = []
+    for (h, _, r), rep in zip(rows, reps):
+        rep_hash, group_id, _ = rows[rep]
+        if rep_hash != h:
+            followers[h] = rep_hash
+        if r.get("group_id") != group_id:
+            r["group_id"] = group_id
+            changed.append((h, r))
+    state.update_records(changed)
+
+    print(f"[dedupe] {len(rows)} rows in {len(set(reps.tolist()))} groups, {len(followers)} near-duplicates")
+    return followers
+
+
+def make_stage_locations(stats):
+    def stage_locations(records):
+        todo = [r for r in records if not r.get("location") and has_text(r)]
+        found = data.engine.map(
+            lambda text: resolve(text, parse_location_local, data.get_location_from_text, stats),
+            [r["text"] for r in todo],
+            desc="Extracting locations",
+        )
+        for r, location in zip(todo, found):
+            r["location"] = location
+        return records
+    return stage_locations
+
+
+def make_stage_embeddings(store):
+    def stage_embeddings(records):
+        texts = [r["text"] for r in records if has_text(r)]
+        store.embed_missing(texts, data.embed_batch)
+        # Rows in a failed batch are returned as None, so they stay pending and are retried next run.
+        missing = set(store.missing(texts))
+        return [None if has_text(r) and r["text"] in missing else r for r in records]
+    return stage_embeddings
+
+
+def make_stage_topics(store, topics):
+    """'topics' holds the run's model under "model"; enrich() fits it before the stage's first chunk."""
+    def stage_topics(records):
+        todo = [r for r in records if has_text(r)]
+        if todo:
+            ids, names = data.assign_topics(topics["model"], store, [r["text"] for r in todo])
+            for r, topic_id, name in zip(todo, ids, names):
+                r["topic_id"], r["topic_name"] = int(topic_id), name
+        return records
+    return stage_topics
+
+
+def stage_sentiment(records):
+    todo = [r for r in records if has_text(r)]
+    failed = set()
+    for r, label in zip(todo, data.classify_sentiments([r["text"] for r in todo])):
+        if label is None:
+            failed.add(id(r))
+        r["sentiment"] = label
+    # Rows whose call failed are returned as None, so they stay pending and are retried next run.
+    return [None if id(r) in failed else r for r in records]
+
+
+def make_stage_dates(stats, batch_size=None):
+    """With batch_size, dates the local parser cannot resolve are asked for batch_size rows at a time."""
+    def stage_dates(records):
+        if batch_size:
+            local = [parse_date_local(str(r.get("date"))) for r in records]
+            extracted = data.extract_fields([r.get("text") or "" for r in records], [r.get("date") for r in records],
+                                            batch_size=batch_size, wanted=[[] if d else ["date"] for d in local])
+            cleaned = []
+            for date, fields in zip(local, extracted):
+                stats.record("local" if date else "llm" if fields["date"] else "unresolved")
+                cleaned.append(date or fields["date"])
+        else:
+            cleaned = data.engine.map(
+                lambda x: resolve(str(x), parse_date_local, data.get_dates_from_text, stats),
+                [r.get("date") for r in records],
+                desc="Cleaning dates",
+            )
+        for r, date in zip(records, cleaned):
+            r["date"] = date
+        return records
+    return stage_dates
+
+
+def make_stage_extraction(tier_stats, batch_size):
+    """
+    Batched mode: location and sentiment from one request per batch_size rows (data.extract_fields).
+    Both come from the text, so near-duplicates copy them; dates are per row and have their own stage.
+    Locations the local extractor resolves are not asked for, in the batch or the fallback.
+    """
+    def stage_extraction(records):
+        todo = [r for r in records if has_text(r)]
+        local_locations = [r.get("location") or parse_location_local(r["text"]) for r in todo]
+        wanted = [["sentiment"] + ([] if location else ["state"]) for location in local_locations]
+        extracted = data.extract_fields([r["text"] for r in todo], [r.get("date") for r in todo],
+                                        batch_size=batch_size, wanted=wanted)
+        failed = set()
+        for r, location, fields in zip(todo, local_locations, extracted):
+            if not r.get("location"):
+                tier_stats["locations"].record("local" if location else "llm" if fields["state"] else "unresolved")
+                r["location"] = location or fields["state"]
+            r["sentiment"] = fields["sentiment"]
+            if fields["sentiment"] is None:
+                failed.add(id(r))
+        # As in stage_sentiment, rows whose sentiment call failed stay pending for the next run.
+        return [None if id(r) in failed else r for r in records]
+    return stage_extraction
+
+
+def write_csv_atomic(df, path):
+    tmp = path + ".tmp"
+    df.to_csv(tmp, index=False)
+    os.replace(tmp, path)
+
+
+def run(output="tmobile_reviews_labeled.csv", state_path="pipeline.sqlite", chunk_size=200,
+        embeddings_dir="embeddings", model_dir="topic_model", metrics_file=None, batch_size=None):
+    """
+    Runs every stage over the rows that still need it. With batch_size, location and sentiment come
+    from one batched request per batch_size rows instead of per-row calls, and so do unparseable dates.
+    """
+    try:
+        enrich(output, state_path, chunk_size, embeddings_dir, model_dir, batch_size)
+    finally:
+        if metrics_file:
+            last_run.set(value=time.time())
+            metrics.write_textfile(metrics_file, prefix="pipeline_")
+
+
+def enrich(output, state_path, chunk_size, embeddings_dir, model_dir, batch_size=None):
+    state = PipelineState(state_path)
+
+    started = time.perf_counter()
+    added, removed = state.sync_sources(data.load_sources())
+    print(f"[sources] {added} new rows, {removed} removed ({time.perf_counter() - started:.1f}s)")
+
+    store = EmbeddingStore(embeddings_dir, model=data.EMBED_MODEL)
+    tier_stats = {"locations": TierStats("Locations"), "dates": TierStats("Dates")}
+    topics = {}
+    # The fields each stage derives from the text, which near-duplicates copy from their representative.
+    # Dates come from each row's own raw date, so every row goes through that stage.
+    stages = [
+        ("locations", make_stage_locations(tier_stats["locations"]), ["location"]),
+        ("embeddings", make_stage_embeddings(store), []),
+        ("topics", make_stage_topics(store, topics), ["topic_id", "topic_name"]),
+        ("sentiment", stage_sentiment, ["sentiment"]),
+        ("dates", make_stage_dates(tier_stats["dates"]), None),
+    ]
+    if batch_size:
+        # One batched stage replaces the location and sentiment ones; dates are batched in their own stage.
+        stages = [
+            ("embeddings", make_stage_embeddings(store), []),
+            ("topics", make_stage_topics(store, topics), ["topic_id", "topic_name"]),
+            ("extraction", make_stage_extraction(tier_stats, batch_size), ["location", "sentiment"]),
+            ("dates", make_stage_dates(tier_stats["dates"], batch_size), None),
+        ]
+
+    followers = assign_groups(state)
+    calls_saved = 0
+
+    for name, fn, shared in stages:
+        pending = state.pending(name)
+        if not pending:
+            print(f"[{name}] up to date")
+            continue
+
+        copies = [] if shared is None else [(h, r) for h, r in pending if h in followers]
+        own = [(h, r) for h, r in pending if shared is None or h not in followers]
+        waiting = set()
+        if name == "topics":
+            # Rows whose embedding failed wait for the next run; the topic model needs their vectors.
+            unembedded = set(store.missing([r["text"] for _, r in own if has_text(r)]))
+            waiting = {h for h, r in own if has_text(r) and r["text"] in unembedded}
+            own = [(h, r) for h, r in own if h not in waiting]
+
+        started = time.perf_counter()
+        topic_texts = [r["text"] for _, r in own if has_text(r)] if name == "topics" else None
+        if topic_texts:
+            # Fit and name the clusters from every pending row once, before the chunks only assign them.
+            topics["model"] = data.fit_topics(store, topic_texts, model_dir=model_dir, save=False)
+        failed = set()
+        for i in range(0, len(own), chunk_size):
+            chunk = own[i:i + chunk_size]
+            updated = fn([r for _, r in chunk])
+            done = [(h, r) for (h, _), r in zip(chunk, updated) if r is not None]
+            failed.update(h for (h, _), r in zip(chunk, updated) if r is None)
+            state.complete(name, done)
+        if "model" in topics:
+            # Saved once per run, after every chunk was assigned with the same topics.
+            topics.pop("model").save(model_dir)
+
+        # Representatives are done by now, so their results can be copied over; followers of failed ones wait.
+        copies = [(h, r) for h, r in copies if followers[h] not in failed and followers[h] not in waiting]
+        for h, r in copies:
+            rep = state.get(followers[h])
+            for field in shared:
+                if not r.get(field):
+                    r[field] = rep.get(field)
+        state.complete(name, copies)
+        calls_saved += len(copies)
+
+        elapsed = time.perf_counter() - started
+        stage_rows.inc(name, "enriched", amount=len(own) - len(failed))
+        stage_rows.inc(name, "failed", amount=len(failed))
+        stage_rows.inc(name, "copied", amount=len(copies))
+        stage_seconds.inc(name, amount=elapsed)
+        stage_throughput.set(name, value=len(pending) / max(elapsed, 1e-9))
+        print(f"[{name}] {len(pending)} rows in {elapsed:.1f}s ({len(pending) / max(elapsed, 1e-9):.1f} rows/s)"
+              + (f", {len(copies)} copied from near-duplicates" if copies else ""))
+        if failed:
+            print(f"⚠️ [{name}] {len(failed)} rows failed and will be retried on the next run.")
+        if name in tier_stats:
+            print(tier_stats[name].report())
+        elif name == "extraction":
+            print(tier_stats["locations"].report())
+
+    print(f"Near-duplicates saved {calls_saved} row enrichments this run.")
+
+    df = pd.DataFrame(state.records()).reindex(columns=OUTPUT_COLUMNS)
+    df = df.dropna(subset=["text", "date"])
+    df["group_id"] = df["group_id"].astype("Int64")
+    write_csv_atomic(df, output)
+    print(f"✅ Wrote {len(df)} rows to '{output}'")
+    print(f"LLM cache: {data.cache.stats()}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Incrementally run the ingestion and enrichment stages.")
+    parser.add_argument("--output", default="tmobile_reviews_labeled.csv")
+    parser.add_argument("--state", default="pipeline.sqlite")
+    parser.add_argument("--chunk-size", type=int, default=200)
+    parser.add_argument("--metrics-file", default="pipeline_metrics.prom",
+                        help="Where to write this run's metrics; the API server serves them on /metrics.")
+    parser.add_argument("--batched", action="store_true",
+                        help="Extract location, sentiment and date with one request per --batch-size rows.")
+    parser.add_argument("--batch-size", type=int, default=20)
+    args = parser.parse_args()
+
+    run(output=args.output, state_path=args.state, chunk_size=args.chunk_size, metrics_file=args.metrics_file,
+        batch_size=args.batch_size if args.batched else None)
@@ -0,0 +1,114 @@
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import train_test_split
+
+MODEL_PATH = "sentiment_model.joblib"
+
+vectorizer = HashingVectorizer(
+    n_features=2 ** 18,
+    ngram_range=(1, 2),
+    alternate_sign=False,
+    norm="l2",
+    strip_accents="unicode",
+)
+
+
+def load_labeled(path="tmobile_reviews_labeled.csv"):
+    df = pd.read_csv(path).dropna(subset=["text", "sentiment"])
+    return df["text"].astype(str).tolist(), df["sentiment"].astype(str).tolist()
+
+
+def train(texts, labels):
+    model = LogisticRegression(max_iter=1000, class_weight="balanced")
+    model.fit(vectorizer.transform(texts), labels)
+    return model
+
+
+class SentimentCascade:
+    """
+    Two-tier sentiment classifier. A hashing-vectorizer + logistic regression model scores every
+    text in one vectorized pass; only texts whose top class probability is below 'threshold'
+    are escalated to llm_fn, which is mapped over them concurrently by map_fn.
+    """
+
+    def __init__(self, model, llm_fn, threshold=0.6, map_fn=None):
+        self.model = model
+        self.llm_fn = llm_fn
+        self.threshold = threshold
+        self.map_fn = map_fn or (lambda fn, items: [fn(x) for x in items])
+        self.stats = {"local": 0, "escalated": 0}
+
+    @classmethod
+    def load(cls, llm_fn, path=MODEL_PATH, **kwargs):
+        return cls(joblib.load(path), llm_fn, **kwargs)
+
+    def score(self, texts):
+        """Local labels and their confidence, without calling the LLM."""
+        proba = self.model.predict_proba(vectorizer.transform(texts))
+        best = proba.argmax(axis=1)
+        return self.model.classes_[best], proba[np.arange(len(best)), best]
+
+    def classify(self, texts):
+        texts = list(texts)
+        if not texts:
+            return []
+
+        labels, confidence = self.score(texts)
+        labels = labels.astype(object)
+
+        uncertain = np.flatnonzero(confidence < self.threshold)
+        if len(uncertain):
+            escalated = self.map_fn(self.llm_fn, [texts[i] for i in uncertain])
+            labels[uncertain] = escalated
+
+        self.stats["local"] += len(texts) - len(uncertain)
+        self.stats["escalated"] += len(uncertain)
+        return labels.tolist()
+
+
+def evaluate(texts, labels, thresholds=(0.5, 0.6, 0.7, 0.8, 0.9), test_size=0.2, random_state=42):
+    """
+    Trains on one split and reports, on the held-out split, how often the local tier agrees
+    with the existing LLM labels and how many rows each threshold would escalate.
+    """
+    x_train, x_test, y_train, y_test = train_test_split(
+        texts, labels, test_size=test_size, random_state=random_state, stratify=labels
+    )
+    model = train(x_train, y_train)
+    cascade = SentimentCascade(model, llm_fn=None)
+    predicted, confidence = cascade.score(x_test)
+    y_test = np.asarray(y_test)
+
+    print(f"Held-out rows: {len(y_test)}")
+    print(f"Local-only agreement with LLM labels: {np.mean(predicted == y_test):.1%}")
+    print(f"{'threshold':>9} {'kept local':>10} {'local agreement':>16} {'cascade agreement':>18} {'API calls saved':>16}")
+    for t in thresholds:
+        confident = confidence >= t
+        kept = confident.mean()
+        local_agreement = np.mean(predicted[confident] == y_test[confident]) if confident.any() else float("nan")
+        # Escalated rows get the LLM label, so they agree by construction.
+        cascade_agreement = np.mean(np.where(confident, predicted == y_test, True))
+        print(f"{t:>9.2f} {kept:>10.1%} {local_agreement:>16.1%} {cascade_agreement:>18.1%} {int(confident.sum()):>16}")
+    return model
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Train or evaluate the local sentiment tier.")
+    parser.add_argument("command", choices=["train", "evaluate"])
+    parser.add_argument("--input", default="tmobile_reviews_labeled.csv")
+    parser.add_argument("--output", default=MODEL_PATH)
+    args = parser.parse_args()
+
+    texts, labels = load_labeled(args.input)
+
+    if args.command == "evaluate":
+        evaluate(texts, labels)
+    else:
+        model = train(texts, labels)
+        joblib.dump(model, args.output)
+        print(f"✅ Trained on {len(texts)} rows and saved to '{args.output}'")
@@ -0,0 +1,131 @@
+"""
+Seeded synthetic reviews in the labeled schema (text,score,url,date,location,topic_id,topic_name,sentiment),
+for exercising the app and the enrichment stages at sizes the sample CSVs can't reach.
+The same seed and size always produce the same file.
+
+    python synthetic_reviews.py 100000 -o synthetic_100000.csv --seed 42
+"""
+import numpy as np
+import pandas as pd
+
+COLUMNS = ["text", "score", "url", "date", "location", "topic_id", "topic_name", "sentiment"]
+
+TOPICS = ["promotions", "reliability", "billing", "contracts", "porting",
+          "scam", "customer_service", "customer_service", "credit_card", "coverage"]
+
+# Roughly the mix of the labeled sample.
+SENTIMENTS = ["Negative", "Positive", "Neutral"]
+SENTIMENT_WEIGHTS = [0.84, 0.09, 0.07]
+
+CITIES = [
+    "Houston, TX", "San Antonio, TX", "Dallas, TX", "Miami, FL", "Leesburg, FL", "Atlanta, GA", "Jonesboro, GA",
+    "Tulsa, OK", "New Orleans, LA", "Little Rock, AR", "Chicago, IL", "Detroit, MI", "Columbus, OH",
+    "Indianapolis, IN", "Madison, WI", "Minneapolis, MN", "Las Vegas, NV", "San Francisco, CA",
+    "Los Angeles, CA", "Bullhead City, AZ", "Seattle, WA", "Portland, OR", "New York, NY",
+    "Philadelphia, PA", "Newark, NJ", "Boston, MA", "Hartford, CT", "Berea, KY", "Simpsonville, SC",
+    "Denver, CO", "Boise, ID",
+]
+
+SUBJECTS = {
+    "promotions": ["the free phone promo", "my trade-in credit", "the BOGO deal", "the Netflix perk"],
+    "reliability": ["my 5G home internet", "the network", "data speeds", "dropped calls"],
+    "billing": ["my monthly bill", "an autopay charge", "a surprise fee", "the prorated charges"],
+    "contracts": ["my plan", "the early termination fee", "the equipment installment plan", "the price lock"],
+    "porting": ["porting my number", "the number transfer", "my port-out PIN", "switching carriers"],
+    "scam": ["a SIM swap", "a fake T-Mobile text", "an unauthorized line", "a spoofed support call"],
+    "customer_service": ["customer service", "the store rep", "the support chat", "the T-Force team"],
+    "credit_card": ["the T-Mobile credit card", "a card payment", "my credit check", "a declined card"],
+    "coverage": ["coverage at home", "rural coverage", "signal indoors", "coverage while traveling"],
+}
+
+OPENERS = {
+    "Negative": ["I am furious about", "Nothing but trouble with", "Three weeks fighting over",
+                 "Very disappointed by", "Still no fix for"],
+    "Positive": ["Really happy with", "Pleasantly surprised by", "No complaints about",
+                 "Great experience with", "Finally sorted out"],
+    "Neutral": ["Some thoughts on", "Mixed feelings about", "Just an update on",
+                "Not sure yet about", "Curious how others handle"],
+}
+
+DETAILS = [
+    "I called support twice and was transferred each time.",
+    "The app showed something different from what the rep told me.",
+    "It took about an hour to get an answer.",
+    "I have been a customer for over ten years.",
+    "My whole family is on this account.",
+    "The store could not help and sent me to the website.",
+    "I was promised a credit that never showed up.",
+    "Everything worked after a restart.",
+]
+
+
+def generate(n, seed=0, start="2024-01-01", end="2025-11-09"):
+    """Returns n synthetic reviews as a DataFrame in COLUMNS order."""
+    rng = np.random.default_rng(seed)
+
+    topic_id = rng.integers(0, len(TOPICS), n)
+    topic_name = np.array(TOPICS, dtype=object)[topic_id]
+    sentiment = rng.choice(np.array(SENTIMENTS, dtype=object), n, p=SENTIMENT_WEIGHTS)
+
+    # Build the text from per-topic and per-sentiment pieces; each piece is picked by index so it stays vectorized.
+    subjects = np.array([SUBJECTS[t] for t in TOPICS], dtype=object)
+    subject = subjects[topic_id, rng.integers(0, subjects.shape[1], n)]
+    openers = {s: np.array(o, dtype=object) for s, o in OPENERS.items()}
+    opener_pick = rng.integers(0, len(OPENERS["Negative"]), n)
+    opener = np.empty(n, dtype=object)
+    for name, choices in openers.items():
+        mask = sentiment == name
+        opener[mask] = choices[opener_pick[mask]]
+    details = np.array(DETAILS, dtype=object)
+    first = details[rng.integers(0, len(details), n)]
+    second = details[rng.integers(0, len(details), n)]
+    text = (pd.Series(opener) + " " + pd.Series(subject) + ". " + pd.Series(first) + " " + pd.Series(second)
+            + " Ref #" + pd.Series(rng.integers(0, 10 ** 6, n)).astype(str) + ".")
+
+    # Vote counts are heavy-tailed like the sample's: median around 8, a few in the hundreds.
+    score = np.minimum(np.round(rng.lognormal(2.0, 1.3, n)), 2000).astype(int)
+
+    # About one in five rows is a Reddit post; the rest have no url, like the scraped reviews.
+    url = np.full(n, None, dtype=object)
+    reddit = rng.random(n) < 0.2
+    url[reddit] = "https://www.reddit.com/r/tmobile/comments/" + pd.Series(np.flatnonzero(reddit)).map(
+        lambda i: format(i, "x")).to_numpy(dtype=object)
+
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    days = rng.integers(0, (end - start).days + 1, n)
+    dates = start + pd.to_timedelta(days, unit="D")
+    date = pd.Series(dates.month.astype(str) + "/" + dates.day.astype(str) + "/" + dates.year.astype(str))
+
+    # About 12% of rows have no location, as in the sample.
+    location = np.array(CITIES, dtype=object)[rng.integers(0, len(CITIES), n)]
+    location[rng.random(n) < 0.12] = None
+
+    return pd.DataFrame({
+        "text": text,
+        "score": score,
+        "url": url,
+        "date": date,
+        "location": location,
+        "topic_id": topic_id,
+        "topic_name": topic_name,
+        "sentiment": sentiment,
+    }, columns=COLUMNS)
+
+
+def write(n, path, seed=0):
+    generate(n, seed=seed).to_csv(path, index=False)
+    return path
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Write a seeded synthetic review CSV.")
+    parser.add_argument("rows", type=int)
+    parser.add_argument("-o", "--output", default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    output = args.output or f"synthetic_{args.rows}.csv"
+    write(args.rows, output, seed=args.seed)
+    print(f"✅ Wrote {args.rows} reviews to '{output}'")
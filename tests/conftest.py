@@ -0,0 +1,6 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# The pipeline modules live at the repository root and the API's in my-react-app/.
+sys.path[:0] = [ROOT, os.path.join(ROOT, "my-react-app")]
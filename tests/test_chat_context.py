@@ -0,0 +1,44 @@
+import pytest
+
+from chat_context import ContextManager, message_tokens
+
+
+def total(messages):
+    return sum(message_tokens(m) for m in messages)
+
+
+def turn(role, words):
+    return {"role": role, "content": " ".join(f"word{i}" for i in range(words))}
+
+
+def test_keeps_newest_turns_and_summarizes_the_rest():
+    manager = ContextManager(budget=400, summary_budget=60)
+    system = [{"role": "system", "content": "Instructions."}]
+    history = [turn("user" if i % 2 == 0 else "assistant", 40) for i in range(12)]
+
+    fitted = manager.fit(system + history)
+
+    assert total(fitted) <= 400
+    assert fitted[0] == system[0]
+    assert fitted[1]["content"].startswith("Earlier in this conversation:")
+    assert fitted[-1] == history[-1]
+
+
+def test_latest_question_is_never_truncated():
+    manager = ContextManager(budget=300, summary_budget=60)
+    system = [{"role": "system", "content": "Instructions and retrieved reviews. " * 80}]
+    question = turn("user", 100)
+
+    fitted = manager.fit(system + [turn("user", 30), turn("assistant", 30), question])
+
+    assert fitted[-1] == question
+    assert total(fitted) <= 300
+    # The retrieval prompt gave way, from its end.
+    assert fitted[0]["content"].startswith("Instructions and retrieved reviews.")
+    assert message_tokens(fitted[0]) < message_tokens(system[0])
+
+
+def test_question_over_the_budget_is_rejected():
+    manager = ContextManager(budget=100, summary_budget=20)
+    with pytest.raises(ValueError):
+        manager.fit([{"role": "system", "content": "Instructions."}, turn("user", 200)])
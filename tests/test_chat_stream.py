@@ -0,0 +1,68 @@
+import importlib
+import json
+import os
+
+import openai
+import pytest
+
+import metrics
+from chatbot import MODEL
+from llm_stub import StubServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope="module")
+def api(tmp_path_factory):
+    """The API module, with its LLM client pointed at a local stub and its search index in a temp dir."""
+    with StubServer(seed=1) as stub, pytest.MonkeyPatch.context() as mp:
+        mp.setenv("NVIDIA_API_KEY", "stub")
+        mp.setenv("NVIDIA_BASE_URL", stub.base_url)
+        mp.setenv("REVIEWS_PATH", os.path.join(ROOT, "tmobile_reviews_labeled.csv"))
+        mp.setenv("SEARCH_INDEX_PATH", str(tmp_path_factory.mktemp("search") / "search.pkl"))
+        yield importlib.import_module("app")
+
+
+def ask(client, question):
+    return client.post("/api/chat/stream", json={"messages": [{"role": "user", "content": question}]},
+                       buffered=False)
+
+
+def events(body):
+    """(event name, data) for every SSE event in a response body."""
+    result = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        result.append((fields.get("event", "message"), json.loads(fields["data"])))
+    return result
+
+
+def test_deltas_arrive_before_done(api):
+    received = events(ask(api.app.test_client(), "Which issues come up most?").get_data(as_text=True))
+
+    assert [name for name, _ in received][-1] == "done"
+    deltas = [data["delta"] for name, data in received if name == "message"]
+    assert len(deltas) > 1
+    assert "".join(deltas).strip() == "Most reviews complain about billing errors and dropped calls."
+
+
+def test_upstream_error_is_sent_as_an_error_event(api, monkeypatch):
+    with StubServer(error_rate=1.0, seed=1) as failing:
+        monkeypatch.setattr(api, "client", openai.OpenAI(base_url=failing.base_url, api_key="stub", max_retries=0))
+        received = events(ask(api.app.test_client(), "Is billing getting worse?").get_data(as_text=True))
+
+    assert [name for name, _ in received] == ["error"]
+    assert received[0][1]["error"]
+
+
+def test_client_disconnect_cancels_the_completion(api):
+    def cancelled():
+        return metrics.llm_requests._values.get((MODEL, "chat_stream", "cancelled"), 0)
+
+    before = cancelled()
+    response = ask(api.app.test_client(), "What do people say about coverage?")
+    first = next(iter(response.response))
+    assert b"delta" in first
+    response.close()
+
+    assert cancelled() == before + 1
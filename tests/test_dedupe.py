@@ -0,0 +1,32 @@
+import numpy as np
+
+from dedupe import minhash, near_duplicate_groups
+
+
+def test_groups_near_duplicates_under_the_earliest_row():
+    texts = [
+        "My bill doubled this month and support could not explain the new fees at all.",
+        "Coverage in the mountains is great, never dropped a call on the trip.",
+        "My bill doubled this month and support could not explain the new fees at all!!",
+        "my bill doubled this month, and support could not explain the new fees at all",
+    ]
+    reps = near_duplicate_groups(np.array([minhash(t) for t in texts]))
+    assert list(reps) == [0, 1, 0, 0]
+
+
+def test_links_duplicates_through_a_middle_row():
+    # Bands are 8 values wide. c differs from a in bands 1-2 (sim 0.875); b differs from c in one value
+    # of bands 1-2 and all of bands 3-4 (sim 0.86), and from a in 32 values (sim 0.75). b and c only ever
+    # share a bucket that a is in too, so comparing members with the bucket's first row never joins b.
+    a = np.arange(128, dtype=np.uint32)
+    c = a.copy()
+    c[8:24] += 1000
+    b = c.copy()
+    b[[8, 16]] += 1000
+    b[24:40] += 1000
+    reps = near_duplicate_groups(np.array([a, b, c]), threshold=0.8)
+    assert list(reps) == [0, 0, 0]
+
+
+def test_empty_input():
+    assert len(near_duplicate_groups(np.empty((0, 128), dtype=np.uint32))) == 0
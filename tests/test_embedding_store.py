@@ -0,0 +1,23 @@
+import numpy as np
+
+from embedding_store import EmbeddingStore
+
+
+def test_failed_batch_keeps_the_others_and_is_retried(tmp_path):
+    texts = [f"review {i}" for i in range(6)]
+
+    def flaky(batch):
+        if "review 2" in batch:
+            raise RuntimeError("429 Too Many Requests")
+        return np.ones((len(batch), 3))
+
+    store = EmbeddingStore(str(tmp_path))
+    assert store.embed_missing(texts, flaky, batch_size=2, max_workers=3) == 4
+    assert store.missing(texts) == ["review 2", "review 3"]
+
+    # The batches that succeeded were persisted; a new run only embeds the failed one.
+    reopened = EmbeddingStore(str(tmp_path))
+    calls = []
+    assert reopened.embed_missing(texts, lambda b: calls.append(b) or np.zeros((len(b), 3)), batch_size=2) == 2
+    assert calls == [["review 2", "review 3"]]
+    assert reopened.load(texts).shape == (6, 3)
@@ -0,0 +1,73 @@
+import time
+
+import openai
+import pytest
+
+from enrichment import EnrichmentEngine
+from llm_stub import StubServer
+
+
+@pytest.fixture
+def stub():
+    with StubServer(error_rate=0.3, retry_after=0.01, seed=7) as server:
+        yield server
+
+
+def make_engine(stub, **kwargs):
+    client = openai.OpenAI(base_url=stub.base_url, api_key="stub", max_retries=0)
+    return EnrichmentEngine(client, max_workers=4, base_delay=0.01, max_delay=0.05, **kwargs)
+
+
+def classify(engine, text):
+    return engine.complete_text(
+        model="stub",
+        messages=[{"role": "system", "content": "You are a sentiment analysis assistant."},
+                  {"role": "user", "content": text}],
+    )
+
+
+def test_map_retries_errors_and_keeps_order(stub):
+    engine = make_engine(stub, max_retries=10)
+    texts = [f"review {i}" for i in range(20)]
+
+    results = engine.map(lambda t: (t, classify(engine, t)), texts)
+
+    assert [t for t, _ in results] == texts
+    assert all(answer == "Negative" for _, answer in results)
+    assert stub.stats.snapshot()["errors"] > 0
+
+
+def test_map_isolates_failed_items(stub):
+    engine = make_engine(stub)
+
+    def fn(text):
+        if text == "bad":
+            raise ValueError("unparseable row")
+        return text.upper()
+
+    assert engine.map(fn, ["a", "bad", "c"]) == ["A", None, "C"]
+
+
+def test_map_returns_none_when_retries_run_out():
+    with StubServer(error_rate=1.0, retry_after=0.01, seed=7) as stub:
+        engine = make_engine(stub, max_retries=1)
+        assert engine.map(lambda t: classify(engine, t), ["x", "y"]) == [None, None]
+        assert stub.stats.snapshot()["requests"] == 4
+
+
+def test_rate_limited_requests_wait_for_retry_after():
+    # Seed 4 makes the first request a 429 and the second a success.
+    with StubServer(error_rate=0.5, retry_after=0.3, seed=4) as stub:
+        engine = make_engine(stub, max_retries=1)
+        started = time.perf_counter()
+        assert classify(engine, "x") == "Negative"
+        assert time.perf_counter() - started >= 0.3
+        assert stub.stats.snapshot() == {"requests": 2, "errors": 1}
+
+
+def test_embed_retries_errors():
+    with StubServer(error_rate=0.5, retry_after=0.01, seed=3) as stub:
+        engine = make_engine(stub, max_retries=10)
+        vectors = [engine.embed(model="stub", input=[f"review {i}", "b"]).data for i in range(5)]
+        assert all(len(v) == 2 and len(v[0].embedding) == stub.dim for v in vectors)
+        assert stub.stats.snapshot()["errors"] > 0
@@ -0,0 +1,36 @@
+import pytest
+
+from extractors import parse_date_local, parse_location_local
+
+
+@pytest.mark.parametrize("text", [
+    "Sure, OK I will switch",
+    "Verizon, OR T-Mobile",
+    "Honestly, IN my opinion",
+    "Tried Boost Mobile, ME included",
+    "Phone, HI speed",
+    "Coverage is spotty. Sure, OK",
+    "Great phones in Portland, OR",
+])
+def test_location_ignores_prose_and_ambiguous_codes(text):
+    assert parse_location_local(text) is None
+
+
+@pytest.mark.parametrize("text, state", [
+    ("New Orleans, LA", "LA"),
+    ("Dropped calls all week. Leesburg, FL.", "FL"),
+    ("Support never called back - Tulsa, OK", "OK"),
+    ("Coverage in Houston is terrible", "TX"),
+    ("Moved from Ohio last year", "OH"),
+])
+def test_location_resolves_confident_matches(text, state):
+    assert parse_location_local(text) == state
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("2025-11-08 00:00:00", "11/8/2025"),
+    ("Oct. 30, 2025 Re", "10/30/2025"),
+    ("November 2025", None),
+])
+def test_dates(value, expected):
+    assert parse_date_local(value) == expected
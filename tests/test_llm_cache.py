@@ -0,0 +1,49 @@
+from llm_cache import LLMCache, prompt_hash, request_key
+
+
+def key(text):
+    return request_key("model", [{"role": "user", "content": text}], {"temperature": 0.0})
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = LLMCache(str(tmp_path / "cache.sqlite"), max_entries=2, evict_every=1)
+    cache.put(key("a"), "model", "system", "A")
+    cache.put(key("b"), "model", "system", "B")
+    # Using 'a' makes 'b' the least recently used entry when 'c' arrives.
+    assert cache.get(key("a")) == "A"
+    cache.put(key("c"), "model", "system", "C")
+
+    assert cache.get(key("b")) is None
+    assert cache.get(key("a")) == "A" and cache.get(key("c")) == "C"
+    assert cache.stats()["entries"] == 2
+    cache.close()
+
+
+def test_hit_times_survive_a_restart(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = LLMCache(path, max_entries=2, evict_every=1)
+    cache.put(key("a"), "model", "system", "A")
+    cache.put(key("b"), "model", "system", "B")
+    cache.get(key("a"))
+    cache.close()
+
+    reopened = LLMCache(path, max_entries=2, evict_every=1)
+    reopened.put(key("c"), "model", "system", "C")
+    assert reopened.get(key("a")) == "A" and reopened.get(key("b")) is None
+    reopened.close()
+
+
+def test_invalidates_only_the_edited_prompt(tmp_path):
+    cache = LLMCache(str(tmp_path / "cache.sqlite"))
+    cache.put(key("a"), "model", "old prompt", "A")
+    cache.put(key("b"), "model", "old prompt", "B")
+    cache.put(key("c"), "model", "other prompt", "C")
+
+    listed = {p["hash"]: p["entries"] for p in cache.prompts()}
+    assert listed == {prompt_hash("model", "old prompt"): 2, prompt_hash("model", "other prompt"): 1}
+
+    assert cache.invalidate(digest=prompt_hash("model", "old prompt")) == 2
+    assert cache.get(key("a")) is None and cache.get(key("c")) == "C"
+    assert cache.invalidate(model="model", system_prompt="other prompt") == 1
+    assert cache.stats()["entries"] == 0
+    cache.close()
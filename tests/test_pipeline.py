@@ -0,0 +1,85 @@
+import importlib
+import os
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+
+from llm_stub import StubServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope="module")
+def pipeline(tmp_path_factory):
+    """The pipeline module, with every LLM and embedding call served by a local stub."""
+    with StubServer(seed=1) as stub, pytest.MonkeyPatch.context() as mp:
+        mp.setenv("NVIDIA_API_KEY", "stub")
+        mp.setenv("NVIDIA_BASE_URL", stub.base_url)
+        mp.setenv("LLM_CACHE_PATH", str(tmp_path_factory.mktemp("cache") / "llm_cache.sqlite"))
+        yield importlib.import_module("pipeline")
+
+
+def sources(pipeline, rows=12):
+    df = pd.read_csv(os.path.join(ROOT, "tmobile_reviews.csv")).head(rows)
+    return df.rename(columns=pipeline.data.COLUMN_MAPPING_TMOBILE)[list(pipeline.data.COLUMN_MAPPING_TMOBILE.values())]
+
+
+def run(pipeline, tmp_path, chunk_size=5):
+    pipeline.enrich(str(tmp_path / "out.csv"), str(tmp_path / "state.sqlite"), chunk_size,
+                    str(tmp_path / "embeddings"), str(tmp_path / "topics"))
+    return pd.read_csv(tmp_path / "out.csv")
+
+
+def counting(monkeypatch, pipeline):
+    """Wraps stage_sentiment to record the texts of every chunk, raising on chunk number 'crash_on' if set."""
+    calls = SimpleNamespace(chunks=[], crash_on=None)
+    stage = pipeline.stage_sentiment
+
+    def wrapper(records):
+        calls.chunks.append([r["text"] for r in records])
+        if len(calls.chunks) == calls.crash_on:
+            raise RuntimeError("simulated crash")
+        return stage(records)
+
+    monkeypatch.setattr(pipeline, "stage_sentiment", wrapper)
+    return calls
+
+
+def test_resumes_a_stage_after_a_crash(pipeline, tmp_path, monkeypatch):
+    monkeypatch.setattr(pipeline.data, "load_sources", lambda: sources(pipeline))
+    calls = counting(monkeypatch, pipeline)
+    calls.crash_on = 2
+    with pytest.raises(RuntimeError):
+        run(pipeline, tmp_path)
+
+    # The first chunk was committed with its done marks; the crashed one was not.
+    state = pipeline.PipelineState(str(tmp_path / "state.sqlite"))
+    assert len(state.pending("sentiment")) == 7
+    assert state.pending("topics") == []
+
+    calls.chunks, calls.crash_on = [], None
+    df = run(pipeline, tmp_path)
+    assert sum(len(c) for c in calls.chunks) == 7
+    assert df["sentiment"].notna().all() and df["topic_name"].notna().all()
+    assert all(state.pending(stage) == [] for stage in ("locations", "embeddings", "topics", "sentiment", "dates"))
+
+    calls.chunks = []
+    run(pipeline, tmp_path)
+    assert calls.chunks == []
+
+
+def test_near_duplicates_copy_their_representative(pipeline, tmp_path, monkeypatch):
+    df = sources(pipeline)
+    follower = df.iloc[[0]].assign(text=df["text"].iloc[0] + " !!", date="Nov. 3, 2025")
+    monkeypatch.setattr(pipeline.data, "load_sources", lambda: pd.concat([df, follower], ignore_index=True))
+    calls = counting(monkeypatch, pipeline)
+
+    out = run(pipeline, tmp_path)
+    rep, copy = out.iloc[0], out.iloc[-1]
+    # Only the representative was classified; the follower copied its answer but kept its own date.
+    assert sum(len(c) for c in calls.chunks) == len(df)
+    assert follower["text"].iloc[0] not in [t for c in calls.chunks for t in c]
+    assert copy["group_id"] == rep["group_id"]
+    assert (copy["sentiment"], copy["topic_name"]) == (rep["sentiment"], rep["topic_name"])
+    assert copy["date"] == "11/3/2025"
@@ -0,0 +1,28 @@
+import pandas as pd
+import pytest
+
+from dataset import PostIndex
+
+
+def test_reviews_without_a_date_sort_last():
+    df = pd.DataFrame({
+        "text": ["no date", "older", "newer"],
+        "topic_name": ["Billing", "Billing", "Billing"],
+        "score": [5, 5, 5],
+    })
+    dates = pd.Series(pd.to_datetime([None, "2025-11-01", "2025-11-08"]))
+    index = PostIndex(df, dates, {})
+
+    for sort in ("newest", "likes"):
+        rows, cursor = index.page(sort, limit=3)
+        assert list(rows) == [2, 1, 0]
+        assert cursor is None
+
+
+def test_malformed_cursors_are_rejected():
+    assert PostIndex.decode_cursor(PostIndex.encode_cursor("18dfb-6af2c", 40), "18dfb-6af2c") == 40
+    for cursor in ("abc", "18dfb-6af2c:", ":40", "18dfb-6af2c:-1", "18dfb-6af2c:4x"):
+        with pytest.raises(ValueError, match="Invalid cursor"):
+            PostIndex.decode_cursor(cursor, "18dfb-6af2c")
+    with pytest.raises(LookupError):
+        PostIndex.decode_cursor("older-version:40", "18dfb-6af2c")
@@ -0,0 +1,79 @@
+import csv
+from types import SimpleNamespace
+
+import pytest
+
+from reddit_ingest import RedditIngestor
+
+
+def make_post(n):
+    return SimpleNamespace(id=f"p{n}", created_utc=1_700_000_000 + n * 60, title=f"Post {n}",
+                           selftext=f"Body of post {n}", score=n, url=f"https://www.reddit.com/r/tmobile/p{n}")
+
+
+class FakeSubreddit:
+    """Yields posts newest first, like praw's subreddit.new(), and counts how many were pulled."""
+
+    def __init__(self, count):
+        self.posts = [make_post(n) for n in range(count)]
+        self.pulled = 0
+
+    def add(self, count):
+        start = len(self.posts)
+        self.posts += [make_post(n) for n in range(start, start + count)]
+
+    def new(self, limit=None):
+        for post in sorted(self.posts, key=lambda p: -p.created_utc)[:limit]:
+            self.pulled += 1
+            yield post
+
+
+@pytest.fixture
+def paths(tmp_path):
+    return str(tmp_path / "reddit_text.csv"), str(tmp_path / "reddit_state.json")
+
+
+def rows(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+
+def test_polls_only_new_posts(paths):
+    output, state = paths
+    source = FakeSubreddit(30)
+
+    assert RedditIngestor(source, output, state).poll(chunk_size=7) == 30
+    source.pulled = 0
+    assert RedditIngestor(source, output, state).poll() == 0
+    # Nothing new: the scan ends at the first post below the watermark.
+    assert source.pulled <= 2
+
+    source.add(5)
+    assert RedditIngestor(source, output, state).poll() == 5
+    titles = [r["title"] for r in rows(output)]
+    assert len(titles) == len(set(titles)) == 35
+
+
+def test_crash_between_append_and_state_save_writes_no_duplicates(paths, monkeypatch):
+    output, state = paths
+    source = FakeSubreddit(20)
+    ingestor = RedditIngestor(source, output, state)
+
+    saves = []
+    original = ingestor._save_state
+
+    def save_then_crash():
+        saves.append(1)
+        # The 2nd save marks the first chunk as seen; dying just before it leaves the chunk in flight.
+        if len(saves) == 2:
+            raise KeyboardInterrupt
+        original()
+
+    monkeypatch.setattr(ingestor, "_save_state", save_then_crash)
+    with pytest.raises(KeyboardInterrupt):
+        ingestor.poll(chunk_size=5)
+    assert len(rows(output)) == 5
+
+    assert RedditIngestor(source, output, state).poll(chunk_size=5) == 15
+    titles = [r["title"] for r in rows(output)]
+    assert len(titles) == len(set(titles)) == 20
@@ -0,0 +1,78 @@
+import os
+from types import SimpleNamespace
+
+import pandas as pd
+
+from search_index import SearchIndex
+
+
+def snapshot(version, texts):
+    df = pd.DataFrame({"text": texts, "url": None, "date": "11/8/2025"})
+    return SimpleNamespace(version=version, df=df, posts=None)
+
+
+def test_sync_removes_reviews_that_left_the_dataset(tmp_path):
+    index = SearchIndex(str(tmp_path / "search.pkl"))
+    assert index.sync(snapshot(1, ["billing error again", "dropped calls all day", "billing fee"])) == 3
+    assert index.sync(snapshot(2, ["dropped calls all day", "coverage is great"])) == 1
+
+    assert len(index) == 2
+    assert "bill" not in index.postings
+    assert index.total_len == sum(index.doc_len)
+    _, _, total = index.search(snapshot(2, ["dropped calls all day", "coverage is great"]), "billing")
+    assert total == 0
+
+
+def test_changes_are_logged_and_replayed(tmp_path):
+    path = str(tmp_path / "search.pkl")
+    index = SearchIndex(path)
+    index.sync(snapshot(1, ["billing error " * 50, "dropped calls " * 50]))
+    base = os.path.getsize(path)
+
+    # A small change goes to the log; the base file is left alone.
+    index.sync(snapshot(2, ["billing error " * 50, "dropped calls " * 50, "new fee"]))
+    assert os.path.getsize(path) == base
+    assert os.path.getsize(path + ".log") > 0
+
+    reopened = SearchIndex(path)
+    assert reopened.doc_keys == index.doc_keys
+    assert reopened.total_len == index.total_len
+    assert reopened.seq == index.seq
+    snap = snapshot(3, ["billing error " * 50, "dropped calls " * 50, "new fee"])
+    assert reopened.sync(snap) == 0
+    assert list(reopened.search(snap, "fee")[0]) == [2]
+
+
+def test_unreadable_file_is_rebuilt(tmp_path):
+    path = tmp_path / "search.pkl"
+    path.write_bytes(b"garbage")
+    index = SearchIndex(str(path))
+    assert len(index) == 0 and not path.exists()
+    assert index.sync(snapshot(1, ["billing error"])) == 1
+    assert len(SearchIndex(str(path))) == 1
+
+
+def test_identical_rows_are_all_returned(tmp_path):
+    index = SearchIndex(str(tmp_path / "search.pkl"))
+    snap = snapshot(1, ["billing error", "dropped calls", "billing error"])
+    index.sync(snap)
+
+    assert len(index) == 2
+    rows, scores, total = index.search(snap, "billing")
+    assert list(rows) == [0, 2] and total == 2
+    assert scores[0] == scores[1]
+
+
+def test_search_does_not_sync_a_newer_snapshot(tmp_path):
+    index = SearchIndex(str(tmp_path / "search.pkl"))
+    index.sync(snapshot(1, ["billing error", "dropped calls"]))
+    seq = index.seq
+
+    # Rows are positions in the snapshot that was asked for; reviews not indexed yet are not found.
+    newer = snapshot(2, ["coverage is great", "dropped calls", "billing error"])
+    assert list(index.search(newer, "billing")[0]) == [2]
+    assert index.search(newer, "coverage")[2] == 0
+    assert len(index) == 2 and index.seq == seq
+
+    index.sync(newer)
+    assert list(index.search(newer, "coverage")[0]) == [0]
@@ -0,0 +1,77 @@
+import os
+import threading
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import webScrapper
+from conftest import ROOT
+
+FIXTURES = os.path.join(ROOT, "my-react-app", "fixtures", "consumeraffairs")
+
+
+class FixtureHandler(SimpleHTTPRequestHandler):
+    """Serves the saved pages. 'routes' maps a path to another fixture, or to None for a page without reviews."""
+    requested = []
+    routes = {}
+
+    def do_GET(self):
+        FixtureHandler.requested.append(self.path)
+        target = self.routes.get(self.path, self.path)
+        if target is None:
+            body = b"<html><body><p>Temporarily unavailable</p></body></html>"
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        self.path = target
+        super().do_GET()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def site(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), partial(FixtureHandler, directory=FIXTURES))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    FixtureHandler.requested = []
+    FixtureHandler.routes = {}
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    monkeypatch.setattr(webScrapper, "BASE_URL", base + "/page{}.html")
+    yield base
+    server.shutdown()
+    server.server_close()
+
+
+def scrape(pages, seen=None):
+    return webScrapper.scrape_multiple_pages(pages, seen=seen, concurrency=2, rate=1000)
+
+
+def test_scrapes_every_page_once(site):
+    reviews = scrape(6)
+    assert reviews
+    assert len({webScrapper.review_key(r) for r in reviews}) == len(reviews)
+    assert len(FixtureHandler.requested) == 6
+
+
+def test_refresh_stops_at_the_first_page_of_known_reviews(site):
+    seen = set()
+    first = scrape(6, seen)
+
+    assert scrape(6, seen) == []
+    # The first window of two pages is fetched, then the crawl stops.
+    assert len(FixtureHandler.requested) == 6 + 2
+    assert len(seen) == len(first)
+
+
+def test_page_without_reviews_does_not_stop_the_crawl(site):
+    FixtureHandler.routes = {"/page2.html": None, "/page3.html": "/page2.html"}
+    page1 = webScrapper.extract_reviews(open(os.path.join(FIXTURES, "page1.html"), encoding="utf-8").read())
+
+    reviews = scrape(3)
+
+    assert len(FixtureHandler.requested) == 3
+    assert len(reviews) > len(page1)
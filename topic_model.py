@@ -0,0 +1,151 @@
+import json
+import os
+
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+from sklearn.cluster import KMeans
+
+
+def squared_distances(vectors, centroids):
+    """Pairwise squared euclidean distances, computed as one matrix product."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    d = (
+        np.einsum("ij,ij->i", vectors, vectors)[:, None]
+        - 2 * vectors @ centroids.T
+        + np.einsum("ij,ij->i", centroids, centroids)[None, :]
+    )
+    return np.maximum(d, 0)
+
+
+class TopicModel:
+    """
+    Persistent topic clusters: centroids, per-cluster counts and labels, keyed by a stable topic id.
+    New vectors are assigned to the nearest centroid and folded in with mini-batch updates; a full
+    recluster only happens when drift passes a threshold, and its clusters are matched back to the
+    old ids so existing topic ids and names survive.
+    """
+
+    def __init__(self, topic_ids, centroids, counts, labels, baseline_distance, watermark=0, next_id=None):
+        self.topic_ids = np.asarray(topic_ids, dtype=np.int64)
+        self.centroids = np.asarray(centroids, dtype=np.float32)
+        self.counts = np.asarray(counts, dtype=np.float64)
+        self.labels = dict(labels)
+        self.baseline_distance = float(baseline_distance)
+        # Number of embedding-store rows already folded into the centroids.
+        self.watermark = watermark
+        # Ids are never reused, even after the cluster that had one disappears.
+        self.next_id = int(self.topic_ids.max()) + 1 if next_id is None else next_id
+
+    @classmethod
+    def fit(cls, vectors, n_clusters=10, random_state=42):
+        kmeans = KMeans(n_clusters=n_clusters, n_init=10, random_state=random_state)
+        assigned = kmeans.fit_predict(vectors)
+        centroids = kmeans.cluster_centers_.astype(np.float32)
+        distances = np.sqrt(squared_distances(vectors, centroids)[np.arange(len(assigned)), assigned])
+        counts = np.bincount(assigned, minlength=n_clusters)
+        return cls(np.arange(n_clusters), centroids, counts, {}, distances.mean(), watermark=len(vectors))
+
+    @staticmethod
+    def exists(directory):
+        return os.path.exists(os.path.join(directory, "topics.json"))
+
+    @classmethod
+    def load(cls, directory):
+        arrays = np.load(os.path.join(directory, "centroids.npz"))
+        with open(os.path.join(directory, "topics.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        labels = {int(k): v for k, v in meta["labels"].items()}
+        return cls(arrays["topic_ids"], arrays["centroids"], arrays["counts"], labels,
+                   meta["baseline_distance"], meta["watermark"], meta["next_id"])
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        tmp = os.path.join(directory, "centroids.tmp.npz")
+        np.savez(tmp, topic_ids=self.topic_ids, centroids=self.centroids, counts=self.counts)
+        os.replace(tmp, os.path.join(directory, "centroids.npz"))
+
+        meta = {
+            "labels": {str(k): v for k, v in self.labels.items()},
+            "baseline_distance": self.baseline_distance,
+            "watermark": self.watermark,
+            "next_id": self.next_id,
+        }
+        tmp = os.path.join(directory, "topics.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+        os.replace(tmp, os.path.join(directory, "topics.json"))
+
+    def assign(self, vectors):
+        """Returns (topic ids, distance to the assigned centroid) for a batch of vectors."""
+        if len(vectors) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        d = squared_distances(vectors, self.centroids)
+        nearest = d.argmin(axis=1)
+        return self.topic_ids[nearest], np.sqrt(d[np.arange(len(nearest)), nearest])
+
+    def drift(self, distances):
+        """Mean distance of a batch to its centroids, relative to the distance when the model was fitted."""
+        if len(distances) == 0 or self.baseline_distance == 0:
+            return 0.0
+        return float(np.mean(distances)) / self.baseline_distance
+
+    def partial_fit(self, vectors, topic_ids):
+        """Mini-batch k-means step: each centroid moves toward the mean of its new points by n_new / n_total."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        position = {t: i for i, t in enumerate(self.topic_ids)}
+        rows = np.fromiter((position[t] for t in topic_ids), dtype=np.int64, count=len(topic_ids))
+
+        sums = np.zeros_like(self.centroids)
+        np.add.at(sums, rows, vectors)
+        batch_counts = np.bincount(rows, minlength=len(self.centroids))
+
+        touched = batch_counts > 0
+        self.counts[touched] += batch_counts[touched]
+        rate = (batch_counts[touched] / self.counts[touched])[:, None]
+        means = sums[touched] / batch_counts[touched][:, None]
+        self.centroids[touched] = (1 - rate) * self.centroids[touched] + rate * means
+
+    def recluster(self, vectors, match_factor=1.0, random_state=42):
+        """
+        Refits k-means on all vectors and matches the new clusters to the old ones.
+        A new cluster keeps an old id when its centroid is within match_factor * baseline distance
+        of it; otherwise it gets a fresh id. Returns the fresh ids, which still need names.
+        """
+        n_clusters = len(self.centroids)
+        refit = TopicModel.fit(vectors, n_clusters=n_clusters, random_state=random_state)
+
+        cost = np.sqrt(squared_distances(refit.centroids, self.centroids))
+        new_rows, old_rows = linear_sum_assignment(cost)
+
+        ids = np.full(n_clusters, -1, dtype=np.int64)
+        for new_row, old_row in zip(new_rows, old_rows):
+            if cost[new_row, old_row] <= match_factor * self.baseline_distance:
+                ids[new_row] = self.topic_ids[old_row]
+
+        fresh = []
+        for row in np.flatnonzero(ids == -1):
+            ids[row] = self.next_id
+            fresh.append(self.next_id)
+            self.next_id += 1
+
+        self.labels = {int(t): self.labels[int(t)] for t in ids if int(t) in self.labels}
+        self.topic_ids = ids
+        self.centroids = refit.centroids
+        self.counts = refit.counts
+        self.baseline_distance = refit.baseline_distance
+        return fresh
+
+    def name_topics(self, topic_ids, texts, namer, only=None, distances=None):
+        """
+        Labels every unnamed topic (or just the ones in 'only') from the texts assigned to it,
+        nearest to the centroid first when 'distances' are given. Topics with no texts stay unnamed.
+        """
+        topic_ids = np.asarray(topic_ids)
+        targets = only if only is not None else [int(t) for t in self.topic_ids if int(t) not in self.labels]
+        for t in targets:
+            members = np.flatnonzero(topic_ids == t)
+            if len(members) == 0:
+                continue
+            if distances is not None:
+                members = members[np.argsort(np.asarray(distances)[members], kind="stable")]
+            self.labels[int(t)] = namer([texts[j] for j in members])